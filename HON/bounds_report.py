@@ -0,0 +1,30 @@
+#
+# Project HON: Report how many subscript bounds checks range analysis removes.
+#
+import contextlib
+import io
+import sys
+import os
+from hon.parser import Parser, SyntaxErrorException
+from hon.bounds_visitor import BoundsCheckVisitor, bounds_stats
+
+files = os.listdir(sys.path[0] + '/test')
+files.sort()
+totals = [0, 0]
+print('{:12s} {:>6s} {:>6s}'.format('file', 'checks', 'proven'))
+for file in files:
+    with open(sys.path[0] + '/test/' + file) as f:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                as_tree = Parser(f).parse()
+        except SyntaxErrorException as e:
+            print('SyntaxError:', e.message, e.location)
+            continue
+        BoundsCheckVisitor().analyse(as_tree)
+        stats = bounds_stats(as_tree)
+        totals = [total + count for total, count in zip(totals, stats)]
+        print('{:12s} {:6d} {:6d}'.format(file, *stats))
+checks, proven = totals
+print('{:12s} {:6d} {:6d}'.format('total', checks, proven))
+if checks:
+    print('removed: {:.1%}'.format(proven / checks))
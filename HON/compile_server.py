@@ -0,0 +1,73 @@
+#
+# Project HON: Daemon that serves analyze requests from hon_client.py over a
+# Unix socket, so that each request does not pay for starting Python and
+# importing the compiler.
+#
+import argparse
+import os
+import socket
+import socketserver
+import hon.compile_service as compile_service
+from hon.compile_service import decode, default_socket_path, encode, handle
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = decode(line)
+                if not isinstance(request, dict):
+                    request, response = {}, {'ok': False, 'error': 'bad request: not a JSON object'}
+                else:
+                    response = handle(request)
+            except ValueError as e:
+                request, response = {}, {'ok': False, 'error': f'bad request: {e}'}
+            except Exception as e:
+                response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+            self.wfile.write(encode(response))
+            self.wfile.flush()
+            if request.get('op') == 'shutdown':
+                self.server.shutdown_requested = True
+                return
+
+
+class CompileServer(socketserver.UnixStreamServer):
+    # Connections are handled one at a time: analyze() redirects sys.stdout.
+    shutdown_requested = False
+
+
+def remove_stale_socket(path):
+    """
+    Remove a socket file left behind by a daemon that is no longer running.
+    """
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+        else:
+            raise SystemExit(f'a compile server is already listening on {path}')
+
+
+arg_parser = argparse.ArgumentParser(description='Serve HON analyze requests over a Unix socket.')
+arg_parser.add_argument('--socket', metavar='PATH', default=default_socket_path(),
+                        help='socket to listen on (default: %(default)s)')
+arg_parser.add_argument('--cache-size', metavar='MB', type=float, default=64,
+                        help='memory for parsed programs kept for reuse (default: %(default)s)')
+arg_parser.add_argument('--stats', action='store_true',
+                        help='time the phases and count tokens, nodes and symbols, for the stats and metrics ops')
+args = arg_parser.parse_args()
+compile_service.cache.max_bytes = int(args.cache_size * 1024 * 1024)
+compile_service.stats.enabled = args.stats
+
+remove_stale_socket(args.socket)
+with CompileServer(args.socket, RequestHandler) as server:
+    try:
+        while not server.shutdown_requested:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(args.socket)
@@ -0,0 +1,66 @@
+#
+# Project HON: Compare the run time of call-heavy programs with name-keyed
+# frames and with frames laid out in slots.
+#
+import contextlib
+import io
+import time
+from hon.parser import Parser
+from hon.interpreter import HonFunction, Interpreter
+
+PROGRAMS = {
+    'fib': '''
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+result = fib(18)
+''',
+    'helpers': '''
+def square(x):
+    y = x * x
+    return y
+def hyp(a, b):
+    s = square(a) + square(b)
+    return s
+total = 0
+i = 0
+while i < 10000:
+    total = total + hyp(i, i + 1)
+    i = i + 1
+''',
+    'locals': '''
+def work(n):
+    a = 0
+    b = 1
+    k = 0
+    while k < n:
+        t = a + b
+        a = b
+        b = t % 1000
+        k = k + 1
+    return b
+result = work(30000)
+''',
+}
+
+
+def measure(source, frame_slots, repeat=3):
+    with contextlib.redirect_stdout(io.StringIO()):
+        as_tree = Parser(io.StringIO(source)).parse()
+    best = None
+    for _ in range(repeat):
+        interpreter = Interpreter(frame_slots=frame_slots)
+        start = time.perf_counter()
+        result = interpreter.run(as_tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, {name: value for name, value in result.items() if not isinstance(value, HonFunction)}
+
+
+print('{:8s} {:>10s} {:>10s} {:>8s}'.format('program', 'dict ms', 'slots ms', 'speedup'))
+for name, source in PROGRAMS.items():
+    plain, plain_globals = measure(source, False)
+    slots, slots_globals = measure(source, True)
+    assert plain_globals == slots_globals
+    print('{:8s} {:10.1f} {:10.1f} {:7.2f}x'.format(name, plain * 1e3, slots * 1e3, plain / slots))
@@ -0,0 +1,73 @@
+#
+# Project HON: Measure structural hashing on a generated program of 10000
+# defs: hashing it, diffing it against itself after an edit, and analysing each
+# def again with an AnalysisCache, which only redoes the def that changed.
+#
+import time
+import weakref
+import hon.hast as ast
+from hon.analysis_cache import AnalysisCache
+from hon.incremental_parser import parse, reparse
+from hon.lexer import Location
+from hon.symtab_visitor import SymbolTableVisitor
+
+FUNCTION = '''def step{n}(a, b):
+    total = 0
+    i = 0
+    while i < b:
+        if a[i] % 2 == 0:
+            total = total + a[i] // 2
+        else:
+            total = total + 3 * a[i] + 1
+        i = i + 1
+    return total
+
+'''
+FUNCTIONS = 10000
+
+
+def symbol_table(fn):
+    return SymbolTableVisitor().create_symtable(ast.BlockStmtNode([fn]))
+
+
+def analyse_all(tree, cache):
+    start = time.perf_counter()
+    for stmt in tree.stmts:
+        cache.get(stmt)
+    return time.perf_counter() - start
+
+
+def report(what, seconds):
+    print('{:40s} {:9.2f}ms'.format(what, seconds * 1000))
+
+
+program = ''.join(FUNCTION.format(n=n) for n in range(FUNCTIONS))
+tree, stream = parse(program)
+
+digests = weakref.WeakKeyDictionary()
+start = time.perf_counter()
+tree.structural_hash(digests)
+report(f'hash {FUNCTIONS} defs', time.perf_counter() - start)
+cache = AnalysisCache(symbol_table, max_entries=2 * FUNCTIONS)
+report('symbol tables of all defs', analyse_all(tree, cache))
+
+# Change '+ 1' into '+ 5' in the middle def.
+before = ast.BlockStmtNode(list(tree.stmts))
+line = FUNCTIONS // 2 * FUNCTION.count('\n') + 8
+col = FUNCTION.split('\n')[7].index('1') + 1
+reparse(tree, stream, (Location(line, col), Location(line, col + 1), '5'))
+# The root is the only node that reparse() changed in place.
+del digests[tree]
+
+start = time.perf_counter()
+tree.structural_hash(digests)
+report('hash again after the edit', time.perf_counter() - start)
+start = time.perf_counter()
+changes = ast.diff(before, tree, digests)
+report('diff', time.perf_counter() - start)
+for old, new in changes:
+    print('   changed:', type(old).__name__, getattr(old, 'value', ''), '->', type(new).__name__,
+          getattr(new, 'value', ''))
+hits, misses = cache.hits, cache.misses
+report('symbol tables of all defs again', analyse_all(tree, cache))
+print(f'   analysed again: {cache.misses - misses}, reused: {cache.hits - hits}')
@@ -0,0 +1,44 @@
+import collections
+import weakref
+import hon.hast as ast
+
+
+class AnalysisCache:
+    """
+    The results of an analysis of subtrees, such as the symbol table of each
+    def, keyed by their structural_hash(), holding at most max_entries and
+    evicting the least recently used. After an edit, only the subtrees whose
+    structure changed are analysed again, wherever they moved to. The
+    analysis must depend on nothing but the subtree it is given.
+
+    The digests of the nodes hashed are kept, without keeping the nodes alive,
+    so a subtree the incremental parser reused is not hashed again. A tree
+    that a pass changed in place must be given to forget() before any of its
+    subtrees is looked up again.
+    """
+
+    def __init__(self, analyse, max_entries=4096):
+        self.analyse = analyse
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.digests = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node):
+        key = ast.structural_hash(node, self.digests)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        result = self.entries[key] = self.analyse(node)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return result
+
+    def forget(self, node):
+        ast.forget_hashes(node, self.digests)
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,107 @@
+import collections
+import contextlib
+import enum
+import hashlib
+import io
+import sys
+from hon.pipeline_stats import PipelineStats
+from hon.symtab_visitor import SymbolTableVisitor
+
+
+def deep_sizeof(obj):
+    """
+    Estimate the memory held by obj: the sum of sys.getsizeof() over every
+    object reachable from it through attributes and containers, each counted
+    once. Classes, functions and enum members such as Tokens are shared by
+    every tree, so they are not counted.
+    """
+    seen = set()
+    todo = [obj]
+    size = 0
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, (type, enum.Enum)) or callable(obj):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            todo.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            todo.append(vars(obj))
+    return size
+
+
+class CacheEntry:
+    def __init__(self, tree, symtable):
+        self.tree = tree
+        self.symtable = symtable
+        self.size = deep_sizeof((tree, symtable))
+
+
+class ASTCache:
+    """
+    The trees and symbol tables of HON programs, keyed by the SHA-256 of their
+    source, using at most max_bytes as estimated by deep_sizeof() and evicting
+    the least recently used entries to stay within it. An entry larger than
+    max_bytes is returned but not kept.
+
+    Every caller of get() for the same source gets the same objects, so they
+    must not be modified; passes that rewrite the tree need a copy.deepcopy().
+    Programs with syntax errors are not cached: get() raises
+    SyntaxErrorException each time.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, pipeline_stats=None):
+        self.max_bytes = max_bytes
+        # Times and counts the parsing and analysis of the programs not cached.
+        self.pipeline_stats = pipeline_stats or PipelineStats(enabled=False)
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(source):
+        return hashlib.sha256(source.encode()).digest()
+
+    def get(self, source):
+        """
+        Return the tree and the symbol table of a program.
+        """
+        key = self.key(source)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.tree, entry.symtable
+        self.misses += 1
+        # The parser traces some of what it parses on stdout.
+        with contextlib.redirect_stdout(io.StringIO()):
+            tree = self.pipeline_stats.parse(io.StringIO(source))
+        with self.pipeline_stats.phase('symtab'):
+            symtable = SymbolTableVisitor().create_symtable(tree)
+        self.pipeline_stats.count_symbols(symtable)
+        entry = CacheEntry(tree, symtable)
+        if entry.size <= self.max_bytes:
+            self.entries[key] = entry
+            self.size += entry.size
+            self.evict()
+        return entry.tree, entry.symtable
+
+    def evict(self):
+        while self.size > self.max_bytes:
+            _, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.size, 'max bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
@@ -0,0 +1,382 @@
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+
+# Builtins that cannot change the length of a list.
+SAFE_BUILTINS = {'print', 'len', 'int', 'float', 'str', 'bool', 'abs', 'min', 'max', 'input'}
+
+
+class BoundsCheckVisitor(visitor.Visitor):
+    """
+    Range analysis that proves subscripts are in range, so that a backend can
+    access them without a bounds check.
+
+    Facts are kept as a dict from a key to an int, for the variables of the
+    function being analysed (or the module):
+        ('lo', v): c         v >= c
+        ('up', v, x): k      v + k < len(x), with k >= 0
+        ('len', n, x): 0     n == len(x)
+        ('minlen', x): m     len(x) >= m
+        ('maxlen', x): m     len(x) <= m
+    They come from assignments such as 'i = 0', 'i = i + 1', 'n = len(x)' and
+    'x = [...]', and from the tests of if and while statements, such as
+    'i < len(x)', 'i < n - 1' and 'i >= 0'. Joining two program points keeps the
+    facts both have, with the weaker bound. A method call, or a call to
+    anything but a builtin that cannot change a list, forgets every fact about
+    lengths, and at module level also every fact about variables.
+
+    After analyse(), every VariableRValueExprNode and VariableLValueNode gets
+    an 'in_bounds' list telling, for each of its subscripts, whether the
+    subscript was proven to be in range(len(list)). Only the first subscript of
+    a variable can be proven.
+    """
+
+    def __init__(self, max_passes=3):
+        self.max_passes = max_passes
+        self.rebound = set()
+        self.locals = None
+        self.env = None
+        self.loops = []
+
+    def analyse(self, node_ast_root):
+        self.rebound = ast.bound_names(node_ast_root)
+        defs = [stmt for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+        for fn in defs:
+            self.rebound.add(fn.name)
+            self.rebound.update(fn.params)
+        for fn in defs:
+            self.locals = ast.bound_names(fn.block) | set(fn.params)
+            self.env, self.loops = {}, []
+            self.do_visit(fn.block)
+        self.locals = None
+        self.env, self.loops = {}, []
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    @staticmethod
+    def join(*envs):
+        """
+        Join environments; None marks a program point that cannot be reached.
+        """
+        result = None
+        for env in envs:
+            if env is None:
+                continue
+            if result is None:
+                result = dict(env)
+            else:
+                result = {key: (max if key[0] == 'maxlen' else min)(value, env[key])
+                          for key, value in result.items() if key in env}
+        return result
+
+    @staticmethod
+    def int_literal(node):
+        if isinstance(node, ast.ValueExprNode) and type(node.value) is int:
+            return node.value
+        return None
+
+    @staticmethod
+    def variable(node):
+        if isinstance(node, ast.VariableRValueExprNode) and not node.expr_list:
+            return node.name
+        return None
+
+    def length_of(self, node):
+        """
+        Return the list x if node is 'len(x)'.
+        """
+        if isinstance(node, ast.FunctionCallExprNode) and node.name == 'len' and 'len' not in self.rebound \
+                and len(node.expr_list) == 1:
+            return self.variable(node.expr_list[0])
+        return None
+
+    def offset(self, node):
+        """
+        Return (v, c) if node is 'v', 'v + c', 'c + v' or 'v - c' for an int literal c.
+        """
+        if self.variable(node) is not None:
+            return self.variable(node), 0
+        if not isinstance(node, ast.OperatorExprNode) or node.rhs is None:
+            return None
+        if node.token == Token.OpPlus:
+            for v, c in ((node.lhs, node.rhs), (node.rhs, node.lhs)):
+                if self.variable(v) is not None and self.int_literal(c) is not None:
+                    return self.variable(v), self.int_literal(c)
+        if node.token == Token.OpMinus and self.variable(node.lhs) is not None \
+                and self.int_literal(node.rhs) is not None:
+            return self.variable(node.lhs), -self.int_literal(node.rhs)
+        return None
+
+    def length_minus(self, node):
+        """
+        Return (x, c) if node is 'len(x)' or 'len(x) - c' for an int literal c.
+        """
+        if self.length_of(node) is not None:
+            return self.length_of(node), 0
+        if isinstance(node, ast.OperatorExprNode) and node.token == Token.OpMinus and node.rhs is not None \
+                and self.length_of(node.lhs) is not None and self.int_literal(node.rhs) is not None:
+            return self.length_of(node.lhs), self.int_literal(node.rhs)
+        return None
+
+    def harmful_call(self, node):
+        """
+        Return True if evaluating node may change the length of a list.
+        """
+        for n in ast.walk(node):
+            if isinstance(n, ast.MethodCallExprNode):
+                return True
+            if isinstance(n, ast.FunctionCallExprNode) and (n.name not in SAFE_BUILTINS or n.name in self.rebound):
+                return True
+        return False
+
+    def forget_lengths(self):
+        if self.locals is None:
+            self.env = {}
+        else:
+            self.env = {key: value for key, value in self.env.items() if key[0] == 'lo' and key[1] in self.locals}
+
+    def forget(self, name):
+        self.env = {key: value for key, value in self.env.items() if name not in key[1:]}
+
+    def add(self, env, key, value):
+        if key[0] == 'up' and value < 0:
+            return
+        if key not in env or key[0] in {'lo', 'up', 'minlen'} and value > env[key] \
+                or key[0] == 'maxlen' and value < env[key]:
+            env[key] = value
+
+    def refine(self, env, expr):
+        """
+        Return env with the facts that hold when expr is true.
+        """
+        env = dict(env)
+        if not isinstance(expr, ast.OperatorExprNode) or expr.rhs is None:
+            return env
+        if expr.token == Token.OpAnd:
+            return self.refine(self.refine(env, expr.lhs), expr.rhs)
+        mirror = {Token.OpLt: Token.OpGt, Token.OpGt: Token.OpLt, Token.OpLtEq: Token.OpGtEq, Token.OpGtEq: Token.OpLtEq}
+        for lhs, token, rhs in ((expr.lhs, expr.token, expr.rhs), (expr.rhs, mirror.get(expr.token), expr.lhs)):
+            v = self.variable(lhs)
+            if v is None or token is None:
+                continue
+            if token in {Token.OpLt, Token.OpLtEq}:
+                strict = 1 if token == Token.OpLt else 0
+                # v < len(x) - c  =>  v + c < len(x);  v <= len(x) - c  =>  v + c - 1 < len(x)
+                bound = self.length_minus(rhs)
+                if bound is not None:
+                    self.add(env, ('up', v, bound[0]), bound[1] + strict - 1)
+                # v < n + d  =>  v - d + k + 1 <= n + k < len(x), if n + k < len(x)
+                offset = self.offset(rhs)
+                for key, value in list(env.items()):
+                    if offset is not None and key[0] == 'len' and key[1] == offset[0]:
+                        self.add(env, ('up', v, key[2]), strict - 1 - offset[1])
+                    if offset is not None and key[0] == 'up' and key[1] == offset[0]:
+                        self.add(env, ('up', v, key[2]), value + strict - offset[1])
+            elif token in {Token.OpGt, Token.OpGtEq}:
+                strict = 1 if token == Token.OpGt else 0
+                c = self.int_literal(rhs)
+                if c is not None:
+                    self.add(env, ('lo', v), c + strict)
+                n = self.variable(rhs)
+                if n is not None and ('lo', n) in env:
+                    self.add(env, ('lo', v), env[('lo', n)] + strict)
+        return env
+
+    def facts(self, name, expr):
+        """
+        Return the facts about name after 'name = expr', from the facts before.
+        """
+        env = {}
+        c = self.int_literal(expr)
+        if c is not None:
+            env[('lo', name)] = c
+            for key, value in self.env.items():
+                if key[0] == 'minlen':
+                    self.add(env, ('up', name, key[1]), value - 1 - c)
+        elif isinstance(expr, ast.ListExprNode):
+            env[('minlen', name)] = len(expr.expr_list)
+            env[('maxlen', name)] = len(expr.expr_list)
+        elif self.length_minus(expr) is not None:
+            x, c = self.length_minus(expr)
+            if c == 0:
+                env[('len', name, x)] = 0
+                env[('lo', name)] = 0
+            else:
+                env[('up', name, x)] = c - 1
+                env[('lo', name)] = -c
+        elif self.offset(expr) is not None:
+            v, c = self.offset(expr)
+            for key, value in self.env.items():
+                if key[0] == 'lo' and key[1] == v:
+                    env[('lo', name)] = value + c
+                elif key[0] == 'up' and key[1] == v:
+                    self.add(env, ('up', name, key[2]), value - c)
+                elif key[0] == 'len' and key[1] == v and c == 0:
+                    env[('len', name, key[2])] = 0
+                elif key[0] in {'minlen', 'maxlen'} and key[1] == v and c == 0:
+                    env[(key[0], name)] = value
+        return {key: value for key, value in env.items() if name not in key[2:]}
+
+    def proven(self, env, name, index):
+        if env is None:
+            return False
+        c = self.int_literal(index)
+        if c is not None:
+            return c >= 0 and env.get(('minlen', name), 0) > c
+        offset = self.offset(index)
+        if offset is None:
+            return False
+        v, c = offset
+        if ('lo', v) not in env or env[('lo', v)] + c < 0:
+            return False
+        if env.get(('up', v, name), -1) >= c:
+            return True
+        # v + k < len(y) <= m <= len(name) also bounds v by the length of name.
+        minlen = env.get(('minlen', name), 0)
+        return any(key[0] == 'up' and key[1] == v and ('maxlen', key[2]) in env
+                   and env[('maxlen', key[2])] - value + c <= minlen
+                   for key, value in env.items())
+
+    def annotate(self, node, env=None):
+        """
+        Set 'in_bounds' on the subscripted variables of an expression.
+        """
+        env = self.env if env is None else env
+        if node is None:
+            return
+        if isinstance(node, ast.OperatorExprNode) and node.token == Token.OpAnd and env is not None:
+            self.annotate(node.lhs, env)
+            self.annotate(node.rhs, self.refine(env, node.lhs))
+            return
+        if isinstance(node, (ast.VariableRValueExprNode, ast.VariableLValueNode)) and node.expr_list:
+            node.in_bounds = [index == 0 and self.proven(env, node.name, expr)
+                              for index, expr in enumerate(node.expr_list)]
+        for child in ast.iter_child_nodes(node):
+            self.annotate(child, env)
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        for stmt in node.stmts:
+            self.do_visit(stmt)
+
+    @visit.register
+    def _(self, node: ast.PassStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.BreakStmtNode):
+        if self.env is not None:
+            self.loops[-1][1].append(self.env)
+        self.env = None
+
+    @visit.register
+    def _(self, node: ast.ContinueStmtNode):
+        if self.env is not None:
+            self.loops[-1][0].append(self.env)
+        self.env = None
+
+    def expression(self, node):
+        if self.env is not None and self.harmful_call(node):
+            self.forget_lengths()
+        self.annotate(node)
+
+    @visit.register
+    def _(self, node: ast.AssignStmtNode):
+        if self.env is not None and (self.harmful_call(node.expr) or self.harmful_call(node.lvalue)):
+            self.forget_lengths()
+        self.annotate(node.expr)
+        self.annotate(node.lvalue)
+        # Storing into an element leaves the length of the list unchanged.
+        if self.env is not None and not node.lvalue.expr_list:
+            facts = self.facts(node.lvalue.name, node.expr)
+            self.forget(node.lvalue.name)
+            self.env.update(facts)
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        exits = []
+        for expr, block in node.expr_block_list:
+            self.expression(expr)
+            env = self.env
+            if block is None:
+                exits.append(env)
+            else:
+                self.env = self.refine(env, expr) if env is not None else None
+                self.do_visit(block)
+                exits.append(self.env)
+                self.env = env
+        self.env = self.join(*exits)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        self.expression(node.expr)
+        env = self.env
+        exits = [] if node.default is not None else [env]
+        for block in node.blocks + [node.default]:
+            if block is not None:
+                self.env = dict(env) if env is not None else None
+                self.do_visit(block)
+                exits.append(self.env)
+        self.env = self.join(*exits)
+
+    @visit.register
+    def _(self, node: ast.VectorLoopStmtNode):
+        self.do_visit(node.loop)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        head, passes = self.env, 0
+        while True:
+            self.env = head
+            self.expression(node.expr)
+            test = self.env
+            self.env = self.refine(test, node.expr) if test is not None else None
+            self.loops.append(([], []))
+            self.do_visit(node.block)
+            continues, breaks = self.loops.pop()
+            new_head = self.join(head, self.env, *continues)
+            passes += 1
+            if passes >= self.max_passes and new_head is not None:
+                # Widening: drop the facts that are still changing.
+                new_head = {key: value for key, value in new_head.items() if head.get(key) == value}
+            if new_head == head:
+                break
+            head = new_head
+        self.env = self.join(test, *breaks)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        if self.env is not None:
+            self.forget(node.name)
+
+    @visit.register
+    def _(self, node: ast.ReturnStmtNode):
+        self.expression(node.expr)
+        self.env = None
+
+    @visit.register
+    def _(self, node: ast.ExprNode):
+        self.expression(node)
+
+
+def bounds_stats(node_ast_root):
+    """
+    Return (subscripts, proven in range) over an already analysed tree.
+    """
+    total = proven = 0
+    for node in ast.walk(node_ast_root):
+        in_bounds = getattr(node, 'in_bounds', None)
+        if in_bounds is not None:
+            total += len(in_bounds)
+            proven += sum(in_bounds)
+    return total, proven
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import json
+import os
+from hon.ast_cache import ASTCache
+from hon.parser import SyntaxErrorException
+from hon.pipeline_stats import PipelineStats
+import hon.print_visitor as print_visitor
+from hon.symtab_visitor import SymbolTableVisitor
+
+# Requests and responses are single lines of JSON, e.g.
+#   {"op": "analyze", "name": "test/test_08.py", "source": "..."}
+#   {"ok": true, "output": "..."}
+# Other ops are "ping", "stats", which returns the counters of the cache and,
+# once enabled, the phase timings and counts, "metrics", which returns the
+# latter in the Prometheus text format, and "shutdown"; a failed request gets
+#   {"ok": false, "error": "..."}
+
+# Programs analysed before are not parsed again; only the others count in stats.
+stats = PipelineStats(enabled=False)
+cache = ASTCache(pipeline_stats=stats)
+
+
+def default_socket_path():
+    return os.environ.get('HON_SOCKET') or \
+        os.path.join(os.environ.get('TMPDIR', '/tmp'), f'hon-compile-{os.getuid()}.sock')
+
+
+def analyze(source):
+    """
+    Return what main.py prints for a HON program, without the parser's trace:
+    its tree and its symbol tables, or the syntax error.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            as_tree, st = cache.get(source)
+            with stats.phase('visit'):
+                visitor = print_visitor.PrintVisitor()
+                visitor.visit(as_tree)
+            SymbolTableVisitor().disp_table(st)
+        except SyntaxErrorException as e:
+            print('SyntaxError:', e.message, e.location)
+    return output.getvalue()
+
+
+def handle(request):
+    """
+    Return the response to a request, as a dict.
+    """
+    op = request.get('op')
+    if op == 'ping':
+        return {'ok': True, 'pid': os.getpid()}
+    if op == 'shutdown':
+        return {'ok': True}
+    if op == 'stats':
+        response = {'ok': True, 'cache': cache.stats()}
+        if stats.enabled:
+            response['pipeline'] = stats.as_dict()
+        return response
+    if op == 'metrics':
+        return {'ok': True, 'metrics': stats.to_prometheus()}
+    if op == 'analyze':
+        if not isinstance(request.get('source'), str):
+            return {'ok': False, 'error': "'source' must be a string"}
+        return {'ok': True, 'output': analyze(request['source'])}
+    return {'ok': False, 'error': f'unknown op {op!r}'}
+
+
+def encode(message):
+    return (json.dumps(message) + '\n').encode()
+
+
+def decode(line):
+    return json.loads(line.decode())
@@ -0,0 +1,247 @@
+import random
+
+# Indentation styles: the indentation a block adds, or None for a random one
+# of 1 to 8 spaces per block, which the lexer accepts as long as the lines of
+# a block agree.
+INDENTS = {'spaces': '    ', 'two-spaces': '  ', 'tabs': '\t', 'mixed': None}
+
+# Binary operators, besides 'or' and 'and', by the rule of the grammar that
+# parses them.
+COMPARISONS = ['<', '>', '==', '>=', '<=', '!=']
+ARITHMETIC = ['+', '-']
+TERMS = ['*', '/', '%', '//']
+
+NAMES = ['a', 'b', 'count', 'total', 'i', 'n', 'x', 'y', 'value', 'items', 'result', 'flag', '_tmp', 'k2']
+METHODS = ['append', 'pop', 'get', 'update', 'index']
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'HON', 'hello world', '', '42', 'a b c']
+FLOATS = ['1.5', '0.25', '.5', '3.0', '1e3', '2.5e-3', '6E2', '1.0e+2']
+
+
+class ProgramGenerator:
+    """
+    Generates valid HON programs at random, each statement and expression of
+    the grammar hon.parser accepts: defs, if/elif/else and while at every
+    nesting depth, blocks on their own lines or after the colon, statements
+    joined by semicolons, assignments to variables and elements, calls of
+    functions and methods as statements and in expressions, return, pass,
+    break and continue, every operator, parentheses, lists and every kind of
+    literal, as well as comments, blank lines and lists and argument lists
+    broken over lines.
+
+    The programs are about size lines long: functions defs of which the
+    statements nest blocks up to depth deep, with expressions of up to
+    expr_length operands, indented in one of INDENTS. The same seed gives the
+    same program.
+    """
+
+    def __init__(self, seed=0, size=1000, functions=20, depth=3, expr_length=6, indent='spaces'):
+        self.random = random.Random(seed)
+        self.size = size
+        self.functions = functions
+        self.depth = depth
+        self.expr_length = expr_length
+        self.indent = INDENTS[indent]
+        self.lines = []
+
+    def generate(self):
+        """
+        Return the text of a program.
+        """
+        self.lines = []
+        # Each def takes most of its share of the lines, and top-level statements the rest.
+        share = self.size // (self.functions + 1)
+        for n in range(self.functions):
+            start = len(self.lines)
+            self.function_def(f'function{n}', start + share * 4 // 5)
+            self.statements('', start + share, self.depth, {})
+        self.statements('', self.size, self.depth, {})
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, margin, text):
+        self.lines.append(margin + text)
+        if self.random.random() < 0.05:
+            self.lines.append(margin + '# ' + self.random.choice(WORDS))
+        if self.random.random() < 0.03:
+            self.lines.append('')
+
+    def block_indent(self, margin):
+        if self.indent is not None:
+            return margin + self.indent
+        return margin + ' ' * self.random.randint(1, 8)
+
+    def function_def(self, name, end):
+        params = self.random.sample(NAMES, self.random.randint(1, 4))
+        self.emit('', 'def {}({}):'.format(name, ', '.join(params)))
+        margin = self.block_indent('')
+        self.statements(margin, max(end, len(self.lines) + 1), self.depth - 1, {'def': True})
+        self.emit(margin, 'return' if self.random.random() < 0.2 else 'return ' + self.expression())
+        self.lines.append('')
+
+    def statements(self, margin, end, depth, context):
+        """
+        Emit statements at margin until there are end lines.
+        """
+        while len(self.lines) < end:
+            self.statement(margin, end, depth, context)
+
+    def statement(self, margin, end, depth, context):
+        choice = self.random.random()
+        if depth > 0 and choice < 0.2:
+            self.if_stmt(margin, end, depth, context)
+        elif depth > 0 and choice < 0.3:
+            self.while_stmt(margin, end, depth, context)
+        else:
+            stmts = [self.small_stmt(context) for _ in range(self.random.choice([1, 1, 1, 1, 2, 3]))]
+            self.emit(margin, '; '.join(stmts) + (';' if self.random.random() < 0.02 else ''))
+
+    def small_stmt(self, context):
+        choice = self.random.random()
+        if choice < 0.03:
+            return 'pass'
+        if choice < 0.06 and context.get('loop'):
+            return self.random.choice(['break', 'continue'])
+        if choice < 0.09 and context.get('def'):
+            return 'return ' + self.expression()
+        if choice < 0.17:
+            return self.call()
+        if choice < 0.22:
+            return self.method_call()
+        return '{} = {}'.format(self.variable(), self.expression())
+
+    def block(self, header, margin, end, depth, context):
+        """
+        Emit a compound statement's header and its block: on the same line
+        as the colon, or indented below it, of up to end lines.
+        """
+        if self.random.random() < 0.15:
+            self.emit(margin, header + ' ' + '; '.join(self.small_stmt(context)
+                                                        for _ in range(self.random.randint(1, 2))))
+            return
+        self.emit(margin, header)
+        inner = self.block_indent(margin)
+        last = min(end, len(self.lines) + self.random.randint(1, 8))
+        self.statement(inner, last, depth - 1, context)
+        self.statements(inner, last, depth - 1, context)
+
+    def if_stmt(self, margin, end, depth, context):
+        self.block(f'if {self.expression()}:', margin, end, depth, context)
+        for _ in range(self.random.choice([0, 0, 1, 2])):
+            self.block(f'elif {self.expression()}:', margin, end, depth, context)
+        if self.random.random() < 0.5:
+            self.block('else:', margin, end, depth, context)
+
+    def while_stmt(self, margin, end, depth, context):
+        self.block(f'while {self.expression()}:', margin, end, depth, dict(context, loop=True))
+
+    def expression(self):
+        return self.or_expr(self.random.randint(1, self.expr_length))
+
+    def split(self, n):
+        left = self.random.randint(1, n - 1)
+        return left, n - left
+
+    # One method per rule of the grammar, each given how many operands to use.
+
+    def or_expr(self, n):
+        if n > 1 and self.random.random() < 0.1:
+            left, right = self.split(n)
+            return f'{self.or_expr(left)} or {self.and_expr(right)}'
+        return self.and_expr(n)
+
+    def and_expr(self, n):
+        if n > 1 and self.random.random() < 0.1:
+            left, right = self.split(n)
+            return f'{self.and_expr(left)} and {self.not_expr(right)}'
+        return self.not_expr(n)
+
+    def not_expr(self, n):
+        if self.random.random() < 0.05:
+            return 'not ' + self.not_expr(n)
+        return self.comparison(n)
+
+    def comparison(self, n):
+        if n > 1 and self.random.random() < 0.3:
+            left, right = self.split(n)
+            return f'{self.arithmetic(left)} {self.random.choice(COMPARISONS)} {self.arithmetic(right)}'
+        return self.arithmetic(n)
+
+    def arithmetic(self, n):
+        if n > 1 and self.random.random() < 0.5:
+            left, right = self.split(n)
+            return f'{self.arithmetic(left)} {self.random.choice(ARITHMETIC)} {self.term(right)}'
+        return self.term(n)
+
+    def term(self, n):
+        if n > 1 and self.random.random() < 0.5:
+            left, right = self.split(n)
+            return f'{self.term(left)} {self.random.choice(TERMS)} {self.factor(right)}'
+        return self.factor(n)
+
+    def factor(self, n):
+        if self.random.random() < 0.05:
+            return self.random.choice(ARITHMETIC) + self.factor(n)
+        return self.power(n)
+
+    def power(self, n):
+        if n > 1 and self.random.random() < 0.1:
+            left, right = self.split(n)
+            return f'{self.atom(left)} ** {self.factor(right)}'
+        return self.atom(n)
+
+    def atom(self, n):
+        if n > 1:
+            choice = self.random.random()
+            if choice < 0.4:
+                return f'({self.or_expr(n)})'
+            if choice < 0.6:
+                return '[{}]'.format(self.expr_list(n))
+            if choice < 0.8:
+                return self.call(n)
+            if choice < 0.9:
+                return self.method_call(n)
+            return '{}[{}]'.format(self.random.choice(NAMES), self.or_expr(n))
+        choice = self.random.random()
+        if choice < 0.4:
+            return self.random.choice(NAMES)
+        if choice < 0.65:
+            return str(self.random.randint(0, 1000))
+        if choice < 0.75:
+            return self.random.choice(FLOATS)
+        if choice < 0.85:
+            return self.random.choice('\'"').join(['', self.random.choice(WORDS), ''])
+        if choice < 0.95:
+            return self.random.choice(['True', 'False', 'None'])
+        return self.random.choice(['[]', f'{self.random.choice(NAMES)}()'])
+
+    def expr_list(self, n):
+        """
+        Return n operands split among a list of expressions, broken over
+        lines now and then, which the lexer allows within brackets.
+        """
+        exprs = []
+        while n > 0:
+            size = self.random.randint(1, n)
+            exprs.append(self.or_expr(size))
+            n -= size
+        separator = ',\n        ' if len(exprs) > 2 and self.random.random() < 0.2 else ', '
+        return separator.join(exprs)
+
+    def call(self, n=None):
+        n = n if n is not None else self.random.randint(1, self.expr_length)
+        name = self.random.choice(['print', 'len', 'f', 'helper', 'compute'])
+        if self.random.random() < 0.1:
+            return f'{name}()'
+        return f'{name}({self.expr_list(n)})'
+
+    def method_call(self, n=None):
+        n = n if n is not None else self.random.randint(1, self.expr_length)
+        name, method = self.random.choice(NAMES), self.random.choice(METHODS)
+        if self.random.random() < 0.1:
+            return f'{name}.{method}()'
+        return f'{name}.{method}({self.expr_list(n)})'
+
+    def variable(self):
+        name = self.random.choice(NAMES)
+        for _ in range(self.random.choice([0, 0, 0, 1, 2])):
+            name += '[{}]'.format(self.or_expr(self.random.randint(1, 2)))
+        return name
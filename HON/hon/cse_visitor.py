@@ -0,0 +1,258 @@
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+
+
+class _Value:
+    """
+    A value number that is available in the current basic block, together with
+    the expression that first computed it and the number of times it is used.
+    """
+
+    def __init__(self, vn, node, stmt_index):
+        self.vn = vn
+        self.node = node
+        self.stmt_index = stmt_index
+        self.count = 1
+        self.temp = None
+
+
+class CSEVisitor(visitor.Visitor):
+    """
+    Local common subexpression elimination (local value numbering).
+
+    Each basic block, i.e. a maximal run of simple statements inside a
+    BlockStmtNode, is scanned once in evaluation order. Side-effect-free
+    OperatorExprNode and subscripted VariableRValueExprNode subtrees are
+    hash-consed into value numbers; a value computed more than once while it is
+    still available is stored in a temporary, which the other occurrences read.
+    Assigning to a variable gives it a new version, so values built from the
+    old version are no longer found. Calls invalidate everything.
+    """
+
+    def __init__(self, prefix='_cse'):
+        self.prefix = prefix
+        self.eliminated = 0
+        self.table = {}
+        self.constants = set()
+
+    def optimize(self, node_ast_root):
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    def value_number(self, key):
+        vn = self.table.get(key)
+        if vn is None:
+            vn = len(self.table)
+            self.table[key] = vn
+        return vn
+
+    def kill_all(self):
+        self.avail.clear()
+        self.heap += 1
+        self.hoistable = False
+
+    def kill(self, name, heap=False):
+        self.versions[name] = self.versions.get(name, 0) + 1
+        if heap:
+            self.heap += 1
+
+    def record(self, node, vn, hoist, mark):
+        value = self.avail.get(vn)
+        if value is not None:
+            # The whole subtree is reused, so occurrences inside it are not.
+            while len(self.trail) > mark:
+                inner = self.occurrences.pop(self.trail.pop())
+                inner.count -= 1
+                if inner.count == 0:
+                    self.avail.pop(inner.vn, None)
+            value.count += 1
+        elif hoist and self.hoistable:
+            value = _Value(vn, node, self.stmt_index)
+            self.avail[vn] = value
+            self.values.append(value)
+        else:
+            return
+        self.occurrences[id(node)] = value
+        self.trail.append(id(node))
+
+    def eliminate(self, stmts):
+        """
+        Number the expressions of one basic block and return its statements
+        with temporaries inserted for the values that are computed repeatedly.
+        """
+        if not stmts:
+            return []
+        self.avail, self.versions, self.heap = {}, {}, 0
+        self.values, self.occurrences, self.trail = [], {}, []
+        for self.stmt_index, stmt in enumerate(stmts):
+            self.hoistable = True
+            self.number_stmt(stmt)
+
+        temps = 0
+        # The values given a temporary, by the statement before which it is assigned.
+        temps_before = {}
+        for value in self.values:
+            if value.count > 1:
+                value.temp = f'{self.prefix}{temps}'
+                temps += 1
+                self.eliminated += value.count - 1
+                temps_before.setdefault(value.stmt_index, []).append(value)
+
+        result = []
+        for index, stmt in enumerate(stmts):
+            for value in temps_before.get(index, ()):
+                self.substitute_children(value.node)
+                lvalue = ast.VariableLValueNode(value.temp, [])
+                result.append(ast.AssignStmtNode(lvalue, value.node))
+            result.append(self.substitute(stmt))
+        return result
+
+    def number_stmt(self, stmt):
+        if isinstance(stmt, ast.AssignStmtNode):
+            self.number(stmt.expr, True, True)
+            for expr in stmt.lvalue.expr_list:
+                self.number(expr, True, False)
+            self.kill(stmt.lvalue.name, heap=bool(stmt.lvalue.expr_list))
+        elif isinstance(stmt, ast.ReturnStmtNode):
+            if stmt.expr:
+                self.number(stmt.expr, True, True)
+        elif isinstance(stmt, ast.ExprNode):
+            self.number(stmt, True, True)
+
+    @functools.singledispatchmethod
+    def number(self, node, hoist, escapes):
+        """
+        Return the value number of an expression, or None if it has side
+        effects or creates a new object.
+        """
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @number.register
+    def _(self, node: ast.ValueExprNode, hoist, escapes):
+        vn = self.value_number(('value', type(node.value), node.value))
+        self.constants.add(vn)
+        return vn
+
+    @number.register
+    def _(self, node: ast.VariableRValueExprNode, hoist, escapes):
+        mark = len(self.trail)
+        vns = [self.number(expr, hoist, False) for expr in node.expr_list]
+        if not vns:
+            return self.value_number(('name', node.name, self.versions.get(node.name, 0)))
+        if None in vns:
+            return None
+        vn = self.value_number(('subscript', node.name, self.versions.get(node.name, 0), self.heap, tuple(vns)))
+        self.record(node, vn, hoist, mark)
+        return vn
+
+    @number.register
+    def _(self, node: ast.OperatorExprNode, hoist, escapes):
+        mark = len(self.trail)
+        lhs = self.number(node.lhs, hoist, False)
+        if node.rhs is None:
+            rhs = -1
+        elif node.token in {Token.OpAnd, Token.OpOr}:
+            # The right operand is only evaluated conditionally.
+            rhs = self.number(node.rhs, False, False)
+        else:
+            rhs = self.number(node.rhs, hoist, False)
+        if lhs is None or rhs is None:
+            return None
+        vn = self.value_number(('op', node.token, lhs, rhs))
+        if lhs in self.constants and (rhs == -1 or rhs in self.constants):
+            self.constants.add(vn)
+        elif escapes and node.token in {Token.OpPlus, Token.OpMultiply}:
+            # Could be a fresh list, which must not be shared between targets.
+            pass
+        else:
+            self.record(node, vn, hoist, mark)
+        return vn
+
+    @number.register
+    def _(self, node: ast.ListExprNode, hoist, escapes):
+        for expr in node.expr_list:
+            self.number(expr, hoist, True)
+        return None
+
+    @number.register
+    def _(self, node: ast.FunctionCallExprNode, hoist, escapes):
+        for expr in node.expr_list:
+            self.number(expr, hoist, True)
+        self.kill_all()
+        return None
+
+    @number.register
+    def _(self, node: ast.MethodCallExprNode, hoist, escapes):
+        for expr in node.expr_list:
+            self.number(expr, hoist, True)
+        self.kill(node.name, heap=True)
+        self.hoistable = False
+        return None
+
+    def substitute(self, node):
+        value = self.occurrences.get(id(node))
+        if value is not None and value.temp is not None:
+            return ast.VariableRValueExprNode(value.temp, [])
+        self.substitute_children(node)
+        return node
+
+    def substitute_children(self, node):
+        if isinstance(node, ast.AssignStmtNode):
+            node.lvalue.expr_list = [self.substitute(expr) for expr in node.lvalue.expr_list]
+            node.expr = self.substitute(node.expr)
+        elif isinstance(node, ast.ReturnStmtNode):
+            if node.expr:
+                node.expr = self.substitute(node.expr)
+        elif isinstance(node, ast.OperatorExprNode):
+            node.lhs = self.substitute(node.lhs)
+            if node.rhs:
+                node.rhs = self.substitute(node.rhs)
+        elif isinstance(node, (ast.VariableRValueExprNode, ast.ListExprNode,
+                               ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+            node.expr_list = [self.substitute(expr) for expr in node.expr_list]
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts, run = [], []
+        for stmt in node.stmts:
+            if isinstance(stmt, (ast.IfStmtNode, ast.SwitchStmtNode, ast.WhileStmtNode,
+                                 ast.FunctionDefStmtNode)):
+                stmts.extend(self.eliminate(run))
+                run = []
+                self.do_visit(stmt)
+                stmts.append(stmt)
+            else:
+                run.append(stmt)
+        stmts.extend(self.eliminate(run))
+        node.stmts = stmts
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        for expr, block in node.expr_block_list:
+            self.do_visit(block)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        for block in node.blocks:
+            self.do_visit(block)
+        self.do_visit(node.default)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        self.do_visit(node.block)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        self.do_visit(node.block)
@@ -0,0 +1,261 @@
+import bisect
+import contextlib
+import io
+import itertools
+import hon.hast as ast
+from hon.incremental_parser import unit_starts
+from hon.interpreter import BUILTINS
+from hon.lexer import Lexer, Token
+from hon.parser import Parser, SyntaxErrorException
+import hon.symbol_table as st
+from hon.symtab_visitor import SymbolTableVisitor
+
+
+def identifiers(tokens):
+    """
+    Yield (token, binds) for each identifier among tokens, a list of
+    TokenTuples, where binds is True where the name is bound: the name of a
+    def, a parameter or the target of a plain assignment.
+    """
+    in_params = False
+    for index, token in enumerate(tokens):
+        if token.token == Token.ParenthesisR:
+            in_params = False
+        if token.token != Token.Identifier:
+            continue
+        after_def = index > 0 and tokens[index - 1].token == Token.KwDef
+        following = tokens[index + 1].token if index + 1 < len(tokens) else None
+        yield token, after_def or in_params or following == Token.OpAssign
+        if after_def and following == Token.ParenthesisL:
+            in_params = True
+
+
+class Chunk:
+    """
+    One top-level statement of a document, or a run of them on one line, with
+    what the Document needs to know about it. Locations are (line, col) pairs
+    counted from 0 within the chunk.
+
+    tree is the list of statements parsed from it, symtable their symbol
+    table, and error a (message, location) pair when they could not be parsed.
+    identifiers holds every identifier in it with its location, and bindings
+    the location of the first binding of each name: the name of a def, a
+    parameter or the target of a plain assignment. If the chunk is a def, name
+    is its name, even when it does not parse, fn the FunctionDefStmtNode and
+    local_names its parameters and locals. used holds the names it reads, for
+    a def only those that are not local.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.lines = text.count('\n')
+        self.tree = []
+        self.error = None
+        try:
+            # The parser traces some of what it parses on stdout.
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.tree = Parser(io.StringIO(text)).parse().stmts
+        except SyntaxErrorException as e:
+            self.error = e.message, self.position(e.location)
+        except Exception as e:
+            self.error = f'{type(e).__name__}: {e}', (0, 0)
+        self.symtable = SymbolTableVisitor().create_symtable(ast.BlockStmtNode(self.tree))
+        self.identifiers = []
+        self.bindings = {}
+        self.name = None
+        for name, location, binds in self.scan():
+            self.identifiers.append((name, location))
+            if binds:
+                self.bindings.setdefault(name, location)
+        self.fn = None
+        self.local_names = set()
+        if len(self.tree) == 1 and isinstance(self.tree[0], ast.FunctionDefStmtNode):
+            self.fn = self.tree[0]
+            self.local_names = set(self.fn.params) | ast.bound_names(self.fn.block)
+        elif self.name is not None:
+            # A def that does not parse: its other bindings are probably local.
+            self.local_names = set(self.bindings) - {self.name}
+        self.used = set()
+        for node in ast.walk(ast.BlockStmtNode(self.tree)):
+            if isinstance(node, (ast.VariableRValueExprNode, ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+                self.used.add(node.name)
+        self.used -= self.local_names
+
+    def position(self, location):
+        return min(location.line - 1, max(self.lines - 1, 0)), max(location.col - 1, 0)
+
+    def scan(self):
+        """
+        Yield (name, location, binds) for each identifier of the chunk, up to the
+        first lexical error, where binds is True where the name is bound.
+        """
+        tokens = []
+        lexer = Lexer(io.StringIO(self.text))
+        try:
+            token = lexer.next()
+            while token.token != Token.EOI:
+                tokens.append(token)
+                token = lexer.next()
+        except SyntaxErrorException:
+            pass
+        for index, (token, binds) in enumerate(identifiers(tokens)):
+            if binds and index == 0 and tokens[0].token == Token.KwDef:
+                self.name = token.lexeme
+            yield token.lexeme, self.position(token.location), binds
+
+
+class Document:
+    """
+    A HON program being edited, split into Chunks at the lines that start a
+    top-level statement. An edit only parses the chunks whose text it changed;
+    the others, wherever they moved to, keep their trees and symbol tables.
+    Lines and columns are counted from 0, as in the Language Server Protocol.
+
+    'parsed' counts the chunks parsed so far.
+    """
+
+    def __init__(self, text=''):
+        self.lines = text.split('\n')
+        self.chunks = []
+        self.starts = []
+        self.parsed = 0
+        self.update()
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    def edit(self, start, end, text):
+        """
+        Replace the text from start to end, (line, col) pairs, by text.
+        """
+        (start_line, start_col), (end_line, end_col) = start, end
+        prefix = self.lines[start_line][:start_col] if start_line < len(self.lines) else ''
+        suffix = self.lines[end_line][end_col:] if end_line < len(self.lines) else ''
+        count = len(self.lines)
+        self.lines[start_line:end_line + 1] = (prefix + text + suffix).split('\n')
+        shift = len(self.lines) - count
+        self.update(start_line, end_line + shift, shift)
+
+    def replace(self, text):
+        self.lines = text.split('\n')
+        self.update()
+
+    def update(self, first=0, last=None, shift=0):
+        """
+        Split the lines into chunks, the units of incremental_parser, reusing
+        the Chunk of every unchanged text.
+
+        If only lines first to last changed, and those after them moved by
+        shift lines, the lines are only split again from the chunk before the
+        one at first, up to the first chunk after last that starts where one
+        did before; the chunks from there on are kept.
+        """
+        index = max(bisect.bisect_right(self.starts, first) - 2, 0) if last is not None else 0
+        old_chunks, old_starts = self.chunks[index:], self.starts[index:]
+        known = {chunk.text: chunk for chunk in old_chunks}
+        del self.chunks[index:], self.starts[index:]
+        starts = unit_starts(self.lines, old_starts[0] if old_starts else 0)
+        begin = next(starts)
+        for end in itertools.chain(starts, [len(self.lines)]):
+            if last is not None and begin > last:
+                kept = bisect.bisect_left(old_starts, begin - shift)
+                if kept < len(old_starts) and old_starts[kept] == begin - shift:
+                    self.chunks += old_chunks[kept:]
+                    self.starts += [start + shift for start in old_starts[kept:]]
+                    break
+            text = '\n'.join(self.lines[begin:end]) + '\n'
+            chunk = known.get(text)
+            if chunk is None:
+                chunk = known[text] = Chunk(text)
+                self.parsed += 1
+            self.chunks.append(chunk)
+            self.starts.append(begin)
+            begin = end
+        self.names = {}
+        for start, chunk in zip(self.starts, self.chunks):
+            if chunk.name is not None:
+                self.names.setdefault(chunk.name, (start, chunk.bindings[chunk.name]))
+            else:
+                for name, location in chunk.bindings.items():
+                    self.names.setdefault(name, (start, location))
+
+    def tree(self):
+        return ast.BlockStmtNode([stmt for chunk in self.chunks for stmt in chunk.tree])
+
+    def symtable(self):
+        """
+        Return the symbol table of the whole program, made of those of the chunks.
+        """
+        table = st.SymbolTable('top', 'module')
+        for chunk in self.chunks:
+            for symbol in chunk.symtable.get_symbols():
+                table.add_entry(symbol)
+            for child in chunk.symtable.get_children():
+                table.add_child(child)
+        return table
+
+    def chunk_at(self, line):
+        index = max(bisect.bisect_right(self.starts, line) - 1, 0)
+        return self.starts[index], self.chunks[index]
+
+    @staticmethod
+    def absolute(start, location):
+        return start + location[0], location[1]
+
+    def diagnostics(self):
+        """
+        Return (severity, message, start, end) for each syntax error and each
+        use of a name that is bound nowhere; severity is 1 for an error and 2
+        for a warning.
+        """
+        diagnostics = []
+        for start, chunk in zip(self.starts, self.chunks):
+            if chunk.error is not None:
+                message, location = chunk.error
+                line, col = self.absolute(start, location)
+                diagnostics.append((1, message, (line, col), (line, col + 1)))
+            undefined = {name for name in chunk.used if name not in self.names and name not in BUILTINS}
+            for name, location in chunk.identifiers:
+                if name in undefined:
+                    line, col = self.absolute(start, location)
+                    diagnostics.append((2, f"name '{name}' is not defined", (line, col), (line, col + len(name))))
+        return diagnostics
+
+    def symbols(self):
+        """
+        Return (name, kind, start line, end line, location of the name) for each
+        def and each global variable, in order; kind is 'function' or 'variable'.
+        """
+        symbols = []
+        for start, chunk in zip(self.starts, self.chunks):
+            end = start + max(chunk.lines - 1, 0)
+            if chunk.name is not None:
+                location = self.absolute(start, chunk.bindings[chunk.name])
+                symbols.append((chunk.name, 'function', start, end, location))
+                continue
+            for name, location in chunk.bindings.items():
+                if self.names.get(name) == (start, location):
+                    symbols.append((name, 'variable', start, end, self.absolute(start, location)))
+        return symbols
+
+    def identifier_at(self, line, col):
+        start, chunk = self.chunk_at(line)
+        for name, (name_line, name_col) in chunk.identifiers:
+            if start + name_line == line and name_col <= col <= name_col + len(name):
+                return start, chunk, name
+        return start, chunk, None
+
+    def definition(self, line, col):
+        """
+        Return the location where the name at (line, col) is bound first, as a
+        parameter or local of the def it is in or else globally, or None.
+        """
+        start, chunk, name = self.identifier_at(line, col)
+        if name is None:
+            return None
+        if name in chunk.local_names and name in chunk.bindings:
+            return self.absolute(start, chunk.bindings[name])
+        if name in self.names:
+            return self.absolute(*self.names[name])
+        return None
@@ -1,5 +1,13 @@
+import hashlib
+
+
 class Node:
-    pass
+    def structural_hash(self, digests=None):
+        """
+        Return a digest of the structure of the subtree rooted at this node,
+        the same for equal subtrees in any process. See structural_hash().
+        """
+        return structural_hash(self, digests)
 
 
 class VariableLValueNode(Node):
@@ -31,6 +39,17 @@ class IfStmtNode(StmtNode):
         return
 
 
+# Runs blocks[cases[value of expr]], or default (may be None) if no case key equals
+# the value or the value is not hashable. Produced by SwitchLoweringVisitor.
+class SwitchStmtNode(StmtNode):
+    def __init__(self, expr, cases, blocks, default=None):
+        self.expr = expr
+        self.cases = cases
+        self.blocks = blocks
+        self.default = default
+        return
+
+
 class WhileStmtNode(StmtNode):
     def __init__(self, expr, block):
         self.expr = expr
@@ -38,6 +57,19 @@ class WhileStmtNode(StmtNode):
         return
 
 
+# The counted loop 'while index < bound', whose body is the element-wise list
+# assignments assigns followed by 'index = index + 1', run as whole-list
+# operations. loop is the original WhileStmtNode, run instead when that is not
+# possible. Produced by VectorizeVisitor.
+class VectorLoopStmtNode(StmtNode):
+    def __init__(self, index, bound, assigns, loop):
+        self.index = index
+        self.bound = bound
+        self.assigns = assigns
+        self.loop = loop
+        return
+
+
 class AssignStmtNode(StmtNode):
     def __init__(self, lvalue, expr):
         self.lvalue = lvalue
@@ -109,3 +141,217 @@ class MethodCallExprNode(ExprNode):
         self.method = method
         self.expr_list = expr_list
         return
+
+
+def iter_child_nodes(node):
+    """
+    Yield the direct child nodes of node, in source order.
+    """
+    if isinstance(node, (VariableLValueNode, VariableRValueExprNode, ListExprNode,
+                         FunctionCallExprNode, MethodCallExprNode)):
+        yield from node.expr_list
+    elif isinstance(node, IfStmtNode):
+        for expr, block in node.expr_block_list:
+            yield expr
+            if block is not None:
+                yield block
+    elif isinstance(node, SwitchStmtNode):
+        yield node.expr
+        yield from node.blocks
+        if node.default is not None:
+            yield node.default
+    elif isinstance(node, WhileStmtNode):
+        yield node.expr
+        yield node.block
+    elif isinstance(node, VectorLoopStmtNode):
+        yield node.loop
+    elif isinstance(node, AssignStmtNode):
+        yield node.lvalue
+        yield node.expr
+    elif isinstance(node, BlockStmtNode):
+        yield from node.stmts
+    elif isinstance(node, FunctionDefStmtNode):
+        yield node.block
+    elif isinstance(node, ReturnStmtNode):
+        if node.expr is not None:
+            yield node.expr
+    elif isinstance(node, OperatorExprNode):
+        yield node.lhs
+        if node.rhs is not None:
+            yield node.rhs
+
+
+def bound_names(node):
+    """
+    Return the names that plain assignments within node bind. Storing into an
+    element, as in 'x[0] = 1', does not bind x.
+    """
+    return {n.lvalue.name for n in walk(node) if isinstance(n, AssignStmtNode) and not n.lvalue.expr_list}
+
+
+def walk(node):
+    """
+    Yield node and all of its descendants, in pre-order.
+    """
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        yield node
+        todo.extend(reversed(list(iter_child_nodes(node))))
+
+
+def fields(node):
+    """
+    Return what tells node apart from other nodes of its class with the same
+    children, as a string.
+    """
+    if isinstance(node, ValueExprNode):
+        return f'{type(node.value).__name__}:{node.value!r}'
+    if isinstance(node, OperatorExprNode):
+        return f'{node.token.name}:{node.rhs is None}'
+    if isinstance(node, FunctionDefStmtNode):
+        return f'{node.name}({",".join(node.params)})'
+    if isinstance(node, MethodCallExprNode):
+        return f'{node.name}.{node.method}'
+    if isinstance(node, (VariableLValueNode, VariableRValueExprNode, FunctionCallExprNode)):
+        return node.name
+    if isinstance(node, IfStmtNode):
+        return ''.join('-' if block is None else 'b' for _, block in node.expr_block_list)
+    if isinstance(node, SwitchStmtNode):
+        cases = [(type(key).__name__, key, index) for key, index in node.cases.items()]
+        return f'{cases!r}:{node.default is None}'
+    if isinstance(node, VectorLoopStmtNode):
+        return node.index
+    return ''
+
+
+def structural_hash(node, digests=None):
+    """
+    Return a 16-byte BLAKE2 digest of the class and fields of node and the
+    digests of its children, computed bottom-up. Annotations left by analyses
+    are not part of it.
+
+    digests, if given, maps nodes to the digests already computed, and the
+    digests computed are added to it, so that only nodes not in it are
+    hashed; a weakref.WeakKeyDictionary does not keep the nodes alive. Its
+    owner must forget_hashes() of a tree that was changed in place since.
+    """
+    if digests is None:
+        digests = {}
+    if node in digests:
+        return digests[node]
+    todo = [(node, None)]
+    while todo:
+        current, children = todo.pop()
+        if children is not None:
+            digest = hashlib.blake2b(f'{type(current).__name__}\0{fields(current)}\0'.encode(), digest_size=16)
+            for child in children:
+                digest.update(digests[child])
+            digests[current] = digest.digest()
+        elif current not in digests:
+            children = list(iter_child_nodes(current))
+            todo.append((current, children))
+            todo.extend((child, None) for child in children)
+    return digests[node]
+
+
+def forget_hashes(node, digests):
+    """
+    Remove node and its descendants from digests, see structural_hash().
+    """
+    for n in walk(node):
+        digests.pop(n, None)
+
+
+def diff(old, new, digests=None):
+    """
+    Return the smallest subtrees that differ between two trees, as (old, new)
+    pairs in source order, with None for a statement that was removed or
+    added; a removed statement comes after those that stood before it.
+    Subtrees with equal digests are not looked into, so with the digests of
+    the trees already computed, and as the incremental parser reuses the
+    nodes of what an edit did not touch, the work is proportional to what
+    changed. digests is as for structural_hash().
+
+    The statements of two blocks are matched up by digest first, then defs
+    by name, then in order.
+    """
+    if digests is None:
+        digests = {}
+    changes = []
+    todo = [(old, new)]
+    while todo:
+        a, b = todo.pop()
+        if a is None or b is None:
+            changes.append((a, b))
+            continue
+        if a is b or structural_hash(a, digests) == structural_hash(b, digests):
+            continue
+        if type(a) is not type(b) or fields(a) != fields(b):
+            changes.append((a, b))
+            continue
+        a_children, b_children = list(iter_child_nodes(a)), list(iter_child_nodes(b))
+        if isinstance(a, BlockStmtNode):
+            pairs = align(a_children, b_children, digests)
+        elif len(a_children) == len(b_children):
+            pairs = list(zip(a_children, b_children))
+        else:
+            changes.append((a, b))
+            continue
+        todo.extend(reversed(pairs))
+    return changes
+
+
+def align(old, new, digests):
+    """
+    Return the pairs of statements of two blocks that diff() has to look into.
+    """
+    def same(a, b):
+        return a is b or structural_hash(a, digests) == structural_hash(b, digests)
+
+    start = 0
+    while start < min(len(old), len(new)) and same(old[start], new[start]):
+        start += 1
+    end = 0
+    while end < min(len(old), len(new)) - start and same(old[-1 - end], new[-1 - end]):
+        end += 1
+    old, new = old[start:len(old) - end], new[start:len(new) - end]
+    # Where each old statement went in new, to put those removed in order.
+    went = {}
+    unmatched = {}
+    for stmt in old:
+        unmatched.setdefault(structural_hash(stmt, digests), []).append(stmt)
+    # Statements that were only moved.
+    moved = set()
+    for stmt in new:
+        digest = structural_hash(stmt, digests)
+        if unmatched.get(digest):
+            match = unmatched[digest].pop()
+            went[id(match)] = stmt
+            moved.add(id(match))
+            moved.add(id(stmt))
+    before, after = old, new
+    old = [stmt for stmt in old if id(stmt) not in moved]
+    new = [stmt for stmt in new if id(stmt) not in moved]
+    defs = {stmt.name: stmt for stmt in old if isinstance(stmt, FunctionDefStmtNode)}
+    pairs = []
+    paired = set()
+    for stmt in new:
+        if isinstance(stmt, FunctionDefStmtNode) and stmt.name in defs:
+            pairs.append((defs.pop(stmt.name), stmt))
+            paired.update((id(pairs[-1][0]), id(stmt)))
+    old = [stmt for stmt in old if id(stmt) not in paired]
+    rest = [stmt for stmt in new if id(stmt) not in paired]
+    pairs += list(zip(old, rest))
+    pairs += [(stmt, None) for stmt in old[len(rest):]] + [(None, stmt) for stmt in rest[len(old):]]
+    went.update((id(a), b) for a, b in pairs if a is not None and b is not None)
+    order = {id(stmt): (index, 0) for index, stmt in enumerate(after)}
+    # A removed statement goes after where the statements before it went.
+    position = -1
+    for index, stmt in enumerate(before, 1):
+        if id(stmt) in went:
+            position = max(position, order[id(went[id(stmt)])][0])
+        else:
+            order[id(stmt)] = position, index
+    pairs.sort(key=lambda pair: order[id(pair[1])] if pair[1] is not None else order[id(pair[0])])
+    return pairs
@@ -0,0 +1,242 @@
+import bisect
+import contextlib
+import io
+import itertools
+import re
+from hon.lexer import Location, SyntaxErrorException, Token, TokenTuple
+from hon.parser import Parser
+import hon.hast as ast
+
+# Lines at the left margin that continue the statement before them.
+CONTINUATION = re.compile(r'(elif|else)\b|[)\]}]')
+
+# Brackets, and the strings and comments the lexer finds none in.
+BRACKETS = re.compile(r'''[(\[{)\]}]|"[^"\n]*"?|'[^'\n]*'?|#.*''')
+
+
+class Unit:
+    """
+    The text of one top-level statement, or of the statements on one line,
+    with the blank and comment lines after it, and the tokens and statements
+    parsed from it on its own, which end with those the lexer gives at the end
+    of its text.
+    Token locations are relative to the first line of the unit. A unit that
+    does not parse has no statements and an error, a (message, Location)
+    pair, also relative.
+    """
+
+    __slots__ = ('text', 'lines', 'tokens', 'stmts', 'error')
+
+    def __init__(self, text, tokens, stmts, error=None):
+        self.text = text
+        self.lines = text.count('\n')
+        self.tokens = tokens
+        self.stmts = stmts
+        self.error = error
+
+
+class TokenStream:
+    """
+    The tokens of a program, kept per Unit so that an edit only shifts the
+    units after it, not every token. 'parsed' counts the lines parsed so far,
+    and 'errors' the units that do not parse.
+    """
+
+    def __init__(self, units):
+        self.units = units
+        self.parsed = 0
+        self.errors = sum(unit.error is not None for unit in units)
+
+    @property
+    def text(self):
+        return ''.join(unit.text for unit in self.units)
+
+    def starts(self):
+        """
+        Return the line on which each unit starts, from 1.
+        """
+        return list(itertools.accumulate((unit.lines for unit in self.units[:-1]), initial=1))
+
+    def __iter__(self):
+        """
+        Yield the tokens of the program with their locations in it, as the
+        lexer gives them. The tokens a unit ends with past its last line, at
+        the end of its text, are only kept for the last unit; in the program,
+        its Dedents come before the first token of the next.
+        """
+        dedents = 0
+        for start, unit in zip(self.starts(), self.units):
+            for token in unit.tokens:
+                if token.location.line > unit.lines and unit is not self.units[-1]:
+                    dedents += token.token == Token.Dedent
+                    continue
+                location = Location(token.location.line + start - 1, token.location.col)
+                for _ in range(dedents):
+                    yield TokenTuple(Token.Dedent, '<DEDENT>', location)
+                dedents = 0
+                yield token._replace(location=location)
+                if token.token == Token.EOI:
+                    return
+
+    def error(self):
+        """
+        Return the first syntax error of the program as an exception, or None.
+        """
+        if not self.errors:
+            return None
+        for start, unit in zip(self.starts(), self.units):
+            if unit.error is not None:
+                message, location = unit.error
+                return SyntaxErrorException(message, Location(location.line + start - 1, location.col))
+        return None
+
+
+def starts_unit(line):
+    return line[:1] not in {'', ' ', '\t', '#', '\r'} and not CONTINUATION.match(line)
+
+
+def bracket_depth(line, depth):
+    """
+    Return how many brackets are open after line, given depth open before it,
+    as the lexer counts them; within them it takes newlines as whitespace.
+    """
+    for match in BRACKETS.finditer(line):
+        if match[0] in {'(', '[', '{'}:
+            depth += 1
+        elif match[0] in {')', ']', '}'}:
+            depth -= 1
+    return depth
+
+
+def unit_starts(lines, start=0):
+    """
+    Yield the index of each of lines, from start on, that starts a unit: a line
+    at the left margin, outside brackets, that does not continue the statement
+    before it. start must be the first line of a unit, or 0, as the lines
+    before the first statement belong to it.
+    """
+    yield start
+    depth = 0
+    # Whether the unit has only blank and comment lines so far.
+    blank = lines[start].lstrip()[:1] in {'', '#'}
+    for number in range(start + 1, len(lines)):
+        depth = bracket_depth(lines[number - 1], depth)
+        if depth <= 0 and starts_unit(lines[number]) and not blank:
+            yield number
+            # Each unit is lexed on its own, so where the next starts depends
+            # on nothing before this one.
+            depth = 0
+        blank = blank and lines[number].lstrip()[:1] in {'', '#'}
+
+
+def parse_unit(text):
+    """
+    Parse text, the text of a unit, into a Unit.
+    """
+    parser = None
+    try:
+        # The parser reads the first token as it is made, and traces some of
+        # what it parses on stdout.
+        parser = Parser(io.StringIO(text), record=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stmts = parser.parse().stmts
+    except SyntaxErrorException as e:
+        return Unit(text, parser.tokens if parser is not None else [], [], (e.message, e.location))
+    return Unit(text, parser.tokens, stmts)
+
+
+def parse_units(text):
+    """
+    Parse text, a run of whole top-level statements, into Units. A unit that
+    does not parse for want of the text after it is parsed again with the
+    next, until the error is the one Parser gives on the whole text.
+    """
+    lines = text.split('\n')
+    starts = list(unit_starts(lines)) + [len(lines)]
+    units = []
+    for first, last in zip(starts, starts[1:]):
+        unit_text = '\n'.join(lines[first:last]) + ('\n' if last < len(lines) else '')
+        if units and runs_off(units[-1]):
+            unit_text = units.pop().text + unit_text
+        units.append(parse_unit(unit_text))
+    return units
+
+
+def runs_off(unit):
+    """
+    Whether unit did not parse for want of the text after it: its error is
+    past the last token of its own text, where a block or bracket it leaves
+    open would have gone on into the next unit.
+    """
+    if unit.error is None:
+        return False
+    found = [token.location for token in unit.tokens
+             if token.token not in (Token.Newline, Token.Indent, Token.Dedent, Token.EOI)]
+    return not found or unit.error[1] > found[-1]
+
+
+def parse(text):
+    """
+    Parse a program like Parser.parse(), and also return its TokenStream for
+    reparse(). Raises SyntaxErrorException if the program does not parse.
+    """
+    stream = TokenStream(parse_units(text))
+    stream.parsed = text.count('\n')
+    tree = ast.BlockStmtNode([stmt for unit in stream.units for stmt in unit.stmts])
+    error = stream.error()
+    if error is not None:
+        raise error
+    return tree, stream
+
+
+def reparse(tree, stream, edit):
+    """
+    Apply an edit to the program that tree and stream were parsed from, and
+    return its tree. edit is (start, end, text): the text from start to end,
+    Locations as the lexer gives them, is replaced by text.
+
+    Only the units the edit touches are parsed again, with the unit before
+    them, as an indented line inserted after it would belong to it, and any
+    neighbouring unit that did not parse. If they no longer parse because a
+    block or bracket is left open at their end, the units after them are
+    parsed with them, one by one, until the error is the one the whole
+    program gives. The statements of every other unit are kept, in tree,
+    which is updated and returned, and the units in stream.
+
+    If the program no longer parses, tree and stream are still updated, with
+    no statements for the units that do not parse, and SyntaxErrorException
+    is raised; a later edit that fixes the program makes the tree whole again.
+    """
+    start, end, text = edit
+    units = stream.units
+    starts = stream.starts()
+    first = max(bisect.bisect_right(starts, start.line) - 2, 0)
+    last = min(bisect.bisect_right(starts, end.line) - 1, len(units) - 1)
+    while first > 0 and units[first - 1].error is not None:
+        first -= 1
+    while last < len(units) - 1 and units[last + 1].error is not None:
+        last += 1
+
+    lines = ''.join(unit.text for unit in units[first:last + 1]).split('\n')
+    start_line, end_line = start.line - starts[first], end.line - starts[first]
+    prefix = lines[start_line][:start.col - 1] if start_line < len(lines) else ''
+    suffix = lines[end_line][end.col - 1:] if end_line < len(lines) else ''
+    lines[start_line:end_line + 1] = (prefix + text + suffix).split('\n')
+    region = '\n'.join(lines)
+    new_units = parse_units(region)
+    stream.parsed += region.count('\n')
+    while runs_off(new_units[-1]) and last < len(units) - 1:
+        last += 1
+        tail = new_units.pop().text + units[last].text
+        new_units += parse_units(tail)
+        stream.parsed += tail.count('\n')
+
+    counts = list(itertools.accumulate((len(unit.stmts) for unit in units[:last + 1]), initial=0))
+    tree.stmts[counts[first]:counts[last + 1]] = [stmt for unit in new_units for stmt in unit.stmts]
+    stream.errors += sum(unit.error is not None for unit in new_units) \
+        - sum(unit.error is not None for unit in units[first:last + 1])
+    units[first:last + 1] = new_units
+    error = stream.error()
+    if error is not None:
+        raise error
+    return tree
@@ -0,0 +1,314 @@
+import copy
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+from hon.symtab_visitor import SymbolTableVisitor
+
+
+class InlineVisitor(visitor.Visitor):
+    """
+    Replaces calls to small, non-recursive functions with a renamed copy of the
+    function body.
+
+    A call is only inlined when it is the first call evaluated by its statement,
+    so that moving it in front of the statement does not reorder side effects.
+    Parameters and locals of the callee (as found by SymbolTableVisitor) are
+    renamed per call site, and every 'return e' is turned into an assignment to
+    a result variable, which replaces the call. Functions that return from
+    anywhere but a tail position are not inlined.
+
+    Calls are only inlined into function bodies, where the renamed locals stay
+    locals; at module level they would be left behind as globals.
+    """
+
+    def __init__(self, max_size=40, max_growth=None):
+        """
+        :param max_size: largest callee body, in AST nodes, that is inlined.
+        :param max_growth: upper bound on the number of AST nodes added to the
+                           program in total, or None for no bound.
+        """
+        self.max_size = max_size
+        self.max_growth = max_growth
+        self.growth = 0
+        self.inlined = 0
+        self.sites = 0
+        self.functions = {}
+        self.scopes = {}
+        self.curr_scope = None
+
+    def optimize(self, node_ast_root):
+        defs = [stmt for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+        names = [fn.name for fn in defs]
+        assigned = ast.bound_names(node_ast_root)
+        # Only functions defined once, and never rebound, can be resolved statically.
+        self.functions = {fn.name: fn for fn in defs if names.count(fn.name) == 1 and fn.name not in assigned}
+        symtable = SymbolTableVisitor().create_symtable(node_ast_root)
+        self.scopes = {table.get_name(): table for table in symtable.get_children()}
+
+        recursive = self.recursive_functions()
+        self.candidates = {name for name in self.functions
+                           if name not in recursive and self.tail_returns(self.functions[name].block, True)}
+
+        # Inline into callees before their callers, so that chains flatten.
+        done = set()
+        for fn in defs:
+            self.inline_into(fn, done)
+        self.curr_scope = None
+        return node_ast_root
+
+    def inline_into(self, fn, done):
+        if fn.name in done:
+            return
+        done.add(fn.name)
+        for callee in self.callees(fn):
+            if callee in self.functions and callee != fn.name:
+                self.inline_into(self.functions[callee], done)
+        self.curr_scope = self.scopes.get(fn.name)
+        self.do_visit(fn.block)
+        if fn.name in self.functions:
+            self.scopes[fn.name] = self.function_scope(fn)
+
+    @staticmethod
+    def callees(fn):
+        return [node.name for node in ast.walk(fn.block) if isinstance(node, ast.FunctionCallExprNode)]
+
+    @staticmethod
+    def function_scope(fn):
+        return SymbolTableVisitor().create_symtable(ast.BlockStmtNode([fn])).get_children()[0]
+
+    def local_names(self, fn):
+        """
+        Return the locals of fn. The symbol table also lists names that are
+        only stored into, as in 'x[0] = 1', which refer to globals.
+        """
+        bound = ast.bound_names(fn.block) | set(fn.params)
+        return {name for name in self.scopes[fn.name].get_locals() if name in bound}
+
+    def recursive_functions(self):
+        """
+        Return the names of the functions that can reach themselves through the
+        call graph.
+        """
+        graph = {name: set(self.callees(fn)) for name, fn in self.functions.items()}
+        recursive = set()
+        for name in graph:
+            seen, todo = set(), list(graph[name])
+            while todo:
+                callee = todo.pop()
+                if callee == name:
+                    recursive.add(name)
+                    break
+                if callee not in seen and callee in graph:
+                    seen.add(callee)
+                    todo.extend(graph[callee])
+        return recursive
+
+    def tail_returns(self, block, tail):
+        """
+        Return True if every return statement in block is in tail position.
+        """
+        for index, stmt in enumerate(block.stmts):
+            is_tail = tail and index == len(block.stmts) - 1
+            if isinstance(stmt, ast.ReturnStmtNode) and not is_tail:
+                return False
+            if isinstance(stmt, (ast.IfStmtNode, ast.SwitchStmtNode)):
+                for arm in self.arms(stmt):
+                    if not self.tail_returns(arm, is_tail):
+                        return False
+            elif isinstance(stmt, ast.WhileStmtNode):
+                if not self.tail_returns(stmt.block, False):
+                    return False
+        return True
+
+    def always_returns(self, block):
+        if not block.stmts:
+            return False
+        last = block.stmts[-1]
+        if isinstance(last, ast.ReturnStmtNode):
+            return True
+        if isinstance(last, ast.IfStmtNode):
+            return last.expr_block_list[-1][1] is not None and \
+                all(self.always_returns(arm) for arm in self.arms(last))
+        if isinstance(last, ast.SwitchStmtNode):
+            return last.default is not None and all(self.always_returns(arm) for arm in self.arms(last))
+        return False
+
+    @staticmethod
+    def arms(stmt):
+        """
+        Return the blocks of an if or switch statement.
+        """
+        if isinstance(stmt, ast.IfStmtNode):
+            return [block for expr, block in stmt.expr_block_list if block is not None]
+        return stmt.blocks + ([stmt.default] if stmt.default is not None else [])
+
+    def first_call(self, node):
+        """
+        Find the call that node evaluates first. Returns the call (or None), whether
+        it may be evaluated in front of everything else, and whether node reads list
+        elements before (or without) reaching the call.
+        """
+        if isinstance(node, ast.OperatorExprNode):
+            call, hoistable, reads = self.first_call(node.lhs)
+            if call is not None or node.rhs is None:
+                return call, hoistable, reads
+            call, rhs_hoistable, rhs_reads = self.first_call(node.rhs)
+            if call is not None:
+                conditional = node.token in {Token.OpAnd, Token.OpOr}
+                return call, rhs_hoistable and not reads and not conditional, rhs_reads
+            return None, True, reads or rhs_reads
+        if isinstance(node, (ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+            call, hoistable, reads = self.first_call_in(node.expr_list)
+            if call is not None:
+                return call, hoistable, reads
+            return node, True, False
+        if isinstance(node, (ast.VariableRValueExprNode, ast.ListExprNode)):
+            call, hoistable, reads = self.first_call_in(node.expr_list)
+            if call is not None:
+                return call, hoistable, reads
+            return None, True, reads or isinstance(node, ast.VariableRValueExprNode) and bool(node.expr_list)
+        return None, True, False
+
+    def first_call_in(self, exprs):
+        reads = False
+        for expr in exprs:
+            call, hoistable, expr_reads = self.first_call(expr)
+            if call is not None:
+                return call, hoistable and not reads, expr_reads
+            reads = reads or expr_reads
+        return None, True, reads
+
+    def can_inline(self, call):
+        if not isinstance(call, ast.FunctionCallExprNode) or call.name not in self.candidates:
+            return False
+        callee = self.functions[call.name]
+        if len(call.expr_list) != len(callee.params):
+            return False
+        size = sum(1 for _ in ast.walk(callee.block))
+        if size > self.max_size:
+            return False
+        if self.max_growth is not None and self.growth + size > self.max_growth:
+            return False
+        if self.curr_scope is not None:
+            caller_locals = set(self.curr_scope.get_locals())
+            # A param or local of the caller with the callee's name holds some other function.
+            if call.name in caller_locals:
+                return False
+            # A global read by the callee must not be shadowed by a local of the caller.
+            local = self.local_names(callee)
+            for node in ast.walk(callee.block):
+                name = getattr(node, 'name', None)
+                if isinstance(node, (ast.VariableRValueExprNode, ast.FunctionCallExprNode, ast.MethodCallExprNode)) \
+                        and name not in local and name in caller_locals:
+                    return False
+        return True
+
+    def expand(self, call):
+        """
+        Return the statements that compute call inline, and the name of the
+        variable holding its result.
+        """
+        callee = self.functions[call.name]
+        self.sites += 1
+        result = f'_{callee.name}{self.sites}'
+        renames = {name: f'{result}_{name}' for name in self.local_names(callee)}
+        body = copy.deepcopy(callee.block)
+        for node in ast.walk(body):
+            # A call's name is renamed too when it calls a function held in a param or local.
+            if isinstance(node, (ast.VariableLValueNode, ast.VariableRValueExprNode, ast.FunctionCallExprNode,
+                                 ast.MethodCallExprNode)):
+                node.name = renames.get(node.name, node.name)
+        stmts = [ast.AssignStmtNode(ast.VariableLValueNode(renames[param], []), arg)
+                 for param, arg in zip(callee.params, call.expr_list)]
+        if not self.always_returns(body):
+            stmts.append(ast.AssignStmtNode(ast.VariableLValueNode(result, []), ast.ValueExprNode(None)))
+        stmts.extend(self.lower_returns(body, result).stmts)
+        self.growth += sum(1 for _ in ast.walk(body))
+        self.inlined += 1
+        return stmts, result
+
+    def lower_returns(self, block, result):
+        for index, stmt in enumerate(block.stmts):
+            if isinstance(stmt, ast.ReturnStmtNode):
+                expr = stmt.expr if stmt.expr is not None else ast.ValueExprNode(None)
+                block.stmts[index] = ast.AssignStmtNode(ast.VariableLValueNode(result, []), expr)
+            elif isinstance(stmt, (ast.IfStmtNode, ast.SwitchStmtNode)):
+                for arm in self.arms(stmt):
+                    self.lower_returns(arm, result)
+        return block
+
+    def inline_stmt(self, stmt):
+        """
+        Return the list of statements that replaces stmt.
+        """
+        stmts = []
+        while stmt is not None:
+            if isinstance(stmt, ast.AssignStmtNode):
+                call, hoistable, reads = self.first_call_in([stmt.expr] + stmt.lvalue.expr_list)
+            elif isinstance(stmt, ast.ReturnStmtNode):
+                call, hoistable, reads = self.first_call_in([stmt.expr] if stmt.expr else [])
+            elif isinstance(stmt, (ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+                call, hoistable, reads = self.first_call(stmt)
+            else:
+                call, hoistable = None, False
+            if call is None or not hoistable or not self.can_inline(call):
+                break
+            body, result = self.expand(call)
+            stmts.extend(body)
+            if stmt is call:
+                stmt = None
+            else:
+                self.replace(stmt, call, ast.VariableRValueExprNode(result, []))
+        if stmt is not None:
+            stmts.append(stmt)
+        return stmts
+
+    @staticmethod
+    def replace(root, old, new):
+        for node in ast.walk(root):
+            for attr in ('expr', 'lhs', 'rhs'):
+                if getattr(node, attr, None) is old:
+                    setattr(node, attr, new)
+                    return
+            expr_list = getattr(node, 'expr_list', None)
+            if isinstance(expr_list, list) and any(expr is old for expr in expr_list):
+                node.expr_list = [new if expr is old else expr for expr in expr_list]
+                return
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts = []
+        for stmt in node.stmts:
+            if isinstance(stmt, ast.FunctionDefStmtNode):
+                # Function bodies are handled by inline_into.
+                stmts.append(stmt)
+            elif isinstance(stmt, (ast.IfStmtNode, ast.SwitchStmtNode, ast.WhileStmtNode)):
+                self.do_visit(stmt)
+                stmts.append(stmt)
+            else:
+                stmts.extend(self.inline_stmt(stmt))
+        node.stmts = stmts
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        for expr, block in node.expr_block_list:
+            self.do_visit(block)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        for block in self.arms(node):
+            self.do_visit(block)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        self.do_visit(node.block)
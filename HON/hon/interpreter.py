@@ -0,0 +1,648 @@
+import collections
+import functools
+import operator
+import types
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+from hon.slots_visitor import SlotResolutionVisitor
+from hon.typed_list import TypedList
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BUILTINS = {
+    'print': print,
+    'len': len,
+    'int': int,
+    'float': float,
+    'str': str,
+    'bool': bool,
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'input': input,
+}
+
+OPERATORS = {
+    Token.OpLt: operator.lt,
+    Token.OpGt: operator.gt,
+    Token.OpEq: operator.eq,
+    Token.OpGtEq: operator.ge,
+    Token.OpLtEq: operator.le,
+    Token.OpNotEq: operator.ne,
+    Token.OpPlus: operator.add,
+    Token.OpMinus: operator.sub,
+    Token.OpMultiply: operator.mul,
+    Token.OpDivide: operator.truediv,
+    Token.OpModulus: operator.mod,
+    Token.OpIntDivide: operator.floordiv,
+    Token.OpPower: operator.pow,
+}
+
+UNARY_OPERATORS = {
+    Token.OpNot: operator.not_,
+    Token.OpPlus: operator.pos,
+    Token.OpMinus: operator.neg,
+}
+
+# Immutable values that can be memoized as arguments and results.
+SCALARS = {int, float, str, bool, type(None)}
+
+# Ints computed by vector loops must fit in an int64.
+VECTOR_INT_LIMIT = 2 ** 63
+
+# The list and str methods HON programs use, resolved once.
+FAST_METHODS = {
+    (kind, name): getattr(kind, name)
+    for kind, names in (
+        (list, ['append', 'insert', 'pop', 'remove', 'clear', 'reverse', 'sort', 'index', 'count', 'copy', 'extend']),
+        (TypedList, ['append', 'insert', 'pop', 'remove', 'clear', 'reverse', 'sort', 'index', 'count', 'copy',
+                     'extend']),
+        (str, ['upper', 'lower', 'strip', 'replace', 'find', 'count', 'split', 'join', 'startswith', 'endswith']),
+    )
+    for name in names
+}
+
+# Receiver types an inline cache remembers before it gives up.
+MAX_POLYMORPHIC = 4
+
+# The value of a frame slot or global cell that has not been assigned yet.
+UNBOUND = object()
+
+
+class BreakException(Exception):
+    pass
+
+
+class ContinueException(Exception):
+    pass
+
+
+class ReturnException(Exception):
+    def __init__(self, value):
+        self.value = value
+
+
+class OutOfFuelException(Exception):
+    pass
+
+
+class NotVectorizableException(Exception):
+    pass
+
+
+class InlineCache:
+    """
+    The methods a call site has called, by receiver type: monomorphic with one
+    entry, polymorphic with up to MAX_POLYMORPHIC, and megamorphic once it has
+    seen a receiver type more and stops caching.
+    """
+
+    __slots__ = ('entries', 'hits', 'misses', 'megamorphic')
+
+    def __init__(self):
+        self.entries = []
+        self.hits = 0
+        self.misses = 0
+        self.megamorphic = False
+
+    @property
+    def state(self):
+        if self.megamorphic:
+            return 'megamorphic'
+        return 'monomorphic' if len(self.entries) <= 1 else 'polymorphic'
+
+
+def resolve_method(kind, name):
+    """
+    Return the function to call with the receiver as first argument for method
+    name of type kind, or None if it cannot be cached.
+    """
+    method = FAST_METHODS.get((kind, name))
+    if method is None:
+        method = getattr(kind, name, None)
+    if isinstance(method, (types.FunctionType, types.MethodDescriptorType, types.WrapperDescriptorType)):
+        return method
+    return None
+
+
+class HonFunction:
+    """
+    A function defined by a HON program. Like in Python, every name the body
+    assigns to is local to the function.
+    """
+
+    def __init__(self, node, memo=None):
+        self.node = node
+        self.name = node.name
+        self.params = node.params
+        self.locals = set(node.params)
+        self.locals.update(ast.bound_names(node.block))
+        self.memo = memo
+        # Set by SlotResolutionVisitor.
+        self.slots = getattr(node, 'slots', None)
+        self.slot_index = {name: index for index, name in enumerate(self.slots or ())}
+
+    def __repr__(self) -> str:
+        return f"<function {self.name}>"
+
+
+class MemoTable:
+    """
+    The results of a pure function, keyed by its arguments, holding at most
+    max_size entries and evicting the least recently used one. Only calls
+    whose arguments and result are scalars are remembered; the type of each
+    argument is part of the key, so f(1), f(1.0) and f(True) are kept apart.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(args):
+        if all(type(arg) in SCALARS for arg in args):
+            return tuple((type(arg), arg) for arg in args)
+        return None
+
+    def lookup(self, key):
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key]
+
+    def store(self, key, value):
+        self.misses += 1
+        if type(value) not in SCALARS or self.max_size <= 0:
+            return
+        self.entries[key] = value
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class Interpreter(visitor.Visitor):
+    """
+    Tree-walking interpreter for HON, with Python semantics for values and
+    operators. Errors raised by operations (ZeroDivisionError, IndexError, ...)
+    propagate to the caller of run().
+
+    With profile=True, arm_counts maps each IfStmtNode to the number of times
+    each of its arms was taken, and loop_counts maps each WhileStmtNode to
+    [times entered, iterations].
+
+    With a fuel limit, every statement executed and every loop iteration uses one
+    unit of fuel, as does every unit of size of the results of '**' and of
+    repeating a str or list with '*'; OutOfFuelException is raised when none is left.
+
+    The functions named in memoize, which must be pure (see
+    partial_eval_visitor.recursive_pure_functions), get a MemoTable of
+    memo_size entries; memo_stats() reports how well each one did. 'calls'
+    counts the calls of HON functions that were actually run.
+
+    A VectorLoopStmtNode is run with NumPy when it is installed and neither
+    profiling nor a fuel limit is in use, and the lists it reads hold only ints
+    or only floats; otherwise its original loop is run.
+
+    With typed_lists=True, list displays create TypedLists, which store ints
+    and floats unboxed.
+
+    With inline_caches=True, every method call site keeps an InlineCache of the
+    methods it resolved for each receiver type; inline_cache_stats() reports
+    how often they hit.
+
+    With frame_slots=True, run() first lays out the program with
+    SlotResolutionVisitor: the frame of a call is a list indexed by the slots
+    of the function, and globals live in a list of cells, so that variables
+    are read and written by index instead of by name. globals is only filled
+    in from the cells when run() returns.
+    """
+
+    def __init__(self, profile=False, fuel=None, memoize=(), memo_size=1024, typed_lists=False,
+                 inline_caches=True, frame_slots=False):
+        self.profile = profile
+        self.frame_slots = frame_slots
+        self.cells = []
+        self.cell_index = {}
+        self.typed_lists = typed_lists
+        self.inline_caches = inline_caches
+        self.method_caches = {}
+        self.fuel = fuel
+        self.memoize = set(memoize)
+        self.memo_size = memo_size
+        self.memo_tables = {}
+        self.calls = 0
+        self.globals = {}
+        self.frame = None
+        self.function = None
+        self.arm_counts = {}
+        self.loop_counts = {}
+
+    def run(self, node_ast_root):
+        self.frame = None
+        self.function = None
+        if not self.frame_slots:
+            self.do_visit(node_ast_root)
+            return self.globals
+        SlotResolutionVisitor().resolve(node_ast_root)
+        self.cell_index = {name: index for index, name in enumerate(node_ast_root.cells)}
+        self.cells = [self.globals.get(name, UNBOUND) for name in node_ast_root.cells]
+        try:
+            self.do_visit(node_ast_root)
+        finally:
+            self.globals.update((name, value) for name, value in zip(node_ast_root.cells, self.cells)
+                                if value is not UNBOUND)
+        return self.globals
+
+    def load(self, name):
+        if self.frame is not None and name in self.function.locals:
+            if self.frame_slots:
+                value = self.frame[self.function.slot_index[name]]
+            else:
+                value = self.frame.get(name, UNBOUND)
+            if value is UNBOUND:
+                raise UnboundLocalError(f"local variable '{name}' referenced before assignment")
+            return value
+        if self.frame_slots and name in self.cell_index:
+            value = self.cells[self.cell_index[name]]
+        else:
+            value = self.globals.get(name, UNBOUND)
+        if value is not UNBOUND:
+            return value
+        if name in BUILTINS:
+            return BUILTINS[name]
+        raise NameError(f"name '{name}' is not defined")
+
+    def store(self, name, value):
+        if self.frame is not None:
+            if self.frame_slots:
+                self.frame[self.function.slot_index[name]] = value
+            else:
+                self.frame[name] = value
+        elif self.frame_slots and name in self.cell_index:
+            self.cells[self.cell_index[name]] = value
+        else:
+            self.globals[name] = value
+
+    def load_variable(self, node):
+        """
+        Return the value of the variable a node names, by index in
+        frame_slots mode.
+        """
+        if not self.frame_slots:
+            return self.load(node.name)
+        if node.local:
+            value = self.frame[node.slot]
+            if value is UNBOUND:
+                raise UnboundLocalError(f"local variable '{node.name}' referenced before assignment")
+            return value
+        value = self.cells[node.slot]
+        if value is not UNBOUND:
+            return value
+        if node.name in BUILTINS:
+            return BUILTINS[node.name]
+        raise NameError(f"name '{node.name}' is not defined")
+
+    def store_variable(self, node, value):
+        if not self.frame_slots:
+            self.store(node.name, value)
+        elif node.local:
+            self.frame[node.slot] = value
+        else:
+            self.cells[node.slot] = value
+
+    def inline_cache_stats(self):
+        caches = self.method_caches.values()
+        hits = sum(cache.hits for cache in caches)
+        misses = sum(cache.misses for cache in caches)
+        stats = {'sites': len(self.method_caches), 'hits': hits, 'misses': misses,
+                 'hit rate': hits / (hits + misses) if hits + misses else 0.0}
+        for state in ('monomorphic', 'polymorphic', 'megamorphic'):
+            stats[state] = sum(cache.state == state for cache in caches)
+        return stats
+
+    def memo_stats(self):
+        return {name: {'hits': table.hits, 'misses': table.misses, 'size': len(table.entries)}
+                for name, table in self.memo_tables.items()}
+
+    def call(self, fn, args):
+        if not isinstance(fn, HonFunction):
+            return fn(*args)
+        if len(args) != len(fn.params):
+            raise TypeError(f"{fn.name}() takes {len(fn.params)} positional arguments but {len(args)} were given")
+        key = fn.memo.key(args) if fn.memo is not None else None
+        if key is None:
+            return self.invoke(fn, args)
+        if key in fn.memo.entries:
+            return fn.memo.lookup(key)
+        value = self.invoke(fn, args)
+        fn.memo.store(key, value)
+        return value
+
+    def invoke(self, fn, args):
+        self.calls += 1
+        saved = self.frame, self.function
+        if self.frame_slots:
+            frame = [UNBOUND] * len(fn.slots)
+            frame[:len(args)] = args
+        else:
+            frame = dict(zip(fn.params, args))
+        self.frame, self.function = frame, fn
+        try:
+            self.do_visit(fn.node.block)
+        except ReturnException as e:
+            return e.value
+        finally:
+            self.frame, self.function = saved
+        return None
+
+    def burn(self, amount):
+        self.fuel -= amount
+        if self.fuel < 0:
+            raise OutOfFuelException()
+
+    def burn_operator(self, token, lhs, rhs):
+        """
+        Charge up front for the operations whose cost grows with their result.
+        """
+        if token == Token.OpPower and type(rhs) is int and type(lhs) is int:
+            self.burn(abs(rhs) * max(lhs.bit_length(), 1) // 64)
+        elif token == Token.OpMultiply and type(rhs) is int and isinstance(lhs, (str, list, TypedList)):
+            self.burn(rhs * len(lhs))
+        elif token == Token.OpMultiply and type(lhs) is int and isinstance(rhs, (str, list, TypedList)):
+            self.burn(lhs * len(rhs))
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.PassStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.BreakStmtNode):
+        raise BreakException()
+
+    @visit.register
+    def _(self, node: ast.ContinueStmtNode):
+        raise ContinueException()
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        for index, (expr, block) in enumerate(node.expr_block_list):
+            if self.evaluate(expr):
+                if self.profile:
+                    counts = self.arm_counts.setdefault(node, [0] * len(node.expr_block_list))
+                    counts[index] += 1
+                self.do_visit(block)
+                return
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        value = self.evaluate(node.expr)
+        try:
+            index = node.cases.get(value)
+        except TypeError:
+            index = None
+        self.do_visit(node.default if index is None else node.blocks[index])
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        counts = self.loop_counts.setdefault(node, [0, 0]) if self.profile else None
+        if counts is not None:
+            counts[0] += 1
+        while self.evaluate(node.expr):
+            if counts is not None:
+                counts[1] += 1
+            if self.fuel is not None:
+                self.burn(1)
+            try:
+                self.visit(node.block)
+            except BreakException:
+                break
+            except ContinueException:
+                continue
+
+    @visit.register
+    def _(self, node: ast.VectorLoopStmtNode):
+        if not self.vector_loop(node):
+            self.visit(node.loop)
+
+    def vector_loop(self, node):
+        """
+        Run a VectorLoopStmtNode with NumPy and return True, or return False
+        without changing anything if the result could differ from the loop's.
+        """
+        if numpy is None or self.profile or self.fuel is not None:
+            return False
+        start, stop = self.load(node.index), self.evaluate(node.bound)
+        if type(start) is not int or type(stop) is not int or start < 0:
+            return False
+        if start >= stop:
+            return True
+        values, targets = {}, {}
+        try:
+            with numpy.errstate(all='ignore'):
+                for assign in node.assigns:
+                    value, bound = self.vector_evaluate(assign.expr, values, start, stop)
+                    target = self.load(assign.lvalue.name)
+                    if not isinstance(target, (list, TypedList)) or len(target) < stop:
+                        return False
+                    values[id(target)] = numpy.full(stop - start, value) if numpy.ndim(value) == 0 else value, bound
+                    targets[id(target)] = target
+        except (NotVectorizableException, NameError):
+            # Run the loop, so that any error happens at the same iteration.
+            return False
+        for key, target in targets.items():
+            target[start:stop] = values[key][0].tolist()
+        self.store(node.index, stop)
+        return True
+
+    def vector_evaluate(self, node, values, start, stop):
+        """
+        Return elements start to stop of an element-wise expression, as an array
+        or a scalar, and a bound on the magnitude of its ints (None for floats).
+        values caches the arrays of the lists used so far, by list identity.
+        """
+        if isinstance(node, ast.ValueExprNode):
+            return node.value, abs(node.value) if type(node.value) is int else None
+        if isinstance(node, ast.VariableRValueExprNode):
+            value = self.load(node.name)
+            if not node.expr_list:
+                if type(value) not in {int, float}:
+                    raise NotVectorizableException()
+                return value, abs(value) if type(value) is int else None
+            if not isinstance(value, (list, TypedList)) or len(value) < stop:
+                raise NotVectorizableException()
+            if id(value) not in values:
+                elements = list(value[start:stop])
+                kinds = {type(element) for element in elements}
+                if kinds == {int}:
+                    bound = max(abs(element) for element in elements)
+                    if bound >= VECTOR_INT_LIMIT:
+                        raise NotVectorizableException()
+                    values[id(value)] = numpy.array(elements, dtype=numpy.int64), bound
+                elif kinds == {float}:
+                    values[id(value)] = numpy.array(elements, dtype=numpy.float64), None
+                else:
+                    raise NotVectorizableException()
+            return values[id(value)]
+        lhs, lhs_bound = self.vector_evaluate(node.lhs, values, start, stop)
+        if node.rhs is None:
+            return UNARY_OPERATORS[node.token](lhs), lhs_bound
+        rhs, rhs_bound = self.vector_evaluate(node.rhs, values, start, stop)
+        if node.token in {Token.OpDivide, Token.OpIntDivide, Token.OpModulus} and numpy.any(rhs == 0):
+            raise NotVectorizableException()
+        bound = None
+        if lhs_bound is not None and rhs_bound is not None:
+            if node.token == Token.OpDivide and max(lhs_bound, rhs_bound) > 2 ** 53:
+                # Python divides big ints exactly, NumPy converts them to float first.
+                raise NotVectorizableException()
+            bound = {
+                Token.OpPlus: lhs_bound + rhs_bound,
+                Token.OpMinus: lhs_bound + rhs_bound,
+                Token.OpMultiply: lhs_bound * rhs_bound,
+                Token.OpIntDivide: lhs_bound,
+                Token.OpModulus: rhs_bound,
+            }.get(node.token)
+            if bound is not None and bound >= VECTOR_INT_LIMIT:
+                raise NotVectorizableException()
+        return OPERATORS[node.token](lhs, rhs), bound
+
+    @visit.register
+    def _(self, node: ast.AssignStmtNode):
+        value = self.evaluate(node.expr)
+        lvalue = node.lvalue
+        if not lvalue.expr_list:
+            if self.frame_slots and lvalue.local:
+                self.frame[lvalue.slot] = value
+            else:
+                self.store_variable(lvalue, value)
+            return
+        target = self.load_variable(lvalue)
+        for expr in lvalue.expr_list[:-1]:
+            target = target[self.evaluate(expr)]
+        target[self.evaluate(lvalue.expr_list[-1])] = value
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        for stmt in node.stmts:
+            if self.fuel is not None:
+                self.burn(1)
+            if type(stmt) is ast.MethodCallExprNode:
+                self.call_method(stmt)
+            else:
+                self.visit(stmt)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        memo = None
+        if node.name in self.memoize:
+            memo = self.memo_tables.setdefault(node.name, MemoTable(self.memo_size))
+        self.store_variable(node, HonFunction(node, memo))
+
+    @visit.register
+    def _(self, node: ast.ReturnStmtNode):
+        raise ReturnException(self.evaluate(node.expr) if node.expr is not None else None)
+
+    @visit.register
+    def _(self, node: ast.ExprNode):
+        self.evaluate(node)
+
+    @functools.singledispatchmethod
+    def evaluate(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @evaluate.register
+    def _(self, node: ast.ValueExprNode):
+        return node.value
+
+    @evaluate.register
+    def _(self, node: ast.VariableRValueExprNode):
+        if not self.frame_slots:
+            value = self.load(node.name)
+        elif node.local and self.frame[node.slot] is not UNBOUND:
+            value = self.frame[node.slot]
+        else:
+            value = self.load_variable(node)
+        for expr in node.expr_list:
+            value = value[self.evaluate(expr)]
+        return value
+
+    @evaluate.register
+    def _(self, node: ast.OperatorExprNode):
+        if node.token == Token.OpAnd:
+            return self.evaluate(node.lhs) and self.evaluate(node.rhs)
+        if node.token == Token.OpOr:
+            return self.evaluate(node.lhs) or self.evaluate(node.rhs)
+        lhs = self.evaluate(node.lhs)
+        if node.rhs is None:
+            return UNARY_OPERATORS[node.token](lhs)
+        rhs = self.evaluate(node.rhs)
+        if self.fuel is not None:
+            self.burn_operator(node.token, lhs, rhs)
+        return OPERATORS[node.token](lhs, rhs)
+
+    @evaluate.register
+    def _(self, node: ast.ListExprNode):
+        values = [self.evaluate(expr) for expr in node.expr_list]
+        return TypedList(values) if self.typed_lists else values
+
+    @evaluate.register
+    def _(self, node: ast.FunctionCallExprNode):
+        fn = self.load_variable(node)
+        return self.call(fn, self.arguments(node))
+
+    @evaluate.register
+    def _(self, node: ast.MethodCallExprNode):
+        return self.call_method(node)
+
+    def call_method(self, node):
+        receiver = self.load_variable(node)
+        if not self.inline_caches:
+            method = getattr(receiver, node.method)
+            return method(*[self.evaluate(expr) for expr in node.expr_list])
+        cache = self.method_caches.get(node)
+        if cache is None:
+            cache = self.method_caches[node] = InlineCache()
+        kind = type(receiver)
+        for cached_kind, function in cache.entries:
+            if cached_kind is kind:
+                cache.hits += 1
+                return function(receiver, *self.arguments(node))
+        cache.misses += 1
+        function = None if cache.megamorphic else resolve_method(kind, node.method)
+        if function is None:
+            method = getattr(receiver, node.method)
+            return method(*[self.evaluate(expr) for expr in node.expr_list])
+        if len(cache.entries) < MAX_POLYMORPHIC:
+            cache.entries.append((kind, function))
+        else:
+            cache.megamorphic = True
+        return function(receiver, *self.arguments(node))
+
+    def arguments(self, node):
+        """
+        Evaluate the arguments of a call, skipping the dispatch of evaluate()
+        for literals and plain variables.
+        """
+        values = []
+        for expr in node.expr_list:
+            kind = type(expr)
+            if kind is ast.ValueExprNode:
+                values.append(expr.value)
+            elif kind is ast.VariableRValueExprNode and not expr.expr_list:
+                values.append(self.load_variable(expr))
+            else:
+                values.append(self.evaluate(expr))
+        return values
@@ -0,0 +1,256 @@
+import collections
+import functools
+import hon.hast as ast
+from hon import visitor
+
+EMPTY = frozenset()
+
+
+def cannot_raise(node):
+    """
+    Whether evaluating node can raise no error: a literal, a plain name, or a
+    list of them.
+    """
+    if isinstance(node, ast.ListExprNode):
+        return all(cannot_raise(expr) for expr in node.expr_list)
+    return isinstance(node, ast.ValueExprNode) or \
+        isinstance(node, ast.VariableRValueExprNode) and not node.expr_list
+
+
+class LivenessVisitor(visitor.Visitor):
+    """
+    Backward liveness analysis over the module body and every function body.
+
+    After analyse(), live_in(stmt) and live_out(stmt) return the frozenset of
+    variable names that may be read before they are next assigned, at the entry
+    and the exit of any statement. A call reads the name of the function called,
+    and a call to a function of the program, or its use as a value, counts as a
+    read of every global that function (or anything it calls) reads.
+    """
+
+    def __init__(self):
+        self.global_reads = {}
+        self._in = {}
+        self._out = {}
+        self.loops = []
+
+    def analyse(self, node_ast_root):
+        defs = [stmt for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+        self.global_reads = self.function_global_reads(defs)
+        for fn in defs:
+            self.loops = []
+            self.visit(fn.block, EMPTY)
+        self.loops = []
+        self.visit(node_ast_root, EMPTY)
+        return self
+
+    def live_in(self, stmt):
+        return self._in[id(stmt)]
+
+    def live_out(self, stmt):
+        return self._out[id(stmt)]
+
+    @staticmethod
+    def function_global_reads(defs):
+        """
+        Return, for each function, the globals it reads directly or through the
+        functions it calls.
+        """
+        reads, calls = {}, {}
+        for fn in defs:
+            local = ast.bound_names(fn.block)
+            local.update(fn.params)
+            reads[fn.name] = {n.name for n in ast.walk(fn.block)
+                              if isinstance(n, (ast.VariableRValueExprNode, ast.VariableLValueNode,
+                                                ast.MethodCallExprNode, ast.FunctionCallExprNode))
+                              and n.name not in local}
+            # A function used as a value may be called later, so it counts as called.
+            calls[fn.name] = {n.name for n in ast.walk(fn.block)
+                              if isinstance(n, (ast.FunctionCallExprNode, ast.VariableRValueExprNode))}
+        changed = True
+        while changed:
+            changed = False
+            for name in reads:
+                size = len(reads[name])
+                for callee in calls[name]:
+                    reads[name] |= reads.get(callee, set())
+                changed = changed or len(reads[name]) != size
+        return {name: frozenset(names) for name, names in reads.items()}
+
+    def uses(self, node):
+        if node is None:
+            return EMPTY
+        names = set()
+        for n in ast.walk(node):
+            if isinstance(n, (ast.VariableRValueExprNode, ast.MethodCallExprNode, ast.FunctionCallExprNode)):
+                names.add(n.name)
+            # Calling a function, or taking it as a value to call later, reads the globals it reads.
+            if isinstance(n, (ast.VariableRValueExprNode, ast.FunctionCallExprNode)):
+                names |= self.global_reads.get(n.name, EMPTY)
+        return frozenset(names)
+
+    def record(self, node, live_in, live_out):
+        self._in[id(node)] = live_in
+        self._out[id(node)] = live_out
+        return live_in
+
+    @functools.singledispatchmethod
+    def visit(self, node, live_out):
+        """
+        Return the variables live on entry to node, given those live on exit.
+        """
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode, live_out):
+        live = live_out
+        for stmt in reversed(node.stmts):
+            live = self.visit(stmt, live)
+        return self.record(node, live, live_out)
+
+    @visit.register
+    def _(self, node: ast.PassStmtNode, live_out):
+        return self.record(node, live_out, live_out)
+
+    @visit.register
+    def _(self, node: ast.BreakStmtNode, live_out):
+        return self.record(node, self.loops[-1][0], live_out)
+
+    @visit.register
+    def _(self, node: ast.ContinueStmtNode, live_out):
+        return self.record(node, self.loops[-1][1], live_out)
+
+    @visit.register
+    def _(self, node: ast.AssignStmtNode, live_out):
+        uses = self.uses(node.expr).union(*(self.uses(expr) for expr in node.lvalue.expr_list))
+        if node.lvalue.expr_list:
+            # Storing into an element reads the variable holding the list.
+            live = live_out | {node.lvalue.name}
+        else:
+            live = live_out - {node.lvalue.name}
+        return self.record(node, live | uses, live_out)
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode, live_out):
+        live = EMPTY
+        for expr, block in reversed(node.expr_block_list):
+            if block is None:
+                live = live_out
+            else:
+                live = live | self.uses(expr) | self.visit(block, live_out)
+        return self.record(node, live, live_out)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode, live_out):
+        live = self.uses(node.expr)
+        for block in node.blocks:
+            live |= self.visit(block, live_out)
+        live |= self.visit(node.default, live_out) if node.default is not None else live_out
+        return self.record(node, live, live_out)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode, live_out):
+        head = live_out | self.uses(node.expr)
+        while True:
+            self.loops.append((live_out, head))
+            body = self.visit(node.block, head)
+            self.loops.pop()
+            new_head = head | body
+            if new_head == head:
+                break
+            head = new_head
+        return self.record(node, head, live_out)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode, live_out):
+        return self.record(node, live_out - {node.name}, live_out)
+
+    @visit.register
+    def _(self, node: ast.ReturnStmtNode, live_out):
+        return self.record(node, self.uses(node.expr), live_out)
+
+    @visit.register
+    def _(self, node: ast.ExprNode, live_out):
+        return self.record(node, live_out | self.uses(node), live_out)
+
+
+class DeadStoreVisitor(visitor.Visitor):
+    """
+    Removes assignments to local variables of functions that are not live
+    afterwards.
+
+    A dead assignment whose right-hand side is a call is replaced by the call;
+    one whose right-hand side could raise otherwise, such as a subscript or a
+    division, is kept. So is the only assignment to a name that is not a
+    parameter, as the name would no longer be local without it, and every
+    assignment at module level, as globals may be read after the program ends.
+    Stores into list elements are kept, as the list may be reachable through
+    another name. Removal can make earlier assignments dead, so liveness is
+    recomputed until nothing more is removed.
+    """
+
+    def __init__(self):
+        self.removed = 0
+        self.liveness = None
+        # The parameters of the function being visited and the number of
+        # assignments to each of its names, or None at module level.
+        self.params = set()
+        self.bindings = None
+
+    def optimize(self, node_ast_root):
+        while True:
+            removed = self.removed
+            self.liveness = LivenessVisitor().analyse(node_ast_root)
+            self.do_visit(node_ast_root)
+            if self.removed == removed:
+                return node_ast_root
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    def removable(self, stmt):
+        """
+        Whether stmt is a dead assignment to a name of a function that stays
+        local without it.
+        """
+        if self.bindings is None or not isinstance(stmt, ast.AssignStmtNode) or stmt.lvalue.expr_list:
+            return False
+        name = stmt.lvalue.name
+        return (name in self.params or self.bindings[name] > 1) and name not in self.liveness.live_out(stmt)
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts = []
+        for stmt in node.stmts:
+            if self.removable(stmt):
+                if isinstance(stmt.expr, (ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+                    stmts.append(stmt.expr)
+                elif not cannot_raise(stmt.expr):
+                    stmts.append(stmt)
+                    continue
+                self.bindings[stmt.lvalue.name] -= 1
+                self.removed += 1
+                continue
+            if isinstance(stmt, ast.FunctionDefStmtNode):
+                self.do_visit(stmt)
+            elif isinstance(stmt, (ast.IfStmtNode, ast.SwitchStmtNode, ast.WhileStmtNode)):
+                for child in ast.iter_child_nodes(stmt):
+                    if isinstance(child, ast.BlockStmtNode):
+                        self.do_visit(child)
+            stmts.append(stmt)
+        node.stmts = stmts or [ast.PassStmtNode()]
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        self.params = set(node.params)
+        self.bindings = collections.Counter(stmt.lvalue.name for stmt in ast.walk(node.block)
+                                            if isinstance(stmt, ast.AssignStmtNode) and not stmt.lvalue.expr_list)
+        self.do_visit(node.block)
+        self.params, self.bindings = set(), None
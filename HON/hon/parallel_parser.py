@@ -0,0 +1,118 @@
+import concurrent.futures
+import contextlib
+import gc
+import io
+import os
+import pickle
+import re
+from hon.lexer import Location, SyntaxErrorException
+from hon.parser import Parser
+import hon.hast as ast
+
+# A def at the left margin starts a top-level statement the parser can begin at.
+DEF_BOUNDARY = re.compile(r'^def\b', re.MULTILINE)
+
+
+def parse_piece(text):
+    """
+    Parse text in a worker process; return its statements, or None and the
+    syntax error as a (message, Location) pair.
+    """
+    try:
+        # The parser traces some of what it parses on stdout.
+        with contextlib.redirect_stdout(io.StringIO()):
+            return Parser(io.StringIO(text)).parse().stmts, None
+    except SyntaxErrorException as e:
+        return None, (e.message, e.location)
+
+
+def parse_pickled(text):
+    """
+    Return the pickled result of parse_piece(text), for the parent process to
+    unpickle with gc disabled: the cyclic garbage collector, running again and
+    again as the nodes are created, takes most of the time of unpickling them.
+    Parsing creates no reference cycles, so it runs with gc disabled as well.
+    """
+    with gc_disabled():
+        return pickle.dumps(parse_piece(text), pickle.HIGHEST_PROTOCOL)
+
+
+@contextlib.contextmanager
+def gc_disabled():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def split(text, pieces):
+    """
+    Return the offsets at which to cut text into at most pieces parts of about
+    equal size, each starting at a def at the left margin, but the first.
+    """
+    cuts = [0]
+    for piece in range(1, pieces):
+        boundary = DEF_BOUNDARY.search(text, max(len(text) * piece // pieces, cuts[-1] + 1))
+        if boundary is None:
+            break
+        if boundary.start() > cuts[-1]:
+            cuts.append(boundary.start())
+    return cuts + [len(text)]
+
+
+def parallel_parse(text, workers=None, min_piece_lines=2000):
+    """
+    Parse a program like Parser.parse(), cutting it at defs at the left margin
+    into a piece per worker process, of at least min_piece_lines lines, and
+    joining the statements of the pieces in source order.
+
+    A piece starts where the parser would be at the start of a top-level
+    statement with no indentation, so it parses as it would in the whole
+    program, and its error locations only need to be moved down by the lines
+    before it. The one exception is a piece that runs out, in an open bracket
+    or a block yet to come, before the next begins: the whole program would
+    fail at the first token of the next piece instead, so that part is parsed
+    again, as one, for the error to be the same.
+    """
+    workers = workers or os.cpu_count() or 1
+    pieces = min(workers, max(text.count('\n') // min_piece_lines, 1))
+    cuts = split(text, pieces)
+    texts = [text[start:end] for start, end in zip(cuts, cuts[1:])]
+    if len(texts) == 1:
+        results = [parse_piece(text)]
+    else:
+        # Forked workers share the objects of the parent, which gc.freeze() keeps the collector out of.
+        with concurrent.futures.ProcessPoolExecutor(min(workers, len(texts)), initializer=gc.freeze) as executor:
+            results = []
+            for result in executor.map(parse_pickled, texts):
+                with gc_disabled():
+                    results.append(pickle.loads(result))
+    stmts = []
+    first_line = 1
+    for index, (piece_stmts, error) in enumerate(results):
+        if error is not None:
+            message, location = error
+            if location.line > texts[index].count('\n') and index + 1 < len(texts):
+                raise window_error(text, cuts[index], cuts[index + 1])
+            raise SyntaxErrorException(message, Location(location.line + first_line - 1, location.col))
+        stmts.extend(piece_stmts)
+        first_line += texts[index].count('\n')
+    return ast.BlockStmtNode(stmts)
+
+
+def window_error(text, cut, next_cut):
+    """
+    Return the error of parsing the part of text around the end of a piece,
+    from cut to next_cut, that ran out: from its last def to the def after the
+    one at next_cut.
+    """
+    start = cut
+    for match in DEF_BOUNDARY.finditer(text, cut, next_cut):
+        start = match.start()
+    boundary = DEF_BOUNDARY.search(text, next_cut + 1)
+    end = boundary.start() if boundary is not None else len(text)
+    _, (message, location) = parse_piece(text[start:end])
+    return SyntaxErrorException(message, Location(location.line + text.count('\n', 0, start), location.col))
@@ -4,9 +4,13 @@ from hon.lexer import Lexer, Token, SyntaxErrorException
 
 class Parser:
 
-    def __init__(self, line):
-        self.lexer = Lexer(line)
+    def __init__(self, line, lexer=None, record=False):
+        # lexer, if given, replaces Lexer(line) as the source of tokens.
+        self.lexer = lexer if lexer is not None else Lexer(line)
         self.token_tuple = self.lexer.next()
+        # With record, every token read.
+        self.record = record
+        self.tokens = [self.token_tuple] if record else None
         self.peek_token_tuple = None
         return
 
@@ -16,6 +20,8 @@ class Parser:
             self.peek_token_tuple = None
         else:
             token_tuple = self.lexer.next()
+            if self.record:
+                self.tokens.append(token_tuple)
         return token_tuple
 
     def peek(self):  # helper routine
@@ -0,0 +1,229 @@
+import functools
+import math
+import hon.hast as ast
+from hon import visitor
+from hon.interpreter import HonFunction, Interpreter
+
+# Builtins that neither do I/O nor depend on anything but their arguments.
+PURE_BUILTINS = {'len', 'int', 'float', 'str', 'bool', 'abs', 'min', 'max'}
+
+
+def global_names(node_ast_root):
+    """
+    Return the globals bound by assignments of the module body, and the names
+    of the functions defined more than once or also bound by an assignment.
+    """
+    module = [stmt for stmt in node_ast_root.stmts if not isinstance(stmt, ast.FunctionDefStmtNode)]
+    assigned = set().union(*(ast.bound_names(stmt) for stmt in module))
+    defs = [stmt.name for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+    return assigned, {name for name in defs if defs.count(name) > 1 or name in assigned}
+
+
+def pure_functions(node_ast_root):
+    """
+    Return the functions whose result only depends on their arguments, by
+    name, and the pure builtins the program does not shadow. A pure function
+    reads and writes no globals, calls only pure builtins and pure functions,
+    and calls methods only on its own locals. Recursion is allowed.
+    """
+    assigned, rebound = global_names(node_ast_root)
+    functions = {stmt.name: stmt for stmt in node_ast_root.stmts
+                 if isinstance(stmt, ast.FunctionDefStmtNode) and stmt.name not in rebound}
+    unshadowed = PURE_BUILTINS - set(functions) - rebound - assigned
+    calls = {}
+    for name, fn in list(functions.items()):
+        local = ast.bound_names(fn.block) | set(fn.params)
+        calls[name] = set()
+        for node in ast.walk(fn.block):
+            if isinstance(node, (ast.VariableRValueExprNode, ast.VariableLValueNode, ast.MethodCallExprNode)) \
+                    and node.name not in local:
+                del functions[name]
+                break
+            if isinstance(node, ast.FunctionCallExprNode):
+                if node.name in local or node.name not in unshadowed and node.name not in functions:
+                    del functions[name]
+                    break
+                if node.name not in unshadowed:
+                    calls[name].add(node.name)
+    pure = set(functions)
+    changed = True
+    while changed:
+        changed = False
+        for name in list(pure):
+            if not calls[name] <= pure:
+                pure.discard(name)
+                changed = True
+    return {name: functions[name] for name in pure}, unshadowed
+
+
+def recursive_pure_functions(node_ast_root):
+    """
+    Return the names of the pure functions that can call themselves, directly
+    or through other functions. Memoizing them can save an exponential number
+    of calls.
+    """
+    pure, builtins = pure_functions(node_ast_root)
+    calls = {name: {node.name for node in ast.walk(fn.block)
+                    if isinstance(node, ast.FunctionCallExprNode) and node.name in pure}
+             for name, fn in pure.items()}
+    recursive = set()
+    for name in pure:
+        seen, stack = set(), list(calls[name])
+        while stack:
+            callee = stack.pop()
+            if callee not in seen:
+                seen.add(callee)
+                stack.extend(calls[callee])
+        if name in seen:
+            recursive.add(name)
+    return recursive
+
+
+class PartialEvaluatorVisitor(visitor.Visitor):
+    """
+    Evaluates calls to pure functions and pure builtins whose arguments are all
+    constants, and replaces each with the constant it returns.
+
+    Every call is run by the interpreter with at most 'fuel' units of work (see
+    Interpreter). A call that runs out of fuel, raises an error or returns
+    something other than a bool, None, a finite float, an int of at most
+    'max_literal' bits or a str of at most 'max_literal' characters is left as
+    it is, so that the error still happens at run time. At module level, a call is
+    only evaluated after the def of its function. The number of calls replaced
+    is counted in 'folded'.
+    """
+
+    def __init__(self, fuel=10000, max_literal=1024):
+        self.fuel = fuel
+        self.max_literal = max_literal
+        self.folded = 0
+        self.pure = {}
+        self.builtins = set()
+        self.defined = set()
+        self.shadowed = set()
+
+    def optimize(self, node_ast_root):
+        self.pure, self.builtins = pure_functions(node_ast_root)
+        self.defined = set()
+        self.shadowed = set()
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    def evaluate(self, call):
+        """
+        Return the value of a call with constant arguments, or raise an exception
+        if it cannot be computed within the fuel limit.
+        """
+        interpreter = Interpreter(fuel=self.fuel)
+        interpreter.globals = {name: HonFunction(fn) for name, fn in self.pure.items()}
+        return interpreter.evaluate(call)
+
+    def foldable(self, call):
+        if call.name in self.shadowed or not all(isinstance(expr, ast.ValueExprNode) for expr in call.expr_list):
+            return False
+        if call.name in self.builtins:
+            return True
+        return call.name in self.pure and call.name in self.defined \
+            and len(call.expr_list) == len(self.pure[call.name].params)
+
+    def literal(self, value):
+        if type(value) is int:
+            return value.bit_length() <= self.max_literal
+        if type(value) is str:
+            return len(value) <= self.max_literal
+        if type(value) is float:
+            return math.isfinite(value)
+        return type(value) in {bool, type(None)}
+
+    def fold(self, node):
+        """
+        Return the expression that replaces node.
+        """
+        if isinstance(node, ast.OperatorExprNode):
+            node.lhs = self.fold(node.lhs)
+            if node.rhs is not None:
+                node.rhs = self.fold(node.rhs)
+        elif isinstance(node, (ast.VariableRValueExprNode, ast.ListExprNode,
+                               ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+            node.expr_list = [self.fold(expr) for expr in node.expr_list]
+        if not isinstance(node, ast.FunctionCallExprNode) or not self.foldable(node):
+            return node
+        try:
+            value = self.evaluate(node)
+        except Exception:
+            return node
+        if not self.literal(value):
+            return node
+        self.folded += 1
+        return ast.ValueExprNode(value)
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts = []
+        for stmt in node.stmts:
+            if isinstance(stmt, ast.ExprNode):
+                stmt = self.fold(stmt)
+            else:
+                self.do_visit(stmt)
+            stmts.append(stmt)
+        node.stmts = stmts
+
+    @visit.register
+    def _(self, node: ast.PassStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.BreakStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.ContinueStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.AssignStmtNode):
+        node.expr = self.fold(node.expr)
+        node.lvalue.expr_list = [self.fold(expr) for expr in node.lvalue.expr_list]
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        node.expr_block_list = [(self.fold(expr), block) for expr, block in node.expr_block_list]
+        for expr, block in node.expr_block_list:
+            self.do_visit(block)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        node.expr = self.fold(node.expr)
+        for block in node.blocks:
+            self.do_visit(block)
+        self.do_visit(node.default)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        node.expr = self.fold(node.expr)
+        self.do_visit(node.block)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        # The body runs when the function is called, by which time every def
+        # of the module has usually run.
+        saved = self.defined, self.shadowed
+        self.defined = set(self.pure)
+        self.shadowed = ast.bound_names(node.block) | set(node.params)
+        self.do_visit(node.block)
+        self.defined, self.shadowed = saved
+        self.defined.add(node.name)
+
+    @visit.register
+    def _(self, node: ast.ReturnStmtNode):
+        if node.expr is not None:
+            node.expr = self.fold(node.expr)
@@ -0,0 +1,273 @@
+import collections
+import contextlib
+import enum
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import hon.hast as ast
+from hon.lexer import Lexer, SyntaxErrorException, Token
+from hon.parser import Parser
+from hon.symbol_table import SymbolTable
+
+# Allocation sites kept per phase, the ones that retained the most.
+SITES = 10
+
+
+class TokenReplay:
+    """
+    Stands in for the Lexer of a Parser, handing out tokens read before, then
+    raising the error that stopped the lexer, if any, at the same point.
+    """
+
+    def __init__(self, tokens, error=None):
+        self.tokens = iter(tokens)
+        self.error = error
+        self.last = None
+
+    def next(self):
+        token = next(self.tokens, None)
+        if token is None:
+            if self.error is not None:
+                raise self.error
+            # Like the Lexer, keep answering EOI.
+            return self.last
+        self.last = token
+        return token
+
+
+def lex(f):
+    """
+    Return the tokens of the program read from f, up to EOI, and the
+    SyntaxErrorException that stopped the lexer before it, or None.
+    """
+    lexer = Lexer(f)
+    tokens = []
+    try:
+        token = lexer.next()
+        tokens.append(token)
+        while token.token != Token.EOI:
+            token = lexer.next()
+            tokens.append(token)
+    except SyntaxErrorException as e:
+        return tokens, e
+    return tokens, None
+
+
+def owned_sizes(root, owner_type, key):
+    """
+    Return the memory held by root, as a Counter of sys.getsizeof() sums keyed
+    by key(owner) for the nearest instance of owner_type above each object,
+    so that a node owns its attributes but not its child nodes. Each object
+    is counted once; classes, functions and enum members are not counted, as
+    in ast_cache.deep_sizeof().
+    """
+    sizes = collections.Counter()
+    seen = set()
+    todo = [(root, None)]
+    while todo:
+        obj, owner = todo.pop()
+        if id(obj) in seen or isinstance(obj, (type, enum.Enum)) or callable(obj):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, owner_type):
+            owner = key(obj)
+        sizes[owner] += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            todo.extend((child, owner) for child in obj.keys())
+            todo.extend((child, owner) for child in obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            todo.extend((child, owner) for child in obj)
+        elif hasattr(obj, '__dict__'):
+            todo.append((vars(obj), owner))
+    return sizes
+
+
+class PipelineStats:
+    """
+    Wall and CPU time of each phase of the compiler, and counts of the tokens
+    by kind, the nodes by class and the symbols by kind of table, summed over
+    every program measured.
+
+    Drivers always go through one of these; a disabled one costs one method
+    call per phase. parse() then just runs the Parser, while an enabled one
+    lexes the whole program first, so that the 'lex' and 'parse' phases are
+    timed apart; the parser gets the same tokens and errors either way.
+
+    With memory, each phase also takes tracemalloc snapshots before and after
+    it, for its peak and retained bytes and the lines of the compiler that
+    allocated them, and the bytes held by the tree and the symbol tables are
+    summed by node class and table type. This is slow, and its phase times
+    include the tracing. tracemalloc is started if it is not tracing already,
+    and close() stops it again then, once nothing more is measured.
+    """
+
+    def __init__(self, enabled=True, memory=False):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.memory_phases = {}
+        self.node_bytes = collections.Counter()
+        self.table_bytes = collections.Counter()
+        self.source_bytes = 0
+        self.source_kb = None
+        self.started_tracing = self.memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        self.phases = {}
+        self.tokens = collections.Counter()
+        self.nodes = collections.Counter()
+        self.tables = collections.Counter()
+        self.symbols = collections.Counter()
+        self.programs = 0
+
+    def close(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def phase(self, name):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self.timed(name)
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        if self.memory:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            phase = self.phases.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0})
+            phase['calls'] += 1
+            phase['wall'] += time.perf_counter() - wall
+            phase['cpu'] += time.process_time() - cpu
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                self.account(name, before, tracemalloc.take_snapshot(), peak - base, current - base)
+
+    def account(self, name, before, after, peak, retained):
+        """
+        Add the memory of a run of phase name to its totals: peak and retained
+        are in bytes over what was allocated when it started.
+        """
+        phase = self.memory_phases.setdefault(
+            name, {'peak': 0, 'retained': 0, 'peak per KB': 0.0, 'sites': collections.Counter()})
+        phase['peak'] = max(phase['peak'], peak)
+        phase['retained'] += retained
+        if self.source_kb:
+            phase['peak per KB'] = max(phase['peak per KB'], peak / self.source_kb)
+        # Lines of the compiler, but not of this module, whose own allocations would only add noise.
+        compiler = os.path.dirname(__file__) + os.sep
+        for stat in after.compare_to(before, 'lineno'):
+            frame = stat.traceback[0]
+            if stat.size_diff > 0 and frame.filename.startswith(compiler) and frame.filename != __file__:
+                phase['sites'][f'{os.path.basename(frame.filename)}:{frame.lineno}'] += stat.size_diff
+
+    def parse(self, f):
+        """
+        Parse the program read from f, as Parser(f).parse() does.
+        """
+        if not self.enabled:
+            return Parser(f).parse()
+        self.programs += 1
+        if self.memory:
+            text = f.read()
+            self.source_kb = len(text.encode()) / 1024
+            self.source_bytes += len(text.encode())
+            f = io.StringIO(text)
+        with self.phase('lex'):
+            tokens, error = lex(f)
+        self.tokens.update(token.token.name for token in tokens)
+        with self.phase('parse'):
+            tree = Parser(None, lexer=TokenReplay(tokens, error)).parse()
+        self.nodes.update(type(node).__name__ for node in ast.walk(tree))
+        if self.memory:
+            self.node_bytes.update(owned_sizes(tree, ast.Node, lambda node: type(node).__name__))
+        return tree
+
+    def count_symbols(self, table):
+        if not self.enabled:
+            return
+        for scope in [table] + table.get_children():
+            self.tables[scope.get_type()] += 1
+            self.symbols[scope.get_type()] += len(scope.get_symbols())
+        if self.memory:
+            self.table_bytes.update(owned_sizes(table, SymbolTable, SymbolTable.get_type))
+
+    def bytes_per_node(self):
+        """
+        Return the bytes the trees hold per node, overall and by node class.
+        """
+        nodes = sum(self.nodes.values())
+        by_class = {name: self.node_bytes[name] / count for name, count in self.nodes.items()}
+        return (sum(self.node_bytes.values()) / nodes if nodes else 0.0), by_class
+
+    def memory_dict(self):
+        kb = self.source_bytes / 1024
+        per_node, by_class = self.bytes_per_node()
+        phases = {}
+        for name, phase in self.memory_phases.items():
+            phases[name] = {'peak': phase['peak'], 'retained': phase['retained'],
+                            'peak per KB': phase['peak per KB'],
+                            'retained per KB': phase['retained'] / kb if kb else 0.0,
+                            'sites': dict(phase['sites'].most_common(SITES))}
+        return {'source bytes': self.source_bytes, 'phases': phases, 'node bytes': dict(self.node_bytes),
+                'bytes per node': per_node, 'bytes per node by class': by_class,
+                'table bytes': dict(self.table_bytes)}
+
+    def as_dict(self):
+        stats = {'programs': self.programs, 'phases': self.phases, 'tokens': dict(self.tokens),
+                 'nodes': dict(self.nodes), 'tables': dict(self.tables), 'symbols': dict(self.symbols)}
+        if self.memory:
+            stats['memory'] = self.memory_dict()
+        return stats
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='hon'):
+        """
+        Return the stats in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def metric(name, help_text, label, values, kind='counter'):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for key, value in sorted(values.items()):
+                lines.append(f'{prefix}_{name}{{{label}="{key}"}} {value}')
+
+        lines.append(f'# HELP {prefix}_programs_total Programs parsed.')
+        lines.append(f'# TYPE {prefix}_programs_total counter')
+        lines.append(f'{prefix}_programs_total {self.programs}')
+        metric('phase_calls_total', 'Times each phase ran.', 'phase',
+               {name: phase['calls'] for name, phase in self.phases.items()})
+        metric('phase_seconds_total', 'Wall time spent in each phase.', 'phase',
+               {name: phase['wall'] for name, phase in self.phases.items()})
+        metric('phase_cpu_seconds_total', 'CPU time spent in each phase.', 'phase',
+               {name: phase['cpu'] for name, phase in self.phases.items()})
+        metric('tokens_total', 'Tokens read, by kind.', 'kind', self.tokens)
+        metric('nodes_total', 'Tree nodes built, by class.', 'class', self.nodes)
+        metric('symbol_tables_total', 'Symbol tables built, by type.', 'type', self.tables)
+        metric('symbols_total', 'Symbols entered, by type of table.', 'type', self.symbols)
+        if self.memory:
+            lines.append(f'# HELP {prefix}_source_bytes_total Source bytes parsed.')
+            lines.append(f'# TYPE {prefix}_source_bytes_total counter')
+            lines.append(f'{prefix}_source_bytes_total {self.source_bytes}')
+            metric('phase_peak_bytes', 'Most memory in use during a run of each phase.', 'phase',
+                   {name: phase['peak'] for name, phase in self.memory_phases.items()}, 'gauge')
+            metric('phase_retained_bytes', 'Memory still in use after each phase.', 'phase',
+                   {name: phase['retained'] for name, phase in self.memory_phases.items()}, 'gauge')
+            metric('node_bytes_total', 'Memory held by tree nodes, by class.', 'class', self.node_bytes)
+            metric('symbol_table_bytes_total', 'Memory held by symbol tables, by type.', 'type', self.table_bytes)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, fmt='json'):
+        text = self.to_json() + '\n' if fmt == 'json' else self.to_prometheus()
+        with open(path, 'w') as f:
+            f.write(text)
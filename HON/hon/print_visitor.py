@@ -51,6 +51,27 @@ class PrintVisitor(visitor.Visitor):
             self.do_visit(block)
         self.indent -= 1
 
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        self.print('(switch)')
+        self.indent += 1
+        self.do_visit(node.expr)
+        for index, block in enumerate(node.blocks):
+            values = [value for value, target in node.cases.items() if target == index]
+            self.print(f'case {values}')
+            self.do_visit(block)
+        if node.default is not None:
+            self.print('default')
+            self.do_visit(node.default)
+        self.indent -= 1
+
+    @visit.register
+    def _(self, node: ast.VectorLoopStmtNode):
+        self.print('(vector loop)')
+        self.indent += 1
+        self.do_visit(node.loop)
+        self.indent -= 1
+
     @visit.register
     def _(self, node: ast.WhileStmtNode):
         self.print('(while)')
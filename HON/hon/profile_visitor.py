@@ -0,0 +1,152 @@
+import functools
+import json
+import math
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+from hon.switch_visitor import pure_key
+
+
+def profile_nodes(node_ast_root):
+    """
+    Return the if and while statements of a tree, in the order used to identify
+    them in a profile file.
+    """
+    nodes = list(ast.walk(node_ast_root))
+    ifs = [node for node in nodes if isinstance(node, ast.IfStmtNode)]
+    loops = [node for node in nodes if isinstance(node, ast.WhileStmtNode)]
+    return len(nodes), ifs, loops
+
+
+def save_profile(interpreter, node_ast_root, path):
+    """
+    Write the counts gathered by an Interpreter run with profile=True.
+    """
+    size, ifs, loops = profile_nodes(node_ast_root)
+    profile = {
+        'nodes': size,
+        'if': {str(index): interpreter.arm_counts[node] for index, node in enumerate(ifs)
+               if node in interpreter.arm_counts},
+        'while': {str(index): interpreter.loop_counts[node] for index, node in enumerate(loops)
+                  if node in interpreter.loop_counts},
+    }
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=1)
+
+
+def load_profile(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def interval(expr):
+    """
+    Return (subject, lo, lo closed, hi, hi closed) if expr restricts one
+    side-effect-free variable to an interval with numeric constants, else None.
+    """
+    if not isinstance(expr, ast.OperatorExprNode) or expr.rhs is None:
+        return None
+    if expr.token == Token.OpAnd:
+        lhs, rhs = interval(expr.lhs), interval(expr.rhs)
+        if lhs is None or rhs is None or lhs[0] != rhs[0]:
+            return None
+        lo = max((lhs[1], not lhs[2]), (rhs[1], not rhs[2]))
+        hi = min((lhs[3], lhs[4]), (rhs[3], rhs[4]))
+        return lhs[0], lo[0], not lo[1], hi[0], hi[1]
+    subject, token, constant = expr.lhs, expr.token, expr.rhs
+    if isinstance(subject, ast.ValueExprNode):
+        mirror = {Token.OpLt: Token.OpGt, Token.OpGt: Token.OpLt,
+                  Token.OpLtEq: Token.OpGtEq, Token.OpGtEq: Token.OpLtEq, Token.OpEq: Token.OpEq}
+        subject, token, constant = constant, mirror.get(token), subject
+    if not isinstance(subject, ast.VariableRValueExprNode) or not isinstance(constant, ast.ValueExprNode) \
+            or type(constant.value) not in {int, float}:
+        return None
+    key, c = pure_key(subject), constant.value
+    if key is None:
+        return None
+    return {
+        Token.OpEq: (key, c, True, c, True),
+        Token.OpLt: (key, -math.inf, False, c, False),
+        Token.OpLtEq: (key, -math.inf, False, c, True),
+        Token.OpGt: (key, c, False, math.inf, False),
+        Token.OpGtEq: (key, c, True, math.inf, False),
+    }.get(token)
+
+
+def disjoint(a, b):
+    if a[0] != b[0]:
+        return False
+    lo, lo_open = max((a[1], not a[2]), (b[1], not b[2]))
+    hi, hi_closed = min((a[3], a[4]), (b[3], b[4]))
+    return lo > hi or (lo == hi and (lo_open or not hi_closed))
+
+
+class ProfileReorderVisitor(visitor.Visitor):
+    """
+    Applies a profile written by save_profile() to the same program.
+
+    Every profiled IfStmtNode gets an 'arm_counts' attribute and every profiled
+    WhileStmtNode an 'iterations' attribute; the only change made to the tree
+    is the order of if/elif arms, and loops are left as they are.
+
+    Consecutive if/elif arms whose conditions restrict the same
+    side-effect-free variable to disjoint intervals are mutually exclusive, so
+    at most one of them holds and they can be tested in any order; within each
+    such run the arms are sorted hottest first.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.reordered = 0
+
+    def optimize(self, node_ast_root):
+        size, ifs, loops = profile_nodes(node_ast_root)
+        if size != self.profile['nodes']:
+            raise ValueError('profile was recorded for a different program')
+        for index, counts in self.profile['if'].items():
+            ifs[int(index)].arm_counts = counts
+        for index, (entries, iterations) in self.profile['while'].items():
+            loops[int(index)].iterations = iterations
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    def reorder(self, node):
+        counts = getattr(node, 'arm_counts', None)
+        if counts is None:
+            return
+        arms = list(zip(node.expr_block_list[:-1], counts))
+        result, run = [], []
+        for arm, count in arms:
+            test = interval(arm[0])
+            if test is not None and all(disjoint(test, other[2]) for other in run):
+                run.append((arm, count, test))
+                continue
+            result.extend(self.sorted_run(run))
+            run = [(arm, count, test)] if test is not None else []
+            if test is None:
+                result.append((arm, count))
+        result.extend(self.sorted_run(run))
+        if [arm for arm, count in result] != node.expr_block_list[:-1]:
+            self.reordered += 1
+            node.expr_block_list = [arm for arm, count in result] + node.expr_block_list[-1:]
+            node.arm_counts = [count for arm, count in result] + counts[-1:]
+
+    @staticmethod
+    def sorted_run(run):
+        return [(arm, count) for arm, count, test in sorted(run, key=lambda item: -item[1])]
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.StmtNode):
+                self.do_visit(child)
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        for expr, block in node.expr_block_list:
+            self.do_visit(block)
+        self.reorder(node)
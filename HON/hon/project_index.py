@@ -0,0 +1,226 @@
+import contextlib
+import hashlib
+import io
+import os
+import sqlite3
+import hon.hast as ast
+from hon.document import identifiers
+from hon.lexer import SyntaxErrorException, Token
+from hon.parser import Parser
+import hon.symbol_table as st
+from hon.symtab_visitor import SymbolTableVisitor
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scopes (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    params TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scopes_file ON scopes (file_id);
+CREATE TABLE IF NOT EXISTS symbols (
+    scope_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    name_id INTEGER NOT NULL,
+    flags INTEGER NOT NULL,
+    PRIMARY KEY (scope_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS occurrences (
+    name_id INTEGER NOT NULL,
+    local INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    col INTEGER NOT NULL,
+    binds INTEGER NOT NULL,
+    PRIMARY KEY (name_id, local, file_id, line, col)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS occurrences_file ON occurrences (file_id);
+'''
+
+
+def occurrences(tokens, tree):
+    """
+    Yield (name, local, line, col, binds) for each identifier among tokens,
+    the tokens of a program whose tree is tree, where local is True where the
+    name is a parameter or local of the def it is in, and binds as in
+    document.identifiers().
+    """
+    defs = iter([stmt for stmt in tree.stmts if isinstance(stmt, ast.FunctionDefStmtNode)])
+    scopes = {}
+    scope = set()
+    depth = 0
+    for token in tokens:
+        # A def at the left margin starts a function; any other statement there ends it. Within
+        # brackets, a line at the margin continues the statement.
+        if token.location.col == 1 and depth <= 0 and \
+                token.token not in {Token.Indent, Token.Dedent, Token.Newline, Token.EOI}:
+            fn = next(defs, None) if token.token == Token.KwDef else None
+            scope = set(fn.params) | ast.bound_names(fn.block) if fn is not None else set()
+        if token.token in {Token.ParenthesisL, Token.BracketL, Token.CurlyBracketL}:
+            depth += 1
+        elif token.token in {Token.ParenthesisR, Token.BracketR, Token.CurlyBracketR}:
+            depth -= 1
+        scopes[id(token)] = scope
+    for token, binds in identifiers(tokens):
+        yield token.lexeme, token.lexeme in scopes[id(token)], token.location.line, token.location.col, binds
+
+
+class ProjectIndex:
+    """
+    An index of the symbols of the HON files of a project, kept in an SQLite
+    database at path, so that questions about all of them need not parse any.
+
+    For each file it holds the symbol tables SymbolTableVisitor builds, the
+    module's and a Function table per def, and every identifier with its
+    location, which are also looked up by name: where a global name is bound
+    and read across the project. Lines and columns are counted from 1, as the
+    lexer does. A file that does not parse keeps its error and the
+    identifiers read before it, but no symbol tables.
+
+    update() only parses again the files whose size or modification time
+    changed and whose content did too.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.parsed = 0
+
+    def close(self):
+        self.db.close()
+
+    def name_ids(self, names):
+        """
+        Return the ids of names, adding the ones not seen before.
+        """
+        self.db.executemany('INSERT OR IGNORE INTO names (name) VALUES (?)', ((name,) for name in names))
+        ids = {}
+        names = list(names)
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            query = 'SELECT name, id FROM names WHERE name IN ({})'.format(','.join('?' * len(batch)))
+            ids.update(self.db.execute(query, batch))
+        return ids
+
+    def update(self, paths):
+        """
+        Index the files at paths that are new or changed; return how many.
+        """
+        indexed = 0
+        with self.db:
+            for path in paths:
+                path = os.path.abspath(path)
+                info = os.stat(path)
+                row = self.db.execute('SELECT id, mtime, size, digest FROM files WHERE path = ?', (path,)).fetchone()
+                if row is not None and row[1:3] == (info.st_mtime_ns, info.st_size):
+                    continue
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.blake2b(data, digest_size=16).digest()
+                if row is not None and row[3] == digest:
+                    self.db.execute('UPDATE files SET mtime = ?, size = ? WHERE id = ?',
+                                    (info.st_mtime_ns, info.st_size, row[0]))
+                    continue
+                if row is not None:
+                    self.forget(row[0])
+                self.index(path, data.decode(), info, digest)
+                indexed += 1
+        return indexed
+
+    def remove(self, paths):
+        with self.db:
+            for path in paths:
+                row = self.db.execute('SELECT id FROM files WHERE path = ?', (os.path.abspath(path),)).fetchone()
+                if row is not None:
+                    self.forget(row[0])
+                    self.db.execute('DELETE FROM files WHERE id = ?', row)
+
+    def forget(self, file_id):
+        self.db.execute('DELETE FROM occurrences WHERE file_id = ?', (file_id,))
+        self.db.execute('DELETE FROM symbols WHERE scope_id IN (SELECT id FROM scopes WHERE file_id = ?)', (file_id,))
+        self.db.execute('DELETE FROM scopes WHERE file_id = ?', (file_id,))
+
+    def index(self, path, text, info, digest):
+        self.parsed += 1
+        parser = Parser(io.StringIO(text), record=True)
+        tree, table, error = ast.BlockStmtNode([]), None, None
+        try:
+            # The parser traces some of what it parses on stdout.
+            with contextlib.redirect_stdout(io.StringIO()):
+                tree = parser.parse()
+            table = SymbolTableVisitor().create_symtable(tree)
+        except SyntaxErrorException as e:
+            error = f'{e.message} at {e.location.line}:{e.location.col}'
+        file_id = self.db.execute(
+            'INSERT INTO files (path, mtime, size, digest, error) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (path) DO UPDATE SET mtime = excluded.mtime, size = excluded.size, '
+            'digest = excluded.digest, error = excluded.error RETURNING id',
+            (path, info.st_mtime_ns, info.st_size, digest, error)).fetchone()[0]
+        found = list(occurrences(parser.tokens, tree))
+        tables = [table] + table.get_children() if table is not None else []
+        ids = self.name_ids({name for name, *_ in found} | {s.get_name() for t in tables for s in t.get_symbols()})
+        self.db.executemany('INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?, ?, ?, ?)',
+                            ((ids[name], local, file_id, line, col, binds) for name, local, line, col, binds in found))
+        for table in tables:
+            params = ','.join(table.get_parameters()) if table.get_type() == 'function' else ''
+            scope_id = self.db.execute('INSERT INTO scopes (file_id, name, type, params) VALUES (?, ?, ?, ?)',
+                                       (file_id, table.get_name(), table.get_type(), params)).lastrowid
+            self.db.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?)',
+                                ((scope_id, seq, ids[s.get_name()], int(s.flags))
+                                 for seq, s in enumerate(table.get_symbols())))
+
+    def references(self, name, definitions=True):
+        """
+        Return (path, line, col, binds) for each place the global name is bound
+        or read, or only read without definitions.
+        """
+        query = ('SELECT path, line, col, binds FROM occurrences JOIN files ON files.id = file_id '
+                 'WHERE name_id = (SELECT id FROM names WHERE name = ?) AND local = 0')
+        if not definitions:
+            query += ' AND binds = 0'
+        return [(path, line, col, bool(binds)) for path, line, col, binds in self.db.execute(query, (name,))]
+
+    def definitions(self, name):
+        """
+        Return (path, line, col) for each place the global name is bound.
+        """
+        return [(path, line, col) for path, line, col, binds in self.references(name) if binds]
+
+    def symbol_table(self, path):
+        """
+        Return the symbol table of the file at path, as SymbolTableVisitor built
+        it, or None if it did not parse.
+        """
+        table = None
+        rows = self.db.execute('SELECT scopes.id, scopes.name, type, params FROM scopes JOIN files '
+                               'ON files.id = file_id WHERE path = ? ORDER BY scopes.id', (os.path.abspath(path),))
+        for scope_id, name, kind, params in rows.fetchall():
+            if kind == 'module':
+                scope = table = st.SymbolTable(name, kind)
+            else:
+                scope = st.Function(name, kind, params.split(',') if params else [])
+                table.add_child(scope)
+            for symbol, flags in self.db.execute('SELECT name, flags FROM symbols JOIN names ON names.id = name_id '
+                                                 'WHERE scope_id = ? ORDER BY seq', (scope_id,)):
+                scope.add_entry(st.Symbol(symbol, st.Symbol.Is(flags)))
+        return table
+
+    def errors(self):
+        return self.db.execute('SELECT path, error FROM files WHERE error IS NOT NULL').fetchall()
+
+    def stats(self):
+        count = lambda table: self.db.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+        return {table: count(table) for table in ('files', 'names', 'scopes', 'symbols', 'occurrences')}
@@ -0,0 +1,82 @@
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.symtab_visitor import SymbolTableVisitor
+
+
+class SlotResolutionVisitor(visitor.Visitor):
+    """
+    Lays out the variables of a program for the interpreter's frame_slots mode.
+
+    The parameters and locals of each function, taken from its
+    symbol_table.Function, get fixed indexes into a list that holds the frame
+    of a call, parameters first; the list is stored as 'slots' on the
+    FunctionDefStmtNode. Every other name gets an index into one list of cells
+    for the module's globals, stored as 'cells' on the root. Each variable,
+    call, method call and def node gets 'local' (True for a frame slot, False
+    for a global cell) and 'slot', the index.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.slots = None
+
+    def resolve(self, node_ast_root):
+        symtable = SymbolTableVisitor().create_symtable(node_ast_root)
+        defs = [stmt for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+        self.cells = {}
+        for fn, table in zip(defs, symtable.get_children()):
+            # The symbol table also lists names only stored into, as in 'x[0] = 1'.
+            bound = ast.bound_names(fn.block)
+            fn.slots = list(table.get_parameters())
+            fn.slots += [name for name in table.get_locals() if name in bound and name not in fn.slots]
+            self.slots = {name: index for index, name in enumerate(fn.slots)}
+            self.do_visit(fn.block)
+        self.slots = None
+        self.do_visit(node_ast_root)
+        node_ast_root.cells = list(self.cells)
+        return node_ast_root
+
+    def bind(self, node):
+        if self.slots is not None and node.name in self.slots:
+            node.local, node.slot = True, self.slots[node.name]
+        else:
+            node.local, node.slot = False, self.cells.setdefault(node.name, len(self.cells))
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        for child in ast.iter_child_nodes(node):
+            self.do_visit(child)
+
+    @visit.register
+    def _(self, node: ast.VariableRValueExprNode):
+        self.bind(node)
+        for expr in node.expr_list:
+            self.do_visit(expr)
+
+    @visit.register
+    def _(self, node: ast.VariableLValueNode):
+        self.bind(node)
+        for expr in node.expr_list:
+            self.do_visit(expr)
+
+    @visit.register
+    def _(self, node: ast.FunctionCallExprNode):
+        self.bind(node)
+        for expr in node.expr_list:
+            self.do_visit(expr)
+
+    @visit.register
+    def _(self, node: ast.MethodCallExprNode):
+        self.bind(node)
+        for expr in node.expr_list:
+            self.do_visit(expr)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        # The body was laid out with the function's own slots.
+        self.bind(node)
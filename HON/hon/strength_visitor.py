@@ -0,0 +1,185 @@
+import collections
+import copy
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+from hon.switch_visitor import pure_key
+from hon.type_visitor import INT, TypeInferenceVisitor
+
+
+class StrengthReductionVisitor(visitor.Visitor):
+    """
+    Replaces power, multiply, integer divide and modulus operators that have a
+    small constant operand with cheaper equivalents.
+
+    Rewrites are only done when type inference proves the other operand is an
+    int, so float rounding is never changed, and all of them hold for negative
+    operands too:
+        x ** 0 -> 1      x ** 1 -> x      x ** n -> x * ... * x  (2 <= n <= max_power)
+        x * 0 -> 0       x * 1 -> x       x * 2 -> x + x
+        x // 1 -> x      x // -1 -> -x    x % 1, x % -1 -> 0
+    An operand is only duplicated when it has no side effects, and only
+    dropped when it is a literal or a plain name, which cannot raise. The
+    number of rewrites of each kind is counted in 'rewrites'.
+    """
+
+    def __init__(self, max_power=4):
+        self.max_power = max_power
+        self.rewrites = collections.Counter()
+
+    def optimize(self, node_ast_root):
+        TypeInferenceVisitor().infer(node_ast_root)
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    @staticmethod
+    def int_node(node):
+        node.type = INT
+        if isinstance(node, ast.OperatorExprNode):
+            node.specialized = 'int'
+        return node
+
+    def product(self, operand, count):
+        expr = operand
+        for _ in range(count - 1):
+            expr = self.int_node(ast.OperatorExprNode(Token.OpMultiply, expr, copy.deepcopy(operand)))
+        return expr
+
+    def reduce(self, node):
+        """
+        Return the expression that replaces node.
+        """
+        if isinstance(node, ast.OperatorExprNode):
+            node.lhs = self.reduce(node.lhs)
+            if node.rhs is not None:
+                node.rhs = self.reduce(node.rhs)
+                return self.reduce_operator(node)
+        elif isinstance(node, (ast.VariableRValueExprNode, ast.ListExprNode,
+                               ast.FunctionCallExprNode, ast.MethodCallExprNode)):
+            node.expr_list = [self.reduce(expr) for expr in node.expr_list]
+        return node
+
+    @staticmethod
+    def int_literal(node):
+        """
+        Return the value of an int literal, possibly negated, or None.
+        """
+        if isinstance(node, ast.OperatorExprNode) and node.token == Token.OpMinus and node.rhs is None:
+            value = StrengthReductionVisitor.int_literal(node.lhs)
+            return None if value is None else -value
+        if isinstance(node, ast.ValueExprNode) and type(node.value) is int:
+            return node.value
+        return None
+
+    @staticmethod
+    def droppable(node):
+        """
+        Whether node may go unevaluated: a literal or a plain name.
+        """
+        return isinstance(node, ast.ValueExprNode) or \
+            isinstance(node, ast.VariableRValueExprNode) and not node.expr_list
+
+    def reduce_operator(self, node):
+        operand, constant = node.lhs, node.rhs
+        if node.token == Token.OpMultiply and self.int_literal(operand) is not None:
+            operand, constant = constant, operand
+        value = self.int_literal(constant)
+        if value is None or getattr(operand, 'type', None) != INT or pure_key(operand) is None:
+            return node
+        if node.token == Token.OpPower and constant is node.rhs:
+            if value == 0 and self.droppable(operand):
+                self.rewrites['power-identity'] += 1
+                return self.int_node(ast.ValueExprNode(1))
+            if value == 1:
+                self.rewrites['power-identity'] += 1
+                return operand
+            if 2 <= value <= self.max_power:
+                self.rewrites['square' if value == 2 else 'power'] += 1
+                return self.product(operand, value)
+        elif node.token == Token.OpMultiply:
+            if value == 0 and self.droppable(operand):
+                self.rewrites['multiply-identity'] += 1
+                return self.int_node(ast.ValueExprNode(0))
+            if value == 1:
+                self.rewrites['multiply-identity'] += 1
+                return operand
+            if value == 2:
+                self.rewrites['double'] += 1
+                return self.int_node(ast.OperatorExprNode(Token.OpPlus, operand, copy.deepcopy(operand)))
+        elif node.token == Token.OpIntDivide and constant is node.rhs:
+            if value == 1:
+                self.rewrites['divide-identity'] += 1
+                return operand
+            if value == -1:
+                self.rewrites['divide-identity'] += 1
+                return self.int_node(ast.OperatorExprNode(Token.OpMinus, operand))
+        elif node.token == Token.OpModulus and constant is node.rhs:
+            if value in {1, -1} and self.droppable(operand):
+                self.rewrites['modulus-identity'] += 1
+                return self.int_node(ast.ValueExprNode(0))
+        return node
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts = []
+        for stmt in node.stmts:
+            if isinstance(stmt, ast.ExprNode):
+                stmt = self.reduce(stmt)
+            else:
+                self.do_visit(stmt)
+            stmts.append(stmt)
+        node.stmts = stmts
+
+    @visit.register
+    def _(self, node: ast.PassStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.BreakStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.ContinueStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.AssignStmtNode):
+        node.expr = self.reduce(node.expr)
+        node.lvalue.expr_list = [self.reduce(expr) for expr in node.lvalue.expr_list]
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        node.expr_block_list = [(self.reduce(expr), block) for expr, block in node.expr_block_list]
+        for expr, block in node.expr_block_list:
+            self.do_visit(block)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        node.expr = self.reduce(node.expr)
+        for block in node.blocks:
+            self.do_visit(block)
+        self.do_visit(node.default)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        node.expr = self.reduce(node.expr)
+        self.do_visit(node.block)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        self.do_visit(node.block)
+
+    @visit.register
+    def _(self, node: ast.ReturnStmtNode):
+        if node.expr is not None:
+            node.expr = self.reduce(node.expr)
@@ -0,0 +1,156 @@
+import copy
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+
+# Comparisons 'c <op> x' are read as 'x <mirror op> c'.
+MIRROR = {
+    Token.OpEq: Token.OpEq,
+    Token.OpLt: Token.OpGt,
+    Token.OpLtEq: Token.OpGtEq,
+    Token.OpGt: Token.OpLt,
+    Token.OpGtEq: Token.OpLtEq,
+}
+
+
+def pure_key(node):
+    """
+    Return a structural key for a side-effect-free expression, or None if the
+    expression may have side effects.
+    """
+    if isinstance(node, ast.ValueExprNode):
+        return 'value', type(node.value), node.value
+    if isinstance(node, ast.VariableRValueExprNode):
+        keys = tuple(pure_key(expr) for expr in node.expr_list)
+        return None if None in keys else ('variable', node.name, keys)
+    if isinstance(node, ast.OperatorExprNode):
+        lhs = pure_key(node.lhs)
+        rhs = pure_key(node.rhs) if node.rhs is not None else ()
+        return None if lhs is None or rhs is None else ('op', node.token, lhs, rhs)
+    return None
+
+
+class SwitchLoweringVisitor(visitor.Visitor):
+    """
+    Lowers if/elif chains that compare one side-effect-free variable against
+    literal constants.
+
+    A chain of 'x == c' tests with distinct constants becomes a SwitchStmtNode,
+    i.e. a single hash-table lookup. A chain of 'x < c' tests (or <=, >, >=) whose
+    constants are strictly increasing (decreasing for > and >=) becomes a binary
+    search of nested if statements, which picks the first arm whose test holds
+    after O(log n) comparisons. Only the leading arms that fit the pattern are
+    lowered; the remaining arms and the else arm are kept as the default.
+
+    SwitchStmtNode is not understood by every pass, so run this one last.
+    """
+
+    def __init__(self, min_cases=3):
+        self.min_cases = min_cases
+        self.switches = 0
+        self.searches = 0
+
+    def optimize(self, node_ast_root):
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    def test(self, expr):
+        """
+        Return (subject key, subject, op, constant) if expr compares a
+        side-effect-free variable against a literal.
+        """
+        if not isinstance(expr, ast.OperatorExprNode) or expr.token not in MIRROR:
+            return None
+        subject, op, value = expr.lhs, expr.token, expr.rhs
+        if isinstance(subject, ast.ValueExprNode):
+            subject, op, value = value, MIRROR[op], subject
+        if not isinstance(subject, ast.VariableRValueExprNode) or not isinstance(value, ast.ValueExprNode):
+            return None
+        key = pure_key(subject)
+        if key is None:
+            return None
+        if op != Token.OpEq and (type(value.value) not in {int, float}):
+            return None
+        return key, subject, op, value.value
+
+    def chain(self, node):
+        """
+        Return the leading arms of an if statement that test the same subject
+        with the same operator, as a list of (constant, block).
+        """
+        arms, first = [], None
+        for expr, block in node.expr_block_list[:-1]:
+            test = self.test(expr)
+            if test is None or first is not None and (test[0] != first[0] or test[2] != first[2]):
+                break
+            if arms and test[2] in {Token.OpLt, Token.OpLtEq} and not test[3] > arms[-1][0]:
+                break
+            if arms and test[2] in {Token.OpGt, Token.OpGtEq} and not test[3] < arms[-1][0]:
+                break
+            first = first or test
+            arms.append((test[3], block))
+        return first, arms
+
+    def lower(self, node):
+        """
+        Return the statement that replaces the if statement node.
+        """
+        first, arms = self.chain(node)
+        if len(arms) < self.min_cases:
+            return node
+        rest = node.expr_block_list[len(arms):]
+        if len(rest) == 1:
+            default = rest[0][1]
+        else:
+            default = ast.BlockStmtNode([self.lower(ast.IfStmtNode(rest))])
+        key, subject, op, value = first
+        if op == Token.OpEq:
+            cases, blocks = {}, []
+            for value, block in arms:
+                if value not in cases:      # A repeated constant can never match again.
+                    cases[value] = len(blocks)
+                    blocks.append(block)
+            self.switches += 1
+            return ast.SwitchStmtNode(subject, cases, blocks, default)
+        self.searches += 1
+        return self.search(subject, op, arms, 0, len(arms), default).stmts[0]
+
+    def search(self, subject, op, arms, lo, hi, default):
+        """
+        Return a block that runs the first of arms[lo:hi] whose test holds, or
+        default if none does.
+        """
+        if lo == hi:
+            return arms[lo][1] if lo < len(arms) else default
+        mid = (lo + hi) // 2
+        test = ast.OperatorExprNode(op, copy.deepcopy(subject), ast.ValueExprNode(arms[mid][0]))
+        left = self.search(subject, op, arms, lo, mid, default)
+        right = self.search(subject, op, arms, mid + 1, hi, default)
+        if right is None:
+            expr_block_list = [(test, left), (ast.ValueExprNode(False), None)]
+        else:
+            expr_block_list = [(test, left), (ast.ValueExprNode(True), right)]
+        return ast.BlockStmtNode([ast.IfStmtNode(expr_block_list)])
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts = []
+        for stmt in node.stmts:
+            if isinstance(stmt, ast.IfStmtNode):
+                for expr, block in stmt.expr_block_list:
+                    self.do_visit(block)
+                stmt = self.lower(stmt)
+            elif isinstance(stmt, (ast.WhileStmtNode, ast.FunctionDefStmtNode)):
+                self.do_visit(stmt.block)
+            stmts.append(stmt)
+        node.stmts = stmts
@@ -1,6 +1,4 @@
 import functools
-from symtable import symtable
-from sys import flags
 import hon.hast as ast
 from hon import visitor
 import hon.symbol_table as st
@@ -86,6 +84,17 @@ class SymbolTableVisitor(visitor.Visitor):
             self.do_visit(expr)
             self.do_visit(block)
 
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        self.do_visit(node.expr)
+        for block in node.blocks:
+            self.do_visit(block)
+        self.do_visit(node.default)
+
+    @visit.register
+    def _(self, node: ast.VectorLoopStmtNode):
+        self.do_visit(node.loop)
+
     @visit.register
     def _(self, node: ast.WhileStmtNode):
         self.do_visit(node.expr)
@@ -0,0 +1,105 @@
+import functools
+import hon.hast as ast
+from hon import visitor
+
+
+class TailCallVisitor(visitor.Visitor):
+    """
+    Turns self tail calls into a loop, so that tail-recursive functions run in
+    constant stack space.
+
+    A self tail call is either 'return f(...)' outside of any while loop in the
+    body of f, or a call statement 'f(...)' that is the last thing f executes
+    (allowed only when f never returns a value). The body is wrapped in
+    'while True:', and each tail call assigns the new arguments to the
+    parameters and continues the loop.
+    """
+
+    def __init__(self, prefix='_tail_'):
+        self.prefix = prefix
+        self.eliminated = 0
+        self.functions = set()
+
+    def optimize(self, node_ast_root):
+        defs = [stmt for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+        names = [fn.name for fn in defs]
+        assigned = ast.bound_names(node_ast_root)
+        # A name that is rebound may not refer to the function itself at run time.
+        self.functions = {name for name in names if names.count(name) == 1 and name not in assigned}
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    def is_self_call(self, node, fn):
+        return isinstance(node, ast.FunctionCallExprNode) and node.name == fn.name \
+            and len(node.expr_list) == len(fn.params)
+
+    def tail_calls(self, fn, block, tail, sites):
+        """
+        Collect (block, index, call) for every self tail call in block.
+        """
+        for index, stmt in enumerate(block.stmts):
+            is_tail = tail and index == len(block.stmts) - 1
+            if isinstance(stmt, ast.ReturnStmtNode) and self.is_self_call(stmt.expr, fn):
+                sites.append((block, index, stmt.expr))
+            elif is_tail and self.is_self_call(stmt, fn):
+                sites.append((block, index, stmt))
+            elif isinstance(stmt, ast.IfStmtNode):
+                for expr, arm in stmt.expr_block_list:
+                    if arm is not None:
+                        self.tail_calls(fn, arm, is_tail, sites)
+            elif isinstance(stmt, ast.SwitchStmtNode):
+                for arm in stmt.blocks + [stmt.default]:
+                    if arm is not None:
+                        self.tail_calls(fn, arm, is_tail, sites)
+        return sites
+
+    def rebind(self, fn, call):
+        """
+        Return the statements that assign the arguments of call to the parameters
+        of fn, all arguments being evaluated before any parameter changes.
+        """
+        changed = [(param, expr) for param, expr in zip(fn.params, call.expr_list)
+                   if not (isinstance(expr, ast.VariableRValueExprNode) and expr.name == param and not expr.expr_list)]
+        if len(changed) == 1:
+            param, expr = changed[0]
+            return [ast.AssignStmtNode(ast.VariableLValueNode(param, []), expr)]
+        stmts = [ast.AssignStmtNode(ast.VariableLValueNode(self.prefix + param, []), expr)
+                 for param, expr in changed]
+        stmts.extend(ast.AssignStmtNode(ast.VariableLValueNode(param, []),
+                                        ast.VariableRValueExprNode(self.prefix + param, []))
+                     for param, expr in changed)
+        return stmts
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        for stmt in node.stmts:
+            if isinstance(stmt, ast.FunctionDefStmtNode):
+                self.do_visit(stmt)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        if node.name not in self.functions:
+            return
+        sites = self.tail_calls(node, node.block, True, [])
+        if any(isinstance(n, ast.ReturnStmtNode) and n.expr is not None for n in ast.walk(node.block)):
+            # The result of a tail call statement is dropped, so it only
+            # matches the loop if the function never returns a value.
+            sites = [site for site in sites if not isinstance(site[0].stmts[site[1]], ast.FunctionCallExprNode)]
+        if not sites:
+            return
+        for block, index, call in reversed(sites):
+            block.stmts[index:index + 1] = self.rebind(node, call) + [ast.ContinueStmtNode()]
+        body = node.block.stmts
+        if not isinstance(body[-1], (ast.ReturnStmtNode, ast.ContinueStmtNode)):
+            body.append(ast.ReturnStmtNode())
+        node.block = ast.BlockStmtNode([ast.WhileStmtNode(ast.ValueExprNode(True), ast.BlockStmtNode(body))])
+        self.eliminated += len(sites)
@@ -0,0 +1,380 @@
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+
+# A type is a frozenset of the names below; 'object' stands for anything else
+# (or for a type that could not be inferred).
+INT = frozenset({'int'})
+FLOAT = frozenset({'float'})
+STR = frozenset({'str'})
+BOOL = frozenset({'bool'})
+NONE = frozenset({'None'})
+LIST = frozenset({'list'})
+ANY = frozenset({'object'})
+EMPTY = frozenset()
+
+ARITHMETIC = {Token.OpPlus, Token.OpMinus, Token.OpMultiply, Token.OpDivide,
+              Token.OpModulus, Token.OpIntDivide, Token.OpPower}
+COMPARISON = {Token.OpLt, Token.OpGt, Token.OpEq, Token.OpGtEq, Token.OpLtEq, Token.OpNotEq}
+
+BUILTINS = {
+    'print': NONE,
+    'len': INT,
+    'int': INT,
+    'float': FLOAT,
+    'str': STR,
+    'bool': BOOL,
+    'input': STR,
+}
+
+METHODS = {
+    ('list', 'append'): NONE,
+    ('list', 'insert'): NONE,
+    ('list', 'clear'): NONE,
+    ('list', 'reverse'): NONE,
+    ('list', 'index'): INT,
+    ('list', 'count'): INT,
+    ('list', 'copy'): LIST,
+    ('str', 'upper'): STR,
+    ('str', 'lower'): STR,
+    ('str', 'strip'): STR,
+    ('str', 'replace'): STR,
+    ('str', 'find'): INT,
+    ('str', 'count'): INT,
+    ('str', 'split'): LIST,
+}
+
+
+def value_type(value):
+    return frozenset({'None' if value is None else type(value).__name__})
+
+
+def binary_type(token, lhs, rhs):
+    """
+    Return the name of the type of 'lhs <token> rhs' for single type names, or
+    None if Python raises a TypeError for it.
+    """
+    numeric = {'int', 'float', 'bool'}
+    if lhs in numeric and rhs in numeric:
+        if token == Token.OpDivide or 'float' in (lhs, rhs):
+            return 'float'
+        return 'int'
+    if token == Token.OpPlus and lhs == rhs and lhs in {'str', 'list'}:
+        return lhs
+    if token == Token.OpMultiply:
+        if lhs in {'str', 'list'} and rhs in {'int', 'bool'}:
+            return lhs
+        if rhs in {'str', 'list'} and lhs in {'int', 'bool'}:
+            return rhs
+    if token == Token.OpModulus and lhs == 'str':
+        return 'str'
+    return None
+
+
+def specialization(lhs, rhs=None):
+    """
+    Return 'int' if an operation only ever sees int operands, 'float' if it only
+    sees floats, and None if it needs dynamic dispatch. Arithmetic on ints that
+    may not give an int, like '/', is only specialized by the caller if it does.
+    """
+    if not lhs or (rhs is not None and not rhs):
+        return None
+    operands = lhs | (rhs if rhs is not None else EMPTY)
+    if operands == INT:
+        return 'int'
+    if operands == FLOAT:
+        return 'float'
+    return None
+
+
+class TypeInferenceVisitor(visitor.Visitor):
+    """
+    Flow-sensitive type inference.
+
+    Every ExprNode gets a 'type' attribute holding the frozenset of type names it
+    may evaluate to, and every arithmetic or comparison OperatorExprNode gets a
+    'specialized' attribute ('int', 'float' or None) telling an execution engine
+    which operation it may use without checking operand types.
+
+    Local variables are tracked per program point. Globals read inside functions,
+    parameters and function results are tracked per name, and the whole program
+    is analysed repeatedly until none of those change; if they still change
+    after max_passes, every expression is given ANY and nothing is specialized.
+    """
+
+    def __init__(self, max_passes=20):
+        self.max_passes = max_passes
+        self.functions = {}
+        self.params = {}
+        self.returns = {}
+        self.global_types = {}
+        self.env = None
+
+    def infer(self, node_ast_root):
+        defs = [stmt for stmt in node_ast_root.stmts if isinstance(stmt, ast.FunctionDefStmtNode)]
+        names = [fn.name for fn in defs]
+        assigned = ast.bound_names(node_ast_root)
+        self.functions = {fn.name: fn for fn in defs if names.count(fn.name) == 1 and fn.name not in assigned}
+        called = {node.name for node in ast.walk(node_ast_root) if isinstance(node, ast.FunctionCallExprNode)}
+        # A function used as a value may be called from anywhere, with anything.
+        escaping = {node.name for node in ast.walk(node_ast_root) if isinstance(node, ast.VariableRValueExprNode)}
+        for fn in defs:
+            known = fn.name in self.functions and fn.name in called and fn.name not in escaping
+            self.params[fn.name] = [EMPTY if known else ANY for _ in fn.params]
+            self.returns[fn.name] = EMPTY
+
+        for _ in range(self.max_passes):
+            before = self.snapshot()
+            self.function = None
+            self.env, self.loops = {}, []
+            self.do_visit(node_ast_root)
+            for fn in defs:
+                self.analyse_function(fn)
+            if self.snapshot() == before:
+                break
+        else:
+            # The types of the last pass may be narrower than those of a fixed point.
+            for node in ast.walk(node_ast_root):
+                if isinstance(node, ast.ExprNode):
+                    node.type = ANY
+                if isinstance(node, ast.OperatorExprNode):
+                    node.specialized = None
+        return node_ast_root
+
+    def snapshot(self):
+        return ({name: tuple(types) for name, types in self.params.items()},
+                dict(self.returns), dict(self.global_types))
+
+    def analyse_function(self, fn):
+        self.function = fn
+        self.locals = ast.bound_names(fn.block)
+        self.locals.update(fn.params)
+        self.env = dict(zip(fn.params, self.params[fn.name]))
+        self.loops = []
+        self.do_visit(fn.block)
+        if self.env is not None:
+            self.returns[fn.name] |= NONE
+        self.function = None
+
+    def lookup(self, name):
+        if self.function is None or name in self.locals:
+            return self.env.get(name, EMPTY)
+        return self.global_types.get(name, ANY)
+
+    def assign(self, name, types):
+        if self.function is None:
+            self.global_types[name] = self.global_types.get(name, EMPTY) | types
+        self.env[name] = types
+
+    @staticmethod
+    def join(*envs):
+        """
+        Join environments; None marks a program point that cannot be reached.
+        """
+        result = None
+        for env in envs:
+            if env is None:
+                continue
+            if result is None:
+                result = dict(env)
+            else:
+                for name, types in env.items():
+                    result[name] = result.get(name, EMPTY) | types
+        return result
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        for stmt in node.stmts:
+            if self.env is None:
+                break
+            self.do_visit(stmt)
+
+    @visit.register
+    def _(self, node: ast.PassStmtNode):
+        pass
+
+    @visit.register
+    def _(self, node: ast.BreakStmtNode):
+        self.loops[-1][1].append(self.env)
+        self.env = None
+
+    @visit.register
+    def _(self, node: ast.ContinueStmtNode):
+        self.loops[-1][0].append(self.env)
+        self.env = None
+
+    @visit.register
+    def _(self, node: ast.AssignStmtNode):
+        types = self.type_of(node.expr)
+        for expr in node.lvalue.expr_list:
+            self.type_of(expr)
+        # Storing into an element leaves the variable bound to the same object.
+        if not node.lvalue.expr_list:
+            self.assign(node.lvalue.name, types)
+
+    @visit.register
+    def _(self, node: ast.IfStmtNode):
+        env, exits = self.env, []
+        for expr, block in node.expr_block_list:
+            self.env = env
+            self.type_of(expr)
+            if block is None:
+                exits.append(env)
+            else:
+                self.env = dict(env)
+                self.do_visit(block)
+                exits.append(self.env)
+        self.env = self.join(*exits)
+
+    @visit.register
+    def _(self, node: ast.SwitchStmtNode):
+        env = self.env
+        self.type_of(node.expr)
+        exits = [] if node.default is not None else [env]
+        for block in node.blocks + [node.default]:
+            if block is not None:
+                self.env = dict(env)
+                self.do_visit(block)
+                exits.append(self.env)
+        self.env = self.join(*exits)
+
+    @visit.register
+    def _(self, node: ast.WhileStmtNode):
+        head = self.env
+        while True:
+            self.env = dict(head)
+            self.type_of(node.expr)
+            self.loops.append(([], []))
+            self.do_visit(node.block)
+            continues, breaks = self.loops.pop()
+            new_head = self.join(head, self.env, *continues)
+            if new_head == head:
+                break
+            head = new_head
+        self.env = self.join(head, *breaks)
+
+    @visit.register
+    def _(self, node: ast.FunctionDefStmtNode):
+        self.assign(node.name, ANY)
+
+    @visit.register
+    def _(self, node: ast.ReturnStmtNode):
+        types = self.type_of(node.expr) if node.expr is not None else NONE
+        if self.function is not None:
+            self.returns[self.function.name] |= types
+        self.env = None
+
+    @visit.register
+    def _(self, node: ast.ExprNode):
+        self.type_of(node)
+
+    def type_of(self, node):
+        node.type = self.expr_type(node)
+        return node.type
+
+    @functools.singledispatchmethod
+    def expr_type(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @expr_type.register
+    def _(self, node: ast.ValueExprNode):
+        return value_type(node.value)
+
+    @expr_type.register
+    def _(self, node: ast.VariableRValueExprNode):
+        types = self.lookup(node.name)
+        for expr in node.expr_list:
+            self.type_of(expr)
+            types = STR if types == STR else (EMPTY if not types else ANY)
+        return types
+
+    @expr_type.register
+    def _(self, node: ast.OperatorExprNode):
+        lhs = self.type_of(node.lhs)
+        rhs = self.type_of(node.rhs) if node.rhs is not None else None
+        node.specialized = None
+        if node.token == Token.OpNot or node.token in COMPARISON:
+            if node.token in COMPARISON:
+                node.specialized = specialization(lhs, rhs)
+            return BOOL
+        if node.token in {Token.OpAnd, Token.OpOr}:
+            return lhs | rhs
+        types = self.arithmetic_type(node, lhs, rhs)
+        # An operation is only specialized for operands of one type if it gives that type too.
+        specialized = specialization(lhs, rhs)
+        node.specialized = specialized if types == frozenset({specialized}) else None
+        return types
+
+    @staticmethod
+    def arithmetic_type(node, lhs, rhs):
+        if rhs is None:
+            if 'object' in lhs:
+                return ANY
+            return frozenset('float' if name == 'float' else 'int'
+                             for name in lhs if name in {'int', 'float', 'bool'})
+        if 'object' in lhs or 'object' in rhs:
+            return ANY
+        types = {binary_type(node.token, left, right) for left in lhs for right in rhs} - {None}
+        if node.token == Token.OpPower:
+            if 'float' in types:
+                types.add('object')     # A negative float to a fractional power is complex.
+            if 'int' in types and not (isinstance(node.rhs, ast.ValueExprNode) and rhs == INT
+                                       and node.rhs.value >= 0):
+                types.add('float')
+        return frozenset(types)
+
+    @expr_type.register
+    def _(self, node: ast.ListExprNode):
+        for expr in node.expr_list:
+            self.type_of(expr)
+        return LIST
+
+    @expr_type.register
+    def _(self, node: ast.FunctionCallExprNode):
+        args = [self.type_of(expr) for expr in node.expr_list]
+        fn = self.functions.get(node.name)
+        if fn is not None and not (self.function is not None and node.name in self.locals):
+            if len(args) != len(fn.params):
+                return EMPTY
+            params = self.params[node.name]
+            self.params[node.name] = [old | new for old, new in zip(params, args)]
+            return self.returns[node.name]
+        if node.name in {'abs', 'min', 'max'}:
+            types = EMPTY.union(*args)
+            return types if types <= {'int', 'float'} else ANY
+        return BUILTINS.get(node.name, ANY)
+
+    @expr_type.register
+    def _(self, node: ast.MethodCallExprNode):
+        for expr in node.expr_list:
+            self.type_of(expr)
+        receiver = self.lookup(node.name)
+        if len(receiver) != 1:
+            return ANY
+        return METHODS.get((next(iter(receiver)), node.method), ANY)
+
+
+def specialization_stats(node_ast_root):
+    """
+    Return (operations, int-specialized, float-specialized) over the arithmetic
+    and comparison operators of an already analysed tree.
+    """
+    total = ints = floats = 0
+    for node in ast.walk(node_ast_root):
+        if isinstance(node, ast.OperatorExprNode) and (node.token in ARITHMETIC or node.token in COMPARISON):
+            total += 1
+            specialized = getattr(node, 'specialized', None)
+            ints += specialized == 'int'
+            floats += specialized == 'float'
+    return total, ints, floats
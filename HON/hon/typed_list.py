@@ -0,0 +1,176 @@
+import array
+import collections.abc
+
+# Array type codes for lists whose elements all have one of these types.
+TYPECODES = {int: 'q', float: 'd'}
+
+
+def pack(items):
+    """
+    Return compact storage for a list of items: an array if they are all ints
+    that fit in 64 bits, or all floats, else a list. An empty list gets an empty
+    int array, which takes the type of the first element added to it.
+    """
+    items = list(items)
+    kinds = {type(item) for item in items}
+    if not kinds:
+        return array.array('q')
+    if len(kinds) == 1 and kinds <= TYPECODES.keys():
+        try:
+            return array.array(TYPECODES[kinds.pop()], items)
+        except OverflowError:
+            pass
+    return items
+
+
+class TypedList(collections.abc.MutableSequence):
+    """
+    A list that keeps its elements unboxed in an array('q') or array('d') for
+    as long as they are all ints or all floats, and falls back to a Python list
+    of objects, for good, when an element of another type is stored. It
+    compares, prints, concatenates and repeats like a list.
+    """
+
+    __hash__ = None
+
+    def __init__(self, items=()):
+        self.items = pack(items)
+
+    @property
+    def storage(self):
+        if isinstance(self.items, array.array):
+            return 'int64' if self.items.typecode == 'q' else 'float64'
+        return 'object'
+
+    def accepts(self, values):
+        """
+        Make the storage able to hold values, converting it if needed.
+        """
+        if not isinstance(self.items, array.array):
+            return
+        if not self.items and values:
+            self.items = pack(values)
+            del self.items[:]
+        code = self.items.typecode if isinstance(self.items, array.array) else None
+        if code is None or any(TYPECODES.get(type(value)) != code for value in values) \
+                or code == 'q' and any(not -2 ** 63 <= value < 2 ** 63 for value in values):
+            self.items = list(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TypedList(self.items[index])
+        try:
+            return self.items[index]
+        except IndexError:
+            raise IndexError('list index out of range') from None
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = list(value)
+            self.accepts(value)
+            if isinstance(self.items, array.array):
+                value = array.array(self.items.typecode, value)
+        else:
+            self.accepts([value])
+        try:
+            self.items[index] = value
+        except IndexError:
+            raise IndexError('list assignment index out of range') from None
+
+    def __delitem__(self, index):
+        del self.items[index]
+
+    def insert(self, index, value):
+        self.accepts([value])
+        self.items.insert(index, value)
+
+    def append(self, value):
+        self.accepts([value])
+        self.items.append(value)
+
+    def extend(self, values):
+        values = list(values)
+        self.accepts(values)
+        self.items.extend(values)
+
+    def pop(self, index=-1):
+        if not self.items:
+            raise IndexError('pop from empty list')
+        try:
+            return self.items.pop(index)
+        except IndexError:
+            raise IndexError('pop index out of range') from None
+
+    def clear(self):
+        del self.items[:]
+
+    def reverse(self):
+        self.items.reverse()
+
+    def copy(self):
+        return TypedList(self.items)
+
+    def sort(self, key=None, reverse=False):
+        self[:] = sorted(self.items, key=key, reverse=reverse)
+
+    def __repr__(self):
+        return repr(list(self.items))
+
+    def __eq__(self, other):
+        if isinstance(other, (TypedList, list)):
+            return list(self.items) == list(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, (TypedList, list)):
+            return list(self.items) < list(other)
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, (TypedList, list)):
+            return list(self.items) <= list(other)
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, (TypedList, list)):
+            return list(self.items) > list(other)
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, (TypedList, list)):
+            return list(self.items) >= list(other)
+        return NotImplemented
+
+    def __add__(self, other):
+        if isinstance(other, TypedList) and type(self.items) is type(other.items) \
+                and (not isinstance(self.items, array.array) or self.items.typecode == other.items.typecode):
+            result = TypedList()
+            result.items = self.items + other.items
+            return result
+        if isinstance(other, (TypedList, list)):
+            return TypedList(list(self.items) + list(other))
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return TypedList(other + list(self.items))
+        return NotImplemented
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __mul__(self, count):
+        if not isinstance(count, int):
+            return NotImplemented
+        result = TypedList()
+        result.items = self.items * count
+        return result
+
+    __rmul__ = __mul__
@@ -0,0 +1,126 @@
+import functools
+import hon.hast as ast
+from hon import visitor
+from hon.lexer import Token
+
+# Operators NumPy applies element by element with the same results as Python.
+ELEMENTWISE = {Token.OpPlus, Token.OpMinus, Token.OpMultiply, Token.OpDivide, Token.OpIntDivide, Token.OpModulus}
+
+
+class VectorizeVisitor(visitor.Visitor):
+    """
+    Replaces counted loops of element-wise list assignments, such as
+
+        while i < n:
+            a[i] = b[i] + c[i] * k
+            i = i + 1
+
+    by a VectorLoopStmtNode, which the interpreter runs as whole-list NumPy
+    operations. The bound must be a literal, a variable or 'len(x)', and the
+    body a run of assignments to 'x[i]' whose right-hand sides use only
+    +, -, *, /, //, %, numeric literals, variables not assigned in the loop and
+    lists subscripted by exactly [i], followed by 'i = i + 1'. As every list is
+    only accessed at [i], iteration k only depends on element k, so running
+    each statement over all elements in turn gives the same result.
+
+    Whether the lists hold numbers of a single type is only known at run time;
+    when they do not, the interpreter runs the original loop instead.
+    VectorLoopStmtNode is not understood by every pass, so run this one last.
+    """
+
+    def __init__(self):
+        self.vectorized = 0
+        self.rebound = set()
+
+    def optimize(self, node_ast_root):
+        # 'len' in a bound must be the builtin.
+        self.rebound = ast.bound_names(node_ast_root)
+        for node in ast.walk(node_ast_root):
+            if isinstance(node, ast.FunctionDefStmtNode):
+                self.rebound.add(node.name)
+                self.rebound.update(node.params)
+        self.do_visit(node_ast_root)
+        return node_ast_root
+
+    @staticmethod
+    def is_index(node, index):
+        return isinstance(node, ast.VariableRValueExprNode) and node.name == index and not node.expr_list
+
+    def element_expr(self, node, index):
+        """
+        Return True if node computes element [index] of a list from elements
+        [index] of lists, numeric literals and variables.
+        """
+        if isinstance(node, ast.ValueExprNode):
+            return type(node.value) in {int, float}
+        if isinstance(node, ast.VariableRValueExprNode):
+            if node.name == index:
+                return False
+            return not node.expr_list or len(node.expr_list) == 1 and self.is_index(node.expr_list[0], index)
+        if isinstance(node, ast.OperatorExprNode):
+            if node.rhs is None:
+                return node.token in {Token.OpPlus, Token.OpMinus} and self.element_expr(node.lhs, index)
+            return node.token in ELEMENTWISE and self.element_expr(node.lhs, index) \
+                and self.element_expr(node.rhs, index)
+        return False
+
+    def bound(self, node, index):
+        if isinstance(node, ast.ValueExprNode):
+            return type(node.value) is int
+        if isinstance(node, ast.VariableRValueExprNode):
+            return node.name != index and not node.expr_list
+        if isinstance(node, ast.FunctionCallExprNode):
+            return node.name == 'len' and 'len' not in self.rebound and len(node.expr_list) == 1 \
+                and self.bound(node.expr_list[0], index)
+        return False
+
+    def match(self, loop):
+        """
+        Return the VectorLoopStmtNode that replaces loop, or None.
+        """
+        test, stmts = loop.expr, loop.block.stmts
+        if not isinstance(test, ast.OperatorExprNode) or test.token != Token.OpLt or len(stmts) < 2:
+            return None
+        if not isinstance(test.lhs, ast.VariableRValueExprNode) or test.lhs.expr_list:
+            return None
+        index = test.lhs.name
+        step = stmts[-1]
+        if not isinstance(step, ast.AssignStmtNode) or step.lvalue.name != index or step.lvalue.expr_list \
+                or not isinstance(step.expr, ast.OperatorExprNode) or step.expr.token != Token.OpPlus:
+            return None
+        one = [operand for operand in (step.expr.lhs, step.expr.rhs)
+               if isinstance(operand, ast.ValueExprNode) and type(operand.value) is int and operand.value == 1]
+        if not one or not any(self.is_index(operand, index) for operand in (step.expr.lhs, step.expr.rhs)):
+            return None
+        if not self.bound(test.rhs, index):
+            return None
+        for stmt in stmts[:-1]:
+            if not isinstance(stmt, ast.AssignStmtNode) or stmt.lvalue.name == index \
+                    or len(stmt.lvalue.expr_list) != 1 or not self.is_index(stmt.lvalue.expr_list[0], index) \
+                    or not self.element_expr(stmt.expr, index):
+                return None
+        return ast.VectorLoopStmtNode(index, test.rhs, stmts[:-1], loop)
+
+    def do_visit(self, node):
+        if node:
+            self.visit(node)
+
+    @functools.singledispatchmethod
+    def visit(self, node):
+        print("Visitor support missing for", type(node))
+        exit()
+
+    @visit.register
+    def _(self, node: ast.BlockStmtNode):
+        stmts = []
+        for stmt in node.stmts:
+            for child in ast.iter_child_nodes(stmt):
+                if isinstance(child, ast.BlockStmtNode):
+                    self.do_visit(child)
+            if isinstance(stmt, ast.WhileStmtNode):
+                vector = self.match(stmt)
+                if vector is not None:
+                    self.vectorized += 1
+                    stmt = vector
+            stmts.append(stmt)
+        node.stmts = stmts
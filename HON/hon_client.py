@@ -0,0 +1,87 @@
+#
+# Project HON: Print the tree and symbol tables of HON programs, like main.py.
+# The work is sent to compile_server.py if it is running, and done in this
+# process otherwise.
+#
+# Usage: hon_client.py [--socket PATH] [--stats] [--metrics] [--shutdown] FILE...
+#
+# Startup time is what this client is for, so it avoids heavy imports such as
+# argparse, and only imports the compiler when there is no server.
+#
+import json
+import os
+import socket
+import sys
+
+path = os.environ.get('HON_SOCKET') or os.path.join(os.environ.get('TMPDIR', '/tmp'), f'hon-compile-{os.getuid()}.sock')
+shutdown = False
+stats = False
+metrics = False
+files = []
+argv = sys.argv[1:]
+while argv:
+    arg = argv.pop(0)
+    if arg == '--socket' and argv:
+        path = argv.pop(0)
+    elif arg == '--stats':
+        stats = True
+    elif arg == '--metrics':
+        metrics = True
+    elif arg == '--shutdown':
+        shutdown = True
+    elif arg.startswith('-'):
+        raise SystemExit('usage: hon_client.py [--socket PATH] [--stats] [--metrics] [--shutdown] FILE...')
+    else:
+        files.append(arg)
+
+
+def connect():
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError:
+        s.close()
+        return None
+    return s
+
+
+def requests():
+    for file in files:
+        with open(file) as f:
+            yield {'op': 'analyze', 'name': file, 'source': f.read()}
+    if stats:
+        yield {'op': 'stats'}
+    if metrics:
+        yield {'op': 'metrics'}
+    if shutdown:
+        yield {'op': 'shutdown'}
+
+
+server = connect()
+if server is None:
+    from hon.compile_service import handle
+    responses = (handle(request) for request in requests())
+else:
+    stream = server.makefile('rwb')
+
+    def ask(request):
+        stream.write((json.dumps(request) + '\n').encode())
+        stream.flush()
+        return json.loads(stream.readline().decode())
+
+    responses = (ask(request) for request in requests())
+
+status = 0
+for response in responses:
+    if not response['ok']:
+        print('error:', response['error'])
+        status = 1
+    elif 'output' in response:
+        print(response['output'], end='')
+    elif 'cache' in response:
+        print(json.dumps(response['cache']))
+        if 'pipeline' in response:
+            print(json.dumps(response['pipeline']))
+    elif 'metrics' in response:
+        print(response['metrics'], end='')
+raise SystemExit(status)
@@ -0,0 +1,73 @@
+#
+# Project HON: Measure the project symbol index on a generated project of
+# 10000 files: indexing it, updating it when nothing or a few files changed,
+# and finding all references to names used in few or in all files.
+#
+import argparse
+import os
+import tempfile
+import time
+from hon.project_index import ProjectIndex
+
+FILE = '''def helper{n}(a, b):
+    total = 0
+    i = 0
+    while i < b:
+        total = total + a[i] * scale
+        i = i + 1
+    return total
+
+
+def check{n}(a):
+    if helper{n}(a, len(a)) > limit:
+        return helper{previous}(a, 2)
+    return 0
+
+
+data{n} = [1, 2, 3]
+print(check{n}(data{n}))
+'''
+
+arg_parser = argparse.ArgumentParser(description='Measure the project symbol index.')
+arg_parser.add_argument('--files', metavar='N', type=int, default=10000,
+                        help='files in the generated project (default: %(default)s)')
+args = arg_parser.parse_args()
+
+
+def report(what, seconds):
+    print('{:44s} {:10.2f}ms'.format(what, seconds * 1000))
+
+
+with tempfile.TemporaryDirectory() as project:
+    paths = []
+    for n in range(args.files):
+        path = os.path.join(project, f'module{n}.hon')
+        with open(path, 'w') as f:
+            f.write(FILE.format(n=n, previous=(n - 1) % args.files))
+        paths.append(path)
+    with open(os.path.join(project, 'config.hon'), 'w') as f:
+        f.write('scale = 2\nlimit = 10\n')
+    paths.append(os.path.join(project, 'config.hon'))
+
+    database = os.path.join(project, 'index.db')
+    index = ProjectIndex(database)
+    start = time.perf_counter()
+    index.update(paths)
+    report(f'index {len(paths)} files', time.perf_counter() - start)
+    print('   {}, {:.1f} MB'.format(index.stats(), os.path.getsize(database) / 2 ** 20))
+
+    start = time.perf_counter()
+    index.update(paths)
+    report('update, nothing changed', time.perf_counter() - start)
+    for path in paths[:10]:
+        with open(path, 'a') as f:
+            f.write('extra = limit + 1\n')
+    start = time.perf_counter()
+    indexed = index.update(paths)
+    report(f'update, {indexed} files changed', time.perf_counter() - start)
+
+    for name in ('helper5000', 'check42', 'limit', 'scale'):
+        start = time.perf_counter()
+        references = index.references(name)
+        report(f'references to {name}: {len(references)}', time.perf_counter() - start)
+    index.close()
@@ -0,0 +1,46 @@
+#
+# Project HON: Measure the memory held by large lists of ints and floats,
+# stored as Python lists and as TypedLists.
+#
+import gc
+import tracemalloc
+from hon.typed_list import TypedList
+
+SIZE = 1000000
+
+BUILDERS = {
+    'ints': lambda: (i * 7 for i in range(SIZE)),
+    'floats': lambda: (i * 0.5 for i in range(SIZE)),
+}
+
+
+def retained(build):
+    """
+    Return the object built and the bytes still allocated for it once built.
+    """
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def appended(kind, values):
+    result = kind()
+    for value in values:
+        result.append(value)
+    return result
+
+
+print('{:8s} {:10s} {:>12s} {:>12s} {:>8s} {:>8s}'.format(
+    'elements', 'built by', 'list bytes', 'typed bytes', 'ratio', 'storage'))
+for name, values in BUILDERS.items():
+    for how, build in (('display', lambda kind: kind(values())),
+                       ('append', lambda kind: appended(kind, values()))):
+        plain, plain_size = retained(lambda: build(list))
+        typed, typed_size = retained(lambda: build(TypedList))
+        assert typed == plain
+        print('{:8s} {:10s} {:12d} {:12d} {:7.1f}x {:>8s}'.format(
+            name, how, plain_size, typed_size, plain_size / typed_size, typed.storage))
+        del plain, typed
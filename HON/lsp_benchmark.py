@@ -0,0 +1,167 @@
+#
+# Project HON: Measure how fast lsp_server.py answers. It replays an edit
+# script, the messages an editor sent, one JSON object per line, as written by
+# 'lsp_server.py --record FILE'. Without --script, the editing of a generated
+# program is replayed: typing a statement into a def one character at a time,
+# then into the top level, asking for the symbols and definitions as it goes.
+# For each kind of message it reports the time until the server answered it,
+# or published the diagnostics after an edit.
+#
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from hon.document import Document
+from hon.parser import Parser
+
+URI = 'file:///bench.hon'
+
+FUNCTION = '''def step{n}(a, b):
+    total = 0
+    i = 0
+    while i < b:
+        if a[i] % 2 == 0:
+            total = total + a[i] // 2
+        else:
+            total = total + 3 * a[i] + 1
+        i = i + 1
+    return total
+
+'''
+
+
+def generate(functions):
+    program = ''.join(FUNCTION.format(n=n) for n in range(functions))
+    program += 'data = [1, 2, 3, 4, 5, 6, 7, 8]\n'
+    program += ''.join(f'print(step{n}(data, len(data)))\n' for n in range(0, functions, 10))
+    return program
+
+
+def edit_script(functions):
+    """
+    Return the messages of an editing session on generate(functions).
+    """
+    text = generate(functions)
+    lines = text.split('\n')
+    messages = [
+        {'jsonrpc': '2.0', 'id': 0, 'method': 'initialize', 'params': {'capabilities': {}}},
+        {'jsonrpc': '2.0', 'method': 'initialized', 'params': {}},
+        {'jsonrpc': '2.0', 'method': 'textDocument/didOpen',
+         'params': {'textDocument': {'uri': URI, 'languageId': 'hon', 'version': 0, 'text': text}}},
+    ]
+    ids = iter(range(1, 1000000))
+
+    def change(line, col, end_col, new_text):
+        messages.append({'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+                         'params': {'textDocument': {'uri': URI},
+                                    'contentChanges': [{'range': {'start': {'line': line, 'character': col},
+                                                                  'end': {'line': line, 'character': end_col}},
+                                                        'text': new_text}]}})
+
+    def request(method, **params):
+        messages.append({'jsonrpc': '2.0', 'id': next(ids), 'method': method,
+                         'params': dict(textDocument={'uri': URI}, **params)})
+
+    def type_line(line, statement):
+        change(line, 0, 0, '\n')
+        for col, char in enumerate(statement):
+            change(line, col, col, char)
+        request('textDocument/documentSymbol')
+        # The last name typed is the last identifier of the statement.
+        name = statement.rstrip(')').split('(')[-1].split()[-1]
+        request('textDocument/definition', position={'line': line, 'character': len(statement) - len(name)})
+
+    # Into the middle def, after 'i = 0', and into the top level.
+    middle = functions // 2 * FUNCTION.count('\n') + 3
+    type_line(middle, '    scale = total * 2 + a[0]')
+    type_line(len(lines) - 1, f'result = step{functions // 3}(data, len(data))')
+    type_line(middle + 1, '    total = scale - total')
+    messages.append({'jsonrpc': '2.0', 'id': next(ids), 'method': 'shutdown'})
+    messages.append({'jsonrpc': '2.0', 'method': 'exit'})
+    return messages
+
+
+def send(server, message):
+    body = json.dumps(message).encode()
+    server.stdin.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    server.stdin.flush()
+
+
+def receive(server):
+    length = None
+    while True:
+        line = server.stdout.readline().strip()
+        if not line:
+            break
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    return json.loads(server.stdout.read(length))
+
+
+def replay(messages):
+    """
+    Send messages to a new lsp_server.py and return the latency of each kind
+    of message in seconds.
+    """
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lsp_server.py')
+    server = subprocess.Popen([sys.executable, server_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    times = {}
+    for message in messages:
+        method = message.get('method')
+        start = time.perf_counter()
+        send(server, message)
+        if 'id' in message:
+            while 'id' not in receive(server):
+                pass
+        elif method in {'textDocument/didOpen', 'textDocument/didChange', 'textDocument/didClose'}:
+            while receive(server).get('method') != 'textDocument/publishDiagnostics':
+                pass
+        else:
+            continue
+        times.setdefault(method, []).append(time.perf_counter() - start)
+    # A recording ends before 'exit', which is not recorded.
+    server.stdin.close()
+    server.wait()
+    return times
+
+
+arg_parser = argparse.ArgumentParser(description='Measure the latency of lsp_server.py.')
+arg_parser.add_argument('--script', metavar='FILE', help='messages to replay, as written by lsp_server.py --record')
+arg_parser.add_argument('--functions', metavar='N', type=int, default=500,
+                        help='defs in the generated program (default: %(default)s)')
+arg_parser.add_argument('--save', metavar='FILE', help='write the generated edit script to FILE')
+args = arg_parser.parse_args()
+
+if args.script:
+    with open(args.script) as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+else:
+    messages = edit_script(args.functions)
+    if args.save:
+        with open(args.save, 'w') as f:
+            f.writelines(json.dumps(message) + '\n' for message in messages)
+
+for message in messages:
+    if message.get('method') == 'textDocument/didOpen':
+        text = message['params']['textDocument']['text']
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Parser(io.StringIO(text)).parse()
+        parse_time = time.perf_counter() - start
+        start = time.perf_counter()
+        Document(text)
+        print(f"document: {text.count(chr(10))} lines, full parse {parse_time * 1000:.1f} ms, "
+              f"open with indexes {(time.perf_counter() - start) * 1000:.1f} ms")
+
+print('{:32s} {:>6s} {:>9s} {:>9s} {:>9s}'.format('message', 'count', 'median', 'p95', 'max'))
+for method, latencies in replay(messages).items():
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print('{:32s} {:6d} {:7.2f}ms {:7.2f}ms {:7.2f}ms'.format(
+        method, len(latencies), statistics.median(latencies) * 1000, p95 * 1000, latencies[-1] * 1000))
@@ -0,0 +1,149 @@
+#
+# Project HON: Language server for HON programs, speaking the Language Server
+# Protocol over stdin and stdout. It reports syntax errors and undefined names,
+# lists the defs and globals of a document and finds where a name is defined.
+# Edits are applied incrementally, see hon/document.py.
+#
+# With --record FILE, every message received is also written to FILE, one JSON
+# object per line, for lsp_benchmark.py to replay.
+#
+import argparse
+import json
+import sys
+from hon.document import Document
+
+SYMBOL_KINDS = {'function': 12, 'variable': 13}
+
+
+class MethodNotFound(Exception):
+    """
+    A request for a method the server does not implement.
+    """
+
+
+class LanguageServer:
+    def __init__(self, output, record=None):
+        self.output = output
+        self.record = record
+        self.documents = {}
+        self.shutdown_requested = False
+
+    def send(self, message):
+        body = json.dumps(message).encode()
+        self.output.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        self.output.flush()
+
+    def notify(self, method, params):
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    @staticmethod
+    def range(start, end):
+        return {'start': {'line': start[0], 'character': start[1]},
+                'end': {'line': end[0], 'character': end[1]}}
+
+    def publish_diagnostics(self, uri):
+        document = self.documents.get(uri)
+        diagnostics = [] if document is None else [
+            {'range': self.range(start, end), 'severity': severity, 'source': 'hon', 'message': message}
+            for severity, message, start, end in document.diagnostics()]
+        self.notify('textDocument/publishDiagnostics', {'uri': uri, 'diagnostics': diagnostics})
+
+    def dispatch(self, message):
+        """
+        Handle a request or notification; return the result of a request.
+        """
+        method, params = message.get('method'), message.get('params') or {}
+        if method == 'initialize':
+            return {'capabilities': {'textDocumentSync': {'openClose': True, 'change': 2},
+                                     'documentSymbolProvider': True, 'definitionProvider': True},
+                    'serverInfo': {'name': 'hon'}}
+        if method == 'shutdown':
+            self.shutdown_requested = True
+            return None
+        if method == 'textDocument/didOpen':
+            document = params['textDocument']
+            self.documents[document['uri']] = Document(document['text'])
+            self.publish_diagnostics(document['uri'])
+        elif method == 'textDocument/didChange':
+            uri = params['textDocument']['uri']
+            document = self.documents[uri]
+            for change in params['contentChanges']:
+                if 'range' in change:
+                    start, end = change['range']['start'], change['range']['end']
+                    document.edit((start['line'], start['character']), (end['line'], end['character']),
+                                  change['text'])
+                else:
+                    document.replace(change['text'])
+            self.publish_diagnostics(uri)
+        elif method == 'textDocument/didClose':
+            uri = params['textDocument']['uri']
+            self.documents.pop(uri, None)
+            self.publish_diagnostics(uri)
+        elif method == 'textDocument/documentSymbol':
+            document = self.documents[params['textDocument']['uri']]
+            return [{'name': name, 'kind': SYMBOL_KINDS[kind],
+                     'range': self.range((start, 0), (end, len(document.lines[end]))),
+                     'selectionRange': self.range(location, (location[0], location[1] + len(name)))}
+                    for name, kind, start, end, location in document.symbols()]
+        elif method == 'textDocument/definition':
+            uri = params['textDocument']['uri']
+            position = params['position']
+            location = self.documents[uri].definition(position['line'], position['character'])
+            return None if location is None else {'uri': uri, 'range': self.range(location, location)}
+        elif 'id' in message:
+            raise MethodNotFound(f'unknown method {method!r}')
+        return None
+
+    def handle(self, message):
+        if self.record is not None:
+            self.record.write(json.dumps(message) + '\n')
+            self.record.flush()
+        try:
+            result = self.dispatch(message)
+        except MethodNotFound as e:
+            error = {'code': -32601, 'message': str(e)}
+        except Exception as e:
+            error = {'code': -32603, 'message': f'{type(e).__name__}: {e}'}
+        else:
+            error = None
+        if 'id' not in message:
+            return
+        if error is None:
+            self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+        else:
+            self.send({'jsonrpc': '2.0', 'id': message['id'], 'error': error})
+
+
+def read_message(stream):
+    """
+    Return the next message from stream, or None at the end of it.
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    return json.loads(stream.read(length))
+
+
+arg_parser = argparse.ArgumentParser(description='Serve HON documents over the Language Server Protocol on stdio.')
+arg_parser.add_argument('--record', metavar='FILE', type=argparse.FileType('w'),
+                        help='write every message received to FILE')
+args = arg_parser.parse_args()
+
+# Nothing else may write to stdout, which carries the protocol.
+server = LanguageServer(sys.stdout.buffer, args.record)
+sys.stdout = sys.stderr
+while True:
+    message = read_message(sys.stdin.buffer)
+    if message is None:
+        sys.exit(1)
+    if message.get('method') == 'exit':
+        sys.exit(0 if server.shutdown_requested else 1)
+    server.handle(message)
@@ -1,14 +1,30 @@
 #
 # Project HON: Main program
 #
-import ast
-import symtable as ost
+# With --stats PATH, the time spent in each phase and counts of tokens, nodes
+# and symbols are written to PATH, as JSON or in the Prometheus text format;
+# --memory adds the memory each phase, node class and symbol table uses.
+#
+import argparse
+import contextlib
+import io
 import sys
 import os
-from hon.parser import Parser, SyntaxErrorException
+from hon.parser import SyntaxErrorException
+from hon.pipeline_stats import PipelineStats
 import hon.print_visitor as print_visitor
 from hon.symtab_visitor import SymbolTableVisitor
 
+arg_parser = argparse.ArgumentParser(description='Print the tree and symbol tables of the test programs.')
+arg_parser.add_argument('--stats', metavar='PATH', help='write phase timings and counts to PATH')
+arg_parser.add_argument('--stats-format', choices=['json', 'prometheus'], default='json',
+                        help='format of --stats (default: %(default)s)')
+arg_parser.add_argument('--memory', action='store_true', help='add memory use, traced with tracemalloc, to --stats')
+args = arg_parser.parse_args()
+if args.memory and args.stats is None:
+    arg_parser.error('--memory needs --stats')
+stats = PipelineStats(enabled=args.stats is not None, memory=args.memory)
+
 files = os.listdir(sys.path[0] + '/test')
 files.sort()
 for file in files:
@@ -19,13 +35,22 @@ for file in files:
         print("FILE:", f.name)
         print('*' * 40)
         try:
-            parser = Parser(f)
-            as_tree = parser.parse()
-            visitor = print_visitor.PrintVisitor()
-            visitor.visit(as_tree)
-            st_visitor = SymbolTableVisitor()
-            st = st_visitor.create_symtable(as_tree)
+            as_tree = stats.parse(f)
+            # Printed after the phase, so that it does not time the terminal.
+            tree_text = io.StringIO()
+            with stats.phase('visit'), contextlib.redirect_stdout(tree_text):
+                visitor = print_visitor.PrintVisitor()
+                visitor.visit(as_tree)
+            print(tree_text.getvalue(), end='')
+            with stats.phase('symtab'):
+                st_visitor = SymbolTableVisitor()
+                st = st_visitor.create_symtable(as_tree)
+            stats.count_symbols(st)
             st_visitor.disp_table(st)
 
         except SyntaxErrorException as e:
             print('SyntaxError:', e.message, e.location)
+
+if args.stats:
+    stats.write(args.stats, args.stats_format)
+stats.close()
@@ -0,0 +1,69 @@
+#
+# Project HON: Compare the calls made and the run time of recursive programs
+# with and without memoization of pure recursive functions.
+#
+import contextlib
+import io
+import time
+from hon.parser import Parser
+from hon.interpreter import Interpreter
+from hon.partial_eval_visitor import recursive_pure_functions
+
+PROGRAMS = {
+    'fib': '''
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+result = fib({n})
+''',
+    'findPosition': '''
+def fibk(i, k):
+    if i < 2:
+        return i % k
+    return (fibk(i - 1, k) + fibk(i - 2, k)) % k
+def findPosition(k, i):
+    if fibk(i, k) == 0:
+        return i
+    return findPosition(k, i + 1)
+result = findPosition({n}, 1)
+''',
+    'paths': '''
+def paths(r, c):
+    if r == 0 or c == 0:
+        return 1
+    return paths(r - 1, c) + paths(r, c - 1)
+result = paths({n}, {n})
+''',
+}
+
+SIZES = {
+    'fib': [10, 15, 20],
+    'findPosition': [5, 8, 10],
+    'paths': [4, 6, 8],
+}
+
+
+def parse(source):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Parser(io.StringIO(source)).parse()
+
+
+def measure(source, memoize):
+    as_tree = parse(source)
+    interpreter = Interpreter(memoize=recursive_pure_functions(as_tree) if memoize else ())
+    start = time.perf_counter()
+    result = interpreter.run(as_tree)['result']
+    return result, interpreter.calls, time.perf_counter() - start
+
+
+print('{:14s} {:>4s} {:>10s} {:>10s} {:>10s} {:>10s} {:>8s}'.format(
+    'program', 'N', 'calls', 'memo calls', 'ms', 'memo ms', 'speedup'))
+for name, template in PROGRAMS.items():
+    for n in SIZES[name]:
+        source = template.format(n=n)
+        result, calls, seconds = measure(source, False)
+        memo_result, memo_calls, memo_seconds = measure(source, True)
+        assert result == memo_result
+        print('{:14s} {:4d} {:10d} {:10d} {:10.1f} {:10.1f} {:7.1f}x'.format(
+            name, n, calls, memo_calls, seconds * 1e3, memo_seconds * 1e3, seconds / memo_seconds))
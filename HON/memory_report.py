@@ -0,0 +1,100 @@
+#
+# Project HON: Measure the memory the tokens, tree and symbol tables of HON
+# programs take, traced with tracemalloc: peak and retained bytes of each phase
+# per KB of source, and the bytes each class of node holds. The programs are
+# the given files, or else a generated one.
+#
+# With --baseline, fail if the bytes per node, overall or of any class, rose
+# by more than the tolerance over those saved with --save from the same input.
+#
+import argparse
+import contextlib
+import io
+import json
+import sys
+from hon.lexer import SyntaxErrorException
+from hon.pipeline_stats import PipelineStats
+from hon.symtab_visitor import SymbolTableVisitor
+
+FUNCTION = '''def step{n}(a, b):
+    total = 0
+    i = 0
+    while i < b:
+        if a[i] % 2 == 0:
+            total = total + a[i] // 2
+        else:
+            total = total + 3 * a[i] + 1
+        i = i + 1
+    return total
+
+'''
+
+arg_parser = argparse.ArgumentParser(description='Measure the memory used by each phase of the compiler.')
+arg_parser.add_argument('files', metavar='FILE', nargs='*', help='programs to measure')
+arg_parser.add_argument('--functions', metavar='N', type=int, default=1000,
+                        help='defs in the generated program, without FILEs (default: %(default)s)')
+arg_parser.add_argument('--save', metavar='PATH', help='save the bytes per node as a baseline to PATH')
+arg_parser.add_argument('--baseline', metavar='PATH', help='compare the bytes per node with the baseline at PATH')
+arg_parser.add_argument('--tolerance', metavar='PERCENT', type=float, default=2,
+                        help='rise over the baseline taken as a regression (default: %(default)s)')
+args = arg_parser.parse_args()
+
+if args.files:
+    programs = []
+    for file in args.files:
+        with open(file) as f:
+            programs.append(f.read())
+else:
+    programs = [''.join(FUNCTION.format(n=n) for n in range(args.functions))]
+source = args.files or f'{args.functions} generated defs'
+
+stats = PipelineStats(memory=True)
+for program in programs:
+    try:
+        # The parser traces some of what it parses on stdout.
+        with contextlib.redirect_stdout(io.StringIO()):
+            tree = stats.parse(io.StringIO(program))
+        with stats.phase('symtab'):
+            table = SymbolTableVisitor().create_symtable(tree)
+        stats.count_symbols(table)
+    except SyntaxErrorException as e:
+        print('SyntaxError:', e.message, e.location)
+stats.close()
+memory = stats.as_dict()['memory']
+
+print('{} programs, {:.1f} KB of source'.format(len(programs), memory['source bytes'] / 1024))
+print('{:8s} {:>12s} {:>12s} {:>14s} {:>16s}'.format('phase', 'peak', 'retained', 'peak per KB', 'retained per KB'))
+for name, phase in memory['phases'].items():
+    print('{:8s} {:>12d} {:>12d} {:>14.0f} {:>16.0f}'.format(
+        name, phase['peak'], phase['retained'], phase['peak per KB'], phase['retained per KB']))
+    for site, size in list(phase['sites'].items())[:3]:
+        print('{:8s}    {:24s} {:>12d}'.format('', site, size))
+print('{:24s} {:>8s} {:>12s} {:>10s}'.format('node class', 'nodes', 'bytes', 'per node'))
+for name, per_node in sorted(memory['bytes per node by class'].items()):
+    print('{:24s} {:>8d} {:>12d} {:>10.1f}'.format(
+        name, stats.nodes[name], memory['node bytes'][name], per_node))
+print('{:24s} {:>8d} {:>12d} {:>10.1f}'.format(
+    'all', sum(stats.nodes.values()), sum(memory['node bytes'].values()), memory['bytes per node']))
+for kind, size in memory['table bytes'].items():
+    print(f'{kind} symbol tables: {size} bytes')
+
+measured = {'input': source, 'bytes per node': memory['bytes per node'],
+            'bytes per node by class': memory['bytes per node by class']}
+if args.save:
+    with open(args.save, 'w') as f:
+        json.dump(measured, f, indent=2, sort_keys=True)
+if args.baseline:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['input'] != source:
+        print(f"warning: the baseline was measured on {baseline['input']}")
+    pairs = [('all nodes', baseline['bytes per node'], measured['bytes per node'])]
+    pairs += [(name, baseline['bytes per node by class'][name], per_node)
+              for name, per_node in sorted(measured['bytes per node by class'].items())
+              if name in baseline['bytes per node by class']]
+    regressions = [(what, old, new) for what, old, new in pairs if new > old * (1 + args.tolerance / 100)]
+    for what, old, new in regressions:
+        print(f'regression: {what} take {new:.1f} bytes per node, {old:.1f} in the baseline')
+    if regressions:
+        sys.exit(1)
+    print(f'bytes per node within {args.tolerance:g}% of the baseline')
@@ -0,0 +1,61 @@
+#
+# Project HON: Compare the run time of method-heavy loops with and without
+# inline caches, and report the hit rates of the caches.
+#
+import contextlib
+import io
+import time
+from hon.parser import Parser
+from hon.interpreter import Interpreter
+
+PROGRAMS = {
+    'list': '''
+out = []
+i = 0
+while i < 20000:
+    out.append(i)
+    out.append(i)
+    out.pop()
+    i = i + 1
+''',
+    'str': '''
+words = []
+s = "Hon Program"
+i = 0
+while i < 20000:
+    t = s.upper()
+    t = t.lower()
+    words.append(t.find("p"))
+    i = i + 1
+''',
+    'mixed': '''
+items = [[], "abc", []]
+i = 0
+while i < 20000:
+    x = items[i % 3]
+    n = x.count("a")
+    i = i + 1
+''',
+}
+
+
+def measure(source, inline_caches, repeat=3):
+    with contextlib.redirect_stdout(io.StringIO()):
+        as_tree = Parser(io.StringIO(source)).parse()
+    best = None
+    for _ in range(repeat):
+        interpreter = Interpreter(inline_caches=inline_caches)
+        start = time.perf_counter()
+        interpreter.run(as_tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, interpreter.inline_cache_stats()
+
+
+print('{:8s} {:>10s} {:>10s} {:>8s} {:>9s} {:>6s}'.format('program', 'plain ms', 'cached ms', 'speedup',
+                                                          'hit rate', 'sites'))
+for name, source in PROGRAMS.items():
+    plain, _ = measure(source, False)
+    cached, stats = measure(source, True)
+    print('{:8s} {:10.1f} {:10.1f} {:7.2f}x {:8.1%} {:6d}'.format(name, plain * 1e3, cached * 1e3, plain / cached,
+                                                                  stats['hit rate'], stats['sites']))
@@ -0,0 +1,57 @@
+#
+# Project HON: Compare the time of parsing a generated program of many
+# independent defs, about a million lines, in one process and with
+# parallel_parse() in several worker processes.
+#
+import argparse
+import contextlib
+import io
+import os
+import time
+from hon.parallel_parser import parallel_parse
+from hon.parser import Parser
+
+FUNCTION = '''def step{n}(a, b):
+    total = 0
+    i = 0
+    while i < b:
+        if a[i] % 2 == 0:
+            total = total + a[i] // 2
+        else:
+            total = total + 3 * a[i] + 1
+        i = i + 1
+    return total
+
+'''
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Measure the speedup of parsing in worker processes.')
+    arg_parser.add_argument('--lines', metavar='N', type=int, default=1000000,
+                            help='size of the generated program (default: %(default)s)')
+    arg_parser.add_argument('--workers', metavar='N', type=int, nargs='+',
+                            default=sorted({2, 4, os.cpu_count() or 1} - {1}),
+                            help='numbers of worker processes to try (default: %(default)s)')
+    args = arg_parser.parse_args()
+
+    functions = args.lines // FUNCTION.count('\n')
+    program = ''.join(FUNCTION.format(n=n) for n in range(functions))
+    print(f'{program.count(chr(10))} lines, {functions} defs, {os.cpu_count()} CPUs')
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        statements = len(Parser(io.StringIO(program)).parse().stmts)
+    baseline = time.perf_counter() - start
+    print('{:>8s} {:>9s} {:>8s}'.format('workers', 'time', 'speedup'))
+    print('{:>8d} {:>8.2f}s {:>7.2f}x'.format(1, baseline, 1))
+    for workers in args.workers:
+        start = time.perf_counter()
+        tree = parallel_parse(program, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert len(tree.stmts) == statements
+        del tree
+        print('{:>8d} {:>8.2f}s {:>7.2f}x'.format(workers, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main()
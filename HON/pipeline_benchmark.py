@@ -0,0 +1,154 @@
+#
+# Project HON: Measure the throughput and memory of each phase of the
+# compiler, lex, parse, visit (PrintVisitor) and symtab, on programs from
+# hon.corpus: one per corpus, each stressing something else. Times are the
+# best of --repeat runs; memory is traced with tracemalloc in a run of its own.
+#
+# --save writes the results as a baseline, and --baseline compares them with
+# one, exiting with status 1 if a phase got slower, or used more memory per KB
+# of source or per node, by more than --threshold percent.
+#
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+from hon.corpus import INDENTS, ProgramGenerator
+from hon.pipeline_stats import PipelineStats
+import hon.print_visitor as print_visitor
+from hon.symtab_visitor import SymbolTableVisitor
+
+CORPORA = {
+    'typical': {'functions': 50, 'depth': 3, 'expr_length': 6, 'indent': 'spaces'},
+    'deep': {'functions': 10, 'depth': 8, 'expr_length': 4, 'indent': 'two-spaces'},
+    'long-expressions': {'functions': 20, 'depth': 2, 'expr_length': 30, 'indent': 'spaces'},
+    'many-functions': {'functions': 500, 'depth': 2, 'expr_length': 4, 'indent': 'tabs'},
+    'flat': {'functions': 0, 'depth': 0, 'expr_length': 6, 'indent': 'spaces'},
+    'mixed-indent': {'functions': 50, 'depth': 5, 'expr_length': 6, 'indent': 'mixed'},
+}
+PHASES = ['lex', 'parse', 'visit', 'symtab']
+
+arg_parser = argparse.ArgumentParser(description='Benchmark the phases of the compiler on generated programs.')
+arg_parser.add_argument('--corpus', metavar='NAME', action='append', choices=list(CORPORA),
+                        help='corpus to run, more than once for more (default: all of %s)' % ', '.join(CORPORA))
+arg_parser.add_argument('--size', metavar='LINES', type=int, default=5000,
+                        help='lines of each program (default: %(default)s)')
+arg_parser.add_argument('--seed', type=int, default=0, help='seed of the generator (default: %(default)s)')
+arg_parser.add_argument('--functions', metavar='N', type=int, help='defs of each program, instead of the corpus\'s')
+arg_parser.add_argument('--depth', metavar='N', type=int, help='nesting depth of blocks, instead of the corpus\'s')
+arg_parser.add_argument('--expr-length', metavar='N', type=int,
+                        help='operands of the longest expressions, instead of the corpus\'s')
+arg_parser.add_argument('--indent', choices=list(INDENTS), help='indentation style, instead of the corpus\'s')
+arg_parser.add_argument('--repeat', metavar='N', type=int, default=3,
+                        help='runs to take the best time of (default: %(default)s)')
+arg_parser.add_argument('--no-memory', action='store_true', help='skip the run that traces memory')
+arg_parser.add_argument('--write', metavar='DIR', help='also write the programs to DIR')
+arg_parser.add_argument('--save', metavar='PATH', help='save the results as a baseline to PATH')
+arg_parser.add_argument('--baseline', metavar='PATH', help='compare the results with the baseline at PATH')
+arg_parser.add_argument('--threshold', metavar='PERCENT', type=float, default=10,
+                        help='change from the baseline taken as a regression (default: %(default)s)')
+args = arg_parser.parse_args()
+
+
+def run(program, stats):
+    """
+    Take program through every phase, measured by stats.
+    """
+    # The parser traces some of what it parses on stdout, and PrintVisitor prints the tree.
+    with contextlib.redirect_stdout(io.StringIO()):
+        tree = stats.parse(io.StringIO(program))
+        with stats.phase('visit'):
+            print_visitor.PrintVisitor().visit(tree)
+    with stats.phase('symtab'):
+        table = SymbolTableVisitor().create_symtable(tree)
+    stats.count_symbols(table)
+
+
+def measure(program):
+    kb = len(program.encode()) / 1024
+    best = {}
+    for _ in range(args.repeat):
+        stats = PipelineStats()
+        run(program, stats)
+        for name in PHASES:
+            best[name] = min(best.get(name, float('inf')), stats.phases[name]['wall'])
+    result = {'KB': kb, 'tokens': sum(stats.tokens.values()), 'nodes': sum(stats.nodes.values()),
+              'seconds': best, 'KB per second': {name: kb / seconds for name, seconds in best.items()}}
+    if not args.no_memory:
+        stats = PipelineStats(memory=True)
+        run(program, stats)
+        # Tracing would slow down the runs timed after this one.
+        stats.close()
+        memory = stats.as_dict()['memory']
+        result['peak per KB'] = {name: memory['phases'][name]['peak per KB'] for name in PHASES}
+        result['bytes per node'] = memory['bytes per node']
+    return result
+
+
+def compare(name, result, baseline):
+    """
+    Return the regressions of result from baseline, as lines to print.
+    """
+    limit = args.threshold / 100
+    regressions = []
+    for phase in PHASES:
+        old, new = baseline['KB per second'][phase], result['KB per second'][phase]
+        if new < old * (1 - limit):
+            regressions.append(f'{name}: {phase} runs at {new:.1f} KB/s, {old:.1f} in the baseline')
+        if 'peak per KB' in result and 'peak per KB' in baseline:
+            old, new = baseline['peak per KB'][phase], result['peak per KB'][phase]
+            if new > old * (1 + limit):
+                regressions.append(f'{name}: {phase} peaks at {new:.0f} bytes per KB, {old:.0f} in the baseline')
+    if 'bytes per node' in result and 'bytes per node' in baseline:
+        old, new = baseline['bytes per node'], result['bytes per node']
+        if new > old * (1 + limit):
+            regressions.append(f'{name}: trees take {new:.1f} bytes per node, {old:.1f} in the baseline')
+    return regressions
+
+
+overrides = {'functions': args.functions, 'depth': args.depth, 'expr_length': args.expr_length,
+             'indent': args.indent}
+results = {}
+print('{:18s} {:>8s} {:>8s} {:>9s} {:>9s} {:>9s} {:>9s}  {}'.format(
+    'corpus', 'KB', 'nodes', 'lex', 'parse', 'visit', 'symtab', '(KB/s)'))
+for name in args.corpus or CORPORA:
+    config = dict(CORPORA[name], size=args.size, seed=args.seed)
+    config.update((key, value) for key, value in overrides.items() if value is not None)
+    program = ProgramGenerator(**config).generate()
+    if args.write:
+        os.makedirs(args.write, exist_ok=True)
+        with open(os.path.join(args.write, f'{name}.hon'), 'w') as f:
+            f.write(program)
+    result = measure(program)
+    result['config'] = config
+    results[name] = result
+    print('{:18s} {:>8.1f} {:>8d} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+        name, result['KB'], result['nodes'], *(result['KB per second'][phase] for phase in PHASES)))
+    if 'peak per KB' in result:
+        print('{:18s} {:>17s} {:>9.0f} {:>9.0f} {:>9.0f} {:>9.0f}  (peak bytes per KB)'.format(
+            '', '', *(result['peak per KB'][phase] for phase in PHASES)))
+        print('{:18s} {:>17s} {:>9.1f}  (bytes per node)'.format('', '', result['bytes per node']))
+
+if args.save:
+    with open(args.save, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+if args.baseline:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = []
+    compared = 0
+    for name, result in results.items():
+        if name not in baseline:
+            print(f'{name}: not in the baseline')
+        elif baseline[name]['config'] != result['config']:
+            print(f'{name}: the baseline was measured on another program, {baseline[name]["config"]}')
+        else:
+            regressions.extend(compare(name, result, baseline[name]))
+            compared += 1
+    for regression in regressions:
+        print('regression:', regression)
+    if regressions:
+        sys.exit(1)
+    if compared:
+        print(f'no phase slower or larger than the baseline by more than {args.threshold:g}%')
@@ -0,0 +1,53 @@
+#
+# Project HON: Compare the time of incremental reparsing after an edit with
+# that of parsing the whole program again, on a generated program of about
+# 100k lines, for edits of growing size.
+#
+import contextlib
+import io
+import time
+from hon.incremental_parser import parse, reparse
+from hon.lexer import Location
+from hon.parser import Parser
+
+FUNCTION = '''def step{n}(a, b):
+    total = 0
+    i = 0
+    while i < b:
+        if a[i] % 2 == 0:
+            total = total + a[i] // 2
+        else:
+            total = total + 3 * a[i] + 1
+        i = i + 1
+    return total
+
+'''
+FUNCTIONS = 10000
+EDITS = 5
+
+program = ''.join(FUNCTION.format(n=n) for n in range(FUNCTIONS))
+lines = program.count('\n')
+
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    Parser(io.StringIO(program)).parse()
+full_time = time.perf_counter() - start
+tree, stream = parse(program)
+print(f'{lines} lines, full parse {full_time:.2f} s')
+
+print('{:>14s} {:>12s} {:>14s} {:>9s}'.format('edit', 'per edit', 'lines parsed', 'speedup'))
+for size in (1, 10, 100, 1000):
+    parsed = stream.parsed
+    elapsed = 0
+    for edit in range(EDITS):
+        # Add a statement to each of 'size' consecutive defs, near the middle.
+        first = FUNCTIONS // 2 - size // 2 + edit
+        starts = stream.starts()
+        text = ''.join(unit.text for unit in stream.units[first:first + size])
+        text = text.replace('    return total', '    total = total + 1\n    return total')
+        start = time.perf_counter()
+        reparse(tree, stream, (Location(starts[first], 1), Location(starts[first + size], 1), text))
+        elapsed += time.perf_counter() - start
+    per_edit = elapsed / EDITS
+    print('{:>9d} defs {:>10.2f}ms {:>14d} {:>8.0f}x'.format(
+        size, per_edit * 1000, (stream.parsed - parsed) // EDITS, full_time / per_edit))
@@ -0,0 +1,65 @@
+#
+# Project HON: Run a HON program with the interpreter.
+#
+import argparse
+import contextlib
+import io
+import sys
+from hon.parser import Parser, SyntaxErrorException
+from hon.parallel_parser import parallel_parse
+from hon.interpreter import Interpreter
+from hon.partial_eval_visitor import recursive_pure_functions
+from hon.vectorize_visitor import VectorizeVisitor
+from hon.profile_visitor import ProfileReorderVisitor, load_profile, save_profile
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Run a HON program.')
+    arg_parser.add_argument('file', help='HON source file')
+    arg_parser.add_argument('--profile-out', metavar='PATH',
+                            help='count if arms taken and loop iterations, and write them to PATH')
+    arg_parser.add_argument('--profile-use', metavar='PATH',
+                            help='reorder if arms using a profile written by --profile-out')
+    arg_parser.add_argument('--memoize', action='store_true',
+                            help='remember the results of pure recursive functions, and report hits and misses')
+    arg_parser.add_argument('--memo-size', metavar='N', type=int, default=1024,
+                            help='results remembered per function (default: %(default)s)')
+    arg_parser.add_argument('--vectorize', action='store_true',
+                            help='run counted element-wise list loops with NumPy')
+    arg_parser.add_argument('--typed-lists', action='store_true',
+                            help='store lists of ints or floats unboxed')
+    arg_parser.add_argument('--frame-slots', action='store_true',
+                            help='access variables by index into frames and global cells')
+    arg_parser.add_argument('--parse-jobs', metavar='N', type=int, default=1,
+                            help='parse large programs in N worker processes (default: %(default)s)')
+    args = arg_parser.parse_args()
+
+    with open(args.file) as f:
+        try:
+            if args.parse_jobs > 1:
+                as_tree = parallel_parse(f.read(), workers=args.parse_jobs)
+            else:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    as_tree = Parser(f).parse()
+        except SyntaxErrorException as e:
+            print('SyntaxError:', e.message, e.location)
+            raise SystemExit(1)
+
+    if args.profile_use:
+        ProfileReorderVisitor(load_profile(args.profile_use)).optimize(as_tree)
+    if args.vectorize:
+        VectorizeVisitor().optimize(as_tree)
+    memoize = recursive_pure_functions(as_tree) if args.memoize else ()
+    interpreter = Interpreter(profile=args.profile_out is not None, memoize=memoize, memo_size=args.memo_size,
+                              typed_lists=args.typed_lists, frame_slots=args.frame_slots)
+    try:
+        interpreter.run(as_tree)
+    finally:
+        if args.profile_out:
+            save_profile(interpreter, as_tree, args.profile_out)
+        for name, stats in sorted(interpreter.memo_stats().items()):
+            print('memo {}: {hits} hits, {misses} misses, {size} entries'.format(name, **stats), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
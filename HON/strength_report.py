@@ -0,0 +1,89 @@
+#
+# Project HON: Report the strength reductions done on the test programs, and
+# the speedup of each kind of rewrite on a HON program run by the interpreter
+# before and after StrengthReductionVisitor.
+#
+import collections
+import contextlib
+import io
+import sys
+import os
+import time
+from hon.parser import Parser, SyntaxErrorException
+from hon.interpreter import Interpreter
+from hon.strength_visitor import StrengthReductionVisitor
+
+# A loop summing a representative operation for each kind of rewrite.
+PROGRAM = '''
+def loop(n):
+    total = 0
+    i = 0
+    while i < n:
+        total = total + {expr}
+        i = i + 1
+    return total
+result = loop({n})
+'''
+
+SAMPLES = {
+    'square': 'i ** 2',
+    'power': 'i ** 3',
+    'power-identity': 'i ** 1',
+    'double': 'i * 2',
+    'multiply-identity': 'i * 1',
+    'divide-identity': 'i // 1',
+    'modulus-identity': 'i % 1',
+}
+
+ITERATIONS = 20000
+
+
+def parse(source):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Parser(io.StringIO(source)).parse()
+
+
+def measure(source, reduce):
+    """
+    Run source, after strength reduction if reduce, and return its result,
+    the rewrites done and the best time of three runs.
+    """
+    best = float('inf')
+    for _ in range(3):
+        as_tree = parse(source)
+        reducer = StrengthReductionVisitor()
+        if reduce:
+            reducer.optimize(as_tree)
+        start = time.perf_counter()
+        result = Interpreter().run(as_tree)['result']
+        best = min(best, time.perf_counter() - start)
+    return result, reducer.rewrites, best
+
+
+files = os.listdir(sys.path[0] + '/test')
+files.sort()
+totals = collections.Counter()
+for file in files:
+    with open(sys.path[0] + '/test/' + file) as f:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                as_tree = Parser(f).parse()
+        except SyntaxErrorException as e:
+            print('SyntaxError:', e.message, e.location)
+            continue
+        reducer = StrengthReductionVisitor()
+        reducer.optimize(as_tree)
+        totals.update(reducer.rewrites)
+        print('{:12s} {}'.format(file, dict(reducer.rewrites)))
+
+print()
+print(f'{ITERATIONS} iterations of total = total + EXPR, run by the interpreter')
+print('{:18s} {:>8s} {:10s} {:>10s} {:>10s} {:>8s}'.format(
+    'rewrite', 'count', 'EXPR', 'before ms', 'after ms', 'speedup'))
+for kind, expr in SAMPLES.items():
+    source = PROGRAM.format(expr=expr, n=ITERATIONS)
+    result, _, before = measure(source, False)
+    reduced_result, rewrites, after = measure(source, True)
+    assert result == reduced_result and rewrites[kind] == 1
+    print('{:18s} {:8d} {:10s} {:10.1f} {:10.1f} {:7.2f}x'.format(
+        kind, totals[kind], expr, before * 1e3, after * 1e3, before / after))
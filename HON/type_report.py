@@ -0,0 +1,30 @@
+#
+# Project HON: Report how many operators type inference can specialize.
+#
+import contextlib
+import io
+import sys
+import os
+from hon.parser import Parser, SyntaxErrorException
+from hon.type_visitor import TypeInferenceVisitor, specialization_stats
+
+files = os.listdir(sys.path[0] + '/test')
+files.sort()
+totals = [0, 0, 0]
+print('{:12s} {:>5s} {:>5s} {:>5s}'.format('file', 'ops', 'int', 'float'))
+for file in files:
+    with open(sys.path[0] + '/test/' + file) as f:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                as_tree = Parser(f).parse()
+        except SyntaxErrorException as e:
+            print('SyntaxError:', e.message, e.location)
+            continue
+        TypeInferenceVisitor().infer(as_tree)
+        stats = specialization_stats(as_tree)
+        totals = [total + count for total, count in zip(totals, stats)]
+        print('{:12s} {:5d} {:5d} {:5d}'.format(file, *stats))
+ops, ints, floats = totals
+print('{:12s} {:5d} {:5d} {:5d}'.format('total', ops, ints, floats))
+if ops:
+    print('specialized: {:.1%}'.format((ints + floats) / ops))